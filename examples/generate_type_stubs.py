@@ -222,14 +222,18 @@ To regenerate after libvips updates:
     python examples/generate_type_stubs.py
 """
 
+from concurrent.futures import Future
+from contextlib import AbstractContextManager
 from pathlib import Path
 from types import TracebackType
-from typing import Any, Callable, Protocol, TypeAlias
+from typing import Any, AsyncIterator, Callable, Iterator, Protocol, TypeAlias
 
 import numpy as np  # type: ignore[import-not-found]
 
 from PIL.Image import Image as PILImage  # type: ignore
 
+from . import batch as batch
+from . import parallel as parallel
 from .enums import {enums}
 
 class _ArrayInterface(Protocol):
@@ -318,26 +322,67 @@ class Connection(VipsObject): ...
 class Source(Connection):
     @staticmethod
     def new_from_descriptor(descriptor: int) -> Source: ...
+    @staticmethod
+    def new_from_fileobj(fileobj: Any) -> Source: ...
+    @staticmethod
+    def new_from_mmap(filename: str | Path, advice: str | list[str] | None = ...) -> Source: ...
+    @staticmethod
+    def new_from_archive_member(archive: str | Path | Any, name: str) -> Source: ...
 
 class SourceCustom(Source):
     def on_read(self, handler: Any) -> None: ...
+    def on_readinto(self, handler: Callable[[memoryview], int | None]) -> None: ...
     def on_seek(self, handler: Any) -> None: ...
 
+class RangeSource(SourceCustom):
+    bytes_fetched: int
+    bytes_consumed: int
+    fetches: int
+
+    def __init__(self, fetch: Callable[[int, int], bytes], size: int, block_size: int = ..., cache_blocks: int = ..., readahead: int = ..., max_workers: int = ...) -> None: ...
+    def close(self) -> None: ...
+
 class Target(Connection):
     @staticmethod
     def new_to_descriptor(descriptor: int) -> Target: ...
 
+    @staticmethod
+    def new_to_fileobj(fileobj: Any) -> Target: ...
+
+    @staticmethod
+    def tee(*sinks: Any, hashers: list[Any] | None = None) -> TeeTarget: ...
+
     @staticmethod
     def new_to_memory() -> Target: ...
 
 class TargetCustom(Target):
-    def __init__(self) -> None: ...
+    def __init__(self, buffer_size: int = 0) -> None: ...
     def on_write(self, handler: Callable[[_BufferLike], int]) -> None: ...
     def on_read(self, handler: Callable[[int], _BufferLike | None]) -> None: ...
     def on_seek(self, handler: Callable[[int, int], int]) -> None: ...
     def on_end(self, handler: Callable[..., int]) -> None: ...
     def on_finish(self, handler: Callable[..., int]) -> None: ...
 
+class MultipartTarget(TargetCustom):
+    parts: list[Any] | None
+    error: Exception | None
+
+    def __init__(self, upload_part: Callable[[int, bytes], Any], complete: Callable[[list[Any]], None] | None = None, part_size: int = ..., max_workers: int = ...) -> None: ...
+
+class TeeTarget(TargetCustom):
+    hashers: list[Any]
+    digests: dict[str, str] | None
+
+    def __init__(self, *sinks: Any, hashers: list[Any] | None = None) -> None: ...
+
+# Encoded chunk iterator
+class _EncodeIterator(Iterator[bytes], AsyncIterator[bytes]):
+    def __iter__(self) -> _EncodeIterator: ...
+    def __next__(self) -> bytes: ...
+    def __aiter__(self) -> _EncodeIterator: ...
+    async def __anext__(self) -> bytes: ...
+    def close(self) -> None: ...
+
 # Interpolator class
 class Interpolate(VipsObject):
     @staticmethod
@@ -378,9 +423,9 @@ class Image(VipsObject):
 
     # Constructors
     @staticmethod
-    def new_from_file(vips_filename: str | Path, *, memory: bool = ..., access: Access | str = ..., fail: bool = ..., **kwargs: Any) -> Image: ...
+    def new_from_file(vips_filename: str | Path, *, memory: bool = ..., access: Access | str = ..., fail: bool = ..., loader: str = ..., **kwargs: Any) -> Image: ...
     @staticmethod
-    def new_from_buffer(data: _BufferLike, options: str, *, access: Access | str = ..., fail: bool = ..., **kwargs: Any) -> Image: ...
+    def new_from_buffer(data: _BufferLike, options: str, *, access: Access | str = ..., fail: bool = ..., loader: str = ..., **kwargs: Any) -> Image: ...
     @staticmethod
     def new_from_list(array: _NumberLikeList | _NumberLike2DList, scale: float = 1.0, offset: float = 0.0) -> Image: ...
     @classmethod
@@ -388,7 +433,11 @@ class Image(VipsObject):
     @staticmethod
     def new_from_memory(data: _BufferLike, width: int, height: int, bands: int, format: str | BandFormat) -> Image: ...
     @staticmethod
-    def new_from_source(source: Source, options: str, **kwargs: Any) -> Image: ...
+    def new_from_source(source: Source, options: str, *, loader: str = ..., **kwargs: Any) -> Image: ...
+    @staticmethod
+    def new_from_mmap(filename: str | Path, options: str = ..., advice: str | list[str] | None = ..., *, access: Access | str = ..., fail: bool = ..., **kwargs: Any) -> Image: ...
+    @staticmethod
+    def thumbnail_set(source: str | Path | bytes | bytearray | memoryview | Source, widths: list[int], targets: list[Target | None] | None = ..., format_string: str | None = ..., **kwargs: Any) -> list[Image | None]: ...
     @staticmethod
     def new_temp_file(format: str) -> Image: ...
     def new_from_image(self, value: _NumberLike | _NumberLikeList) -> Image: ...
@@ -398,6 +447,8 @@ class Image(VipsObject):
     def write_to_file(self, vips_filename: str | Path, **kwargs: Any) -> None: ...
     def write_to_buffer(self, format_string: str, **kwargs: Any) -> bytes: ...
     def write_to_target(self, target: Target, format_string: str, **kwargs: Any) -> None: ...
+    def iter_encode(self, format_string: str, chunk_size: int = ..., queue_size: int = ..., **kwargs: Any) -> _EncodeIterator: ...
+    def write_many(self, destinations: list[str | tuple[Any, ...]], tile_height: int = ..., max_tiles: int | None = ...) -> list[bytes | None]: ...
     def write_to_memory(self) -> bytes: ...
     def write(self, other: Image) -> None: ...
 
@@ -405,6 +456,7 @@ class Image(VipsObject):
     def invalidate(self) -> None: ...
     def set_progress(self, progress: bool) -> None: ...
     def set_kill(self, kill: bool) -> None: ...
+    def estimate(self, threads: int | None = None) -> Estimate: ...
     def copy(self, *, width: int = ..., height: int = ..., bands: int = ..., format: str | BandFormat = ..., coding: str | Coding = ..., interpretation: str | Interpretation = ..., xres: float = ..., yres: float = ..., xoffset: int = ..., yoffset: int = ...) -> Image: ...
     def tolist(self) -> list[list[float]]: ...
     def __array__(self, dtype: np.dtype | str | None = None, copy: bool | None = None) -> np.ndarray: ...
@@ -467,6 +519,7 @@ class Image(VipsObject):
 
     # Operators
     def __repr__(self) -> str: ...
+    def __reduce__(self) -> tuple[Any, ...]: ...
     def __getattr__(self, name: str) -> Any: ...
     def __enter__(self) -> Image: ...
     def __exit__(self, type: type[BaseException] | None, value: BaseException | None, traceback: TracebackType | None) -> None: ...
@@ -547,13 +600,92 @@ class Introspect(object):
     @classmethod
     def get(cls: type["Introspect"], operation_name: str) -> "Introspect": ...
 
+class CacheScope(object):
+    hits: int
+    misses: int
+
+    def __len__(self) -> int: ...
+    def clear(self) -> None: ...
+
+class Scheduler(object):
+    INTERACTIVE: int
+
+    threads: int
+    max_memory: int | None
+    interactive: int
+    preemptions: int
+
+    def __init__(self, threads: int | None = None, max_memory: int | None = None, interactive: int = ...) -> None: ...
+    @property
+    def running(self) -> int: ...
+    @property
+    def queued(self) -> int: ...
+    def submit(self, fn: Callable[[Image | None], Any], image: Image | None = None, tenant: str = ..., priority: int = ..., threads: int = ..., preemptible: bool | None = None) -> Future[Any]: ...
+    def shutdown(self, wait: bool = True, cancel: bool = False) -> None: ...
+    def __enter__(self) -> Scheduler: ...
+    def __exit__(self, exc_type: type[BaseException] | None, exc_value: BaseException | None, traceback: TracebackType | None) -> None: ...
+
+class MemoryGovernor(object):
+    budget: int
+    reserved: int
+
+    def __init__(self, budget: int, block: bool = True, timeout: float | None = None, poll: float = ...) -> None: ...
+    @staticmethod
+    def estimate(image: Image) -> int: ...
+    def admit(self, image: Image | None = None, cost: int | None = None, block: bool | None = None, timeout: float | None = None) -> AbstractContextManager[None]: ...
+
+class Estimate(object):
+    peak_memory: int
+    input_bytes: int
+    disc_bytes: int
+    access: str
+    operations: int
+    memory: dict[str, int]
+
+class CacheAutotuner(object):
+    max_memory: int
+    max_files: int
+    interval: float
+    sample: dict[str, Any] | None
+
+    def __init__(self, max_memory: int, max_files: int | None = None, interval: float = ..., min_memory: int = ..., min_operations: int = ..., max_operations: int = ..., min_files: int = ...) -> None: ...
+    def step(self) -> dict[str, Any]: ...
+    def start(self) -> None: ...
+    def stop(self, restore: bool = True) -> None: ...
+    def __enter__(self) -> CacheAutotuner: ...
+    def __exit__(self, exc_type: type[BaseException] | None, exc_value: BaseException | None, traceback: TracebackType | None) -> None: ...
+
+class ImagePool(object):
+    max_images: int
+    max_files: int | None
+    max_memory: int | None
+    hits: int
+    misses: int
+    invalidations: int
+
+    def __init__(self, max_images: int = 100, max_files: int | None = None, max_memory: int | None = None) -> None: ...
+    def __len__(self) -> int: ...
+    @property
+    def memory(self) -> int: ...
+    def get(self, vips_filename: str, **kwargs: Any) -> Image: ...
+    def invalidate(self, vips_filename: str | None = None) -> None: ...
+    def clear(self) -> None: ...
+
 # Global functions
 
 # base.py
 def _to_string(cdata: Any) -> str: ...
+def _to_string_copy(cdata: Any) -> str: ...
 def _to_bytes(value: object) -> bytes: ...
 def leak_set(leak: bool) -> None: ...
 def shutdown() -> None: ...
+def concurrency_set(concurrency: int) -> None: ...
+def concurrency_get() -> int: ...
+def concurrency(concurrency: int) -> AbstractContextManager[None]: ...
+def tracked_get_mem() -> int: ...
+def tracked_get_mem_highwater() -> int: ...
+def tracked_get_allocs() -> int: ...
+def tracked_get_files() -> int: ...
 def version(flag: int) -> int: ...
 def get_suffixes() -> list[str]: ...
 def at_least_libvips(x: int, y: int) -> bool: ...
@@ -576,6 +708,19 @@ def cache_get_max() -> int: ...
 def cache_get_size() -> int: ...
 def cache_get_max_mem() -> int: ...
 def cache_get_max_files() -> int: ...
+def cache_set_stats(stats: bool) -> None: ...
+def cache_get_stats() -> dict[str, Any]: ...
+def cache_get_entries() -> list[dict[str, Any]]: ...
+def cache_reset_stats() -> None: ...
+def no_cache() -> AbstractContextManager[None]: ...
+def cache_scope() -> AbstractContextManager[CacheScope]: ...
+def estimate_set_trace(trace: bool) -> None: ...
+def estimate_trace() -> AbstractContextManager[None]: ...
+def loader_cache_set(enabled: bool) -> None: ...
+def loader_cache_get() -> bool: ...
+def loader_cache_get_stats() -> dict[str, int]: ...
+def loader_cache_clear() -> None: ...
+def warmup(operations: list[str] | None = ..., loaders: list[str] | None = ...) -> list[str]: ...
 def block_untrusted_set(state: bool) -> None: ...
 def operation_block_set(name: str, state: bool) -> None: ...
 
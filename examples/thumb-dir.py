@@ -7,26 +7,21 @@ https://libvips.github.io/pyvips/vimage.html?highlight=thumbnail#pyvips.Image.th
 """
 
 import os
-import multiprocessing
 import sys
 import pyvips
 
 
-def thumbnail(directory, filename):
-    try:
-        name, extension = os.path.splitext(filename)
-        thumb = pyvips.Image.thumbnail(f"{directory}/{filename}", 128)
-        thumb.write_to_file(f"{directory}/tn_{name}.jpg")
-    except pyvips.Error:
-        # ignore failures due to eg. not an image
-        pass
-
-
 def all_files(path):
     for (root, dirs, files) in os.walk(path):
         for file in files:
-            yield root, file
+            yield os.path.join(root, file)
+
 
+if __name__ == '__main__':
+    batch = pyvips.batch.thumbnail(all_files(sys.argv[1]), 128, 'tn_%s.jpg')
+    for result in batch:
+        if not result.ok:
+            # eg. not an image
+            print(f'{result.input}: {result.error.message}')
 
-with multiprocessing.Pool() as pool:
-    pool.starmap(thumbnail, all_files(sys.argv[1]))
+    print(batch.stats)
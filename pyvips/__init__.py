@@ -195,10 +195,21 @@ from .vinterpolate import *
 from .vconnection import *
 from .vsource import *
 from .vsourcecustom import *
+from .vrangesource import *
 from .vtarget import *
 from .vtargetcustom import *
+from .vmultiparttarget import *
+from .vteetarget import *
 from .voperation import *
 from .vimage import *
 from .vregion import *
+from .vscheduler import *
+from .vgovernor import *
+from .vestimate import *
+from .vautotune import *
+from .vpool import *
+from .vloader import *
+from . import batch
+from . import parallel
 
 __all__ = ['API_mode']
@@ -1,5 +1,8 @@
 # basic defs and link to ffi
 
+import os
+import threading
+from contextlib import contextmanager
 
 from pyvips import ffi, glib_lib, vips_lib, gobject_lib, \
     _to_string, _to_bytes, Error
@@ -20,6 +23,121 @@ def shutdown():
     vips_lib.vips_shutdown()
 
 
+def concurrency_set(concurrency):
+    """Set the number of worker threads libvips uses to render a pipeline.
+
+    This is a process-wide setting. Each image you evaluate starts its own
+    pool of this many worker threads, so if you run several pipelines at
+    once from separate Python threads, you'll usually want to divide your
+    cores between them.
+
+    Set 0 to go back to the default, which is the value of the
+    ``VIPS_CONCURRENCY`` environment variable, or the number of cores.
+
+    Args:
+        concurrency (int): The number of threads to use for each pipeline.
+
+    """
+
+    vips_lib.vips_concurrency_set(concurrency)
+
+
+def concurrency_get():
+    """Get the number of worker threads libvips uses to render a pipeline.
+
+    Returns:
+        int
+
+    """
+
+    return vips_lib.vips_concurrency_get()
+
+
+# the bounds set by all active concurrency() blocks, and the value to restore
+# when the last one exits
+_concurrency_lock = threading.Lock()
+_concurrency_bounds = []
+_concurrency_restore = None
+_concurrency_fork_registered = False
+
+
+@contextmanager
+def concurrency(concurrency):
+    """Bound the number of libvips worker threads within a block.
+
+    For example::
+
+        with pyvips.concurrency(2):
+            image.write_to_file('x.jpg')
+
+    Any pipeline which starts evaluation inside the block will use at most
+    this many worker threads. The previous setting is restored on exit.
+
+    The libvips setting is process-wide, so blocks running at the same time
+    in several Python threads share a single value: the smallest bound of
+    all the active blocks.
+
+    Args:
+        concurrency (int): The maximum number of threads to use for each
+            pipeline.
+
+    """
+
+    global _concurrency_restore, _concurrency_fork_registered
+
+    if concurrency < 1:
+        raise Error(f'bad concurrency {concurrency}')
+
+    with _concurrency_lock:
+        # don't fork while another thread holds the lock, or the child can
+        # never take it ... we only need this once someone uses the lock
+        if not _concurrency_fork_registered and \
+                hasattr(os, 'register_at_fork'):
+            os.register_at_fork(before=_concurrency_lock.acquire,
+                                after_in_parent=_concurrency_lock.release,
+                                after_in_child=_concurrency_lock.release)
+            _concurrency_fork_registered = True
+
+        if len(_concurrency_bounds) == 0:
+            _concurrency_restore = concurrency_get()
+        _concurrency_bounds.append(concurrency)
+        concurrency_set(min(_concurrency_bounds))
+
+    try:
+        yield
+    finally:
+        with _concurrency_lock:
+            _concurrency_bounds.remove(concurrency)
+            if len(_concurrency_bounds) == 0:
+                concurrency_set(_concurrency_restore)
+            else:
+                concurrency_set(min(_concurrency_bounds))
+
+
+def tracked_get_mem():
+    """Get the number of bytes libvips has allocated for pixel buffers.
+
+    This includes memory held by images in the operation cache.
+
+    """
+    return vips_lib.vips_tracked_get_mem()
+
+
+def tracked_get_mem_highwater():
+    """Get the largest number of bytes libvips has had allocated."""
+    return vips_lib.vips_tracked_get_mem_highwater()
+
+
+def tracked_get_allocs():
+    """Get the number of active libvips memory allocations."""
+    return vips_lib.vips_tracked_get_allocs()
+
+
+def tracked_get_files():
+    """Get the number of files libvips has open."""
+    return vips_lib.vips_tracked_get_files()
+
+
 def version(flag):
     """Get the major, minor or micro version number of the libvips library.
 
@@ -156,6 +274,13 @@ def flags_dict(gtype):
 __all__ = [
     'leak_set',
     'shutdown',
+    'concurrency_set',
+    'concurrency_get',
+    'concurrency',
+    'tracked_get_mem',
+    'tracked_get_mem_highwater',
+    'tracked_get_allocs',
+    'tracked_get_files',
     'version',
     'at_least_libvips',
     'type_find',
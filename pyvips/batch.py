@@ -0,0 +1,293 @@
+import concurrent.futures
+import concurrent.futures.process
+import multiprocessing
+import os
+import time
+
+import pyvips
+from pyvips import vips_lib, _to_bytes, _to_string_copy
+
+
+class BatchResult(object):
+    """The result of processing one item in a batch.
+
+    Attributes:
+        input (str): The input filename.
+        output (str): The filename that was written, without any save
+            options, or None on failure.
+        error (Error): The error for this item, or None on success.
+        seconds (float): The time the worker spent on this item.
+        bytes_written (int): The size of the output file.
+
+    """
+
+    def __init__(self, input, output=None, error=None, seconds=0.0,
+                 bytes_written=0):
+        self.input = input
+        self.output = output
+        self.error = error
+        self.seconds = seconds
+        self.bytes_written = bytes_written
+
+    @property
+    def ok(self):
+        """True if this item was processed successfully."""
+        return self.error is None
+
+    def __repr__(self):
+        if self.error is None:
+            return f'<BatchResult {self.input} -> {self.output}>'
+        else:
+            return f'<BatchResult {self.input} failed: {self.error.message}>'
+
+
+class BatchStats(object):
+    """Throughput statistics for a batch.
+
+    These are updated as each result is returned.
+
+    Attributes:
+        items (int): The number of items processed so far.
+        failures (int): The number of items which failed.
+        seconds (float): Wall-clock time since the batch started.
+        worker_seconds (float): The total time workers spent on items.
+        bytes_written (int): The total size of all output files.
+
+    """
+
+    def __init__(self):
+        self.items = 0
+        self.failures = 0
+        self.seconds = 0.0
+        self.worker_seconds = 0.0
+        self.bytes_written = 0
+
+    @property
+    def items_per_second(self):
+        """The number of items processed per second of wall-clock time."""
+        if self.seconds == 0:
+            return 0.0
+
+        return self.items / self.seconds
+
+    def _add(self, result, seconds):
+        self.items += 1
+        if result.error is not None:
+            self.failures += 1
+        self.seconds = seconds
+        self.worker_seconds += result.seconds
+        self.bytes_written += result.bytes_written
+
+    def __repr__(self):
+        return (f'<BatchStats {self.items} items, {self.failures} failed, '
+                f'{self.items_per_second:.1f} items/s>')
+
+
+class Batch(object):
+    """A batch of images being processed by a pool of worker processes.
+
+    Iterate over a batch to run it. Results are returned in the order they
+    complete, not the order of the inputs, and a failure on one item never
+    stops the batch. If a worker process dies, every item in flight at the
+    time fails, and the batch carries on with a new pool of workers. For
+    example::
+
+        batch = pyvips.batch.thumbnail(filenames, 128, 'tn_%s.jpg')
+        for result in batch:
+            if not result.ok:
+                print(f'{result.input}: {result.error}')
+        print(batch.stats)
+
+    Attributes:
+        stats (BatchStats): Throughput statistics, updated as results arrive.
+
+    """
+
+    def __init__(self, function, jobs, workers, threads_per_worker,
+                 cache_max, mp_context):
+        self._function = function
+        self._jobs = jobs
+        self._workers = workers
+        self._threads_per_worker = threads_per_worker
+        self._cache_max = cache_max
+        self._mp_context = mp_context
+
+        self.stats = BatchStats()
+
+    def _new_executor(self):
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=self._mp_context,
+            initializer=_init_worker,
+            initargs=(self._threads_per_worker, self._cache_max))
+
+    def __iter__(self):
+        start = time.perf_counter()
+        executor = self._new_executor()
+
+        # only keep a few jobs per worker in flight, so inputs can be a
+        # generator of any length
+        jobs = iter(self._jobs)
+        pending = {}
+
+        def submit():
+            nonlocal executor
+
+            job = next(jobs, None)
+            if job is None:
+                return
+
+            input, args = job
+            try:
+                future = executor.submit(self._function, *args)
+            except concurrent.futures.process.BrokenProcessPool:
+                # a worker died, so everything in flight on this pool fails
+                # (and is reported as a failure) ... carry on with the rest
+                # of the items in a new pool
+                executor.shutdown(wait=True)
+                executor = self._new_executor()
+                future = executor.submit(self._function, *args)
+            pending[future] = input
+
+        try:
+            for _ in range(2 * self._workers):
+                submit()
+
+            while len(pending) > 0:
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    input = pending.pop(future)
+                    result = _make_result(input, future)
+                    self.stats._add(result, time.perf_counter() - start)
+                    submit()
+
+                    yield result
+        finally:
+            # if the caller stops early, drop any work not yet started
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+
+def _init_worker(threads_per_worker, cache_max):
+    pyvips.concurrency_set(threads_per_worker)
+    if cache_max is not None:
+        pyvips.cache_set_max(cache_max)
+
+
+def _thumbnail_worker(input, output, size, kwargs):
+    # exceptions don't always survive pickling, so we send back plain values
+    start = time.perf_counter()
+    try:
+        image = pyvips.Image.thumbnail(input, size, **kwargs)
+        image.write_to_file(output)
+
+        pointer = vips_lib.vips_filename_get_filename(_to_bytes(output))
+        filename = _to_string_copy(pointer)
+
+        return (filename, os.path.getsize(filename), None, None,
+                time.perf_counter() - start)
+    except pyvips.Error as e:
+        return (None, 0, e.message, e.detail, time.perf_counter() - start)
+    except Exception as e:
+        return (None, 0, str(e), type(e).__name__,
+                time.perf_counter() - start)
+
+
+def _make_result(input, future):
+    try:
+        output, bytes_written, message, detail, seconds = future.result()
+    except Exception as e:
+        # the worker process died, perhaps
+        return BatchResult(input, error=pyvips.Error(str(e),
+                                                     type(e).__name__))
+
+    error = None
+    if message is not None:
+        error = pyvips.Error(message, detail)
+
+    return BatchResult(input, output, error, seconds, bytes_written)
+
+
+def _output_filename(input, output_spec):
+    if callable(output_spec):
+        return str(output_spec(input))
+
+    # like vipsthumbnail, %s is replaced by the input name without the
+    # suffix, and relative paths are relative to the input directory
+    directory, basename = os.path.split(str(input))
+    name, _ = os.path.splitext(basename)
+    filename = output_spec.replace('%s', name)
+    if not os.path.isabs(filename):
+        filename = os.path.join(directory, filename)
+
+    return filename
+
+
+def thumbnail(inputs, size, output_spec, workers=None,
+              threads_per_worker=None, cache_max=0, mp_context=None,
+              **kwargs):
+    """Thumbnail many images with a pool of worker processes.
+
+    Each input is processed with :meth:`.Image.thumbnail` and written with
+    :meth:`.Image.write_to_file`. Work is shared between ``workers``
+    processes, each running libvips with ``threads_per_worker`` threads.
+
+    ``output_spec`` works like the ``-o`` option of ``vipsthumbnail``:
+    ``%s`` is replaced by the input filename without its suffix, relative
+    paths are relative to the directory the input is in, and save options
+    can be given in square brackets. For example::
+
+        batch = pyvips.batch.thumbnail(filenames, 256, 'tn_%s.jpg[Q=85]',
+                                       crop='attention')
+        for result in batch:
+            print(result)
+
+    will write ``photos/tn_x.jpg`` for ``photos/x.png``. ``output_spec`` can
+    also be a function which is given an input filename and returns an
+    output filename.
+
+    Worker processes are started with the ``spawn`` method by default,
+    since libvips runs background threads, and forking a process with
+    threads running is unsafe. This means your program will need the usual
+    ``if __name__ == '__main__':`` guard.
+
+    Args:
+        inputs (Iterable[str]): The input filenames. This can be a
+            generator.
+        size (int): The size to thumbnail to, see :meth:`.Image.thumbnail`.
+        output_spec (str, Callable[[str], str]): How to name output files.
+        workers (int): The number of worker processes. Defaults to the
+            number of CPUs.
+        threads_per_worker (int): The libvips concurrency in each worker.
+            Defaults to sharing the CPUs between the workers.
+        cache_max (int): The size of the operation cache in each worker.
+            Each input is only processed once, so by default there is no
+            cache. Use None to keep the libvips default.
+        mp_context: A multiprocessing context to start workers with.
+
+    Other keyword arguments are passed to :meth:`.Image.thumbnail`.
+
+    Returns:
+        A :class:`Batch`. Iterate over it to run the batch and get a
+        :class:`BatchResult` for each input.
+
+    """
+    cpus = os.cpu_count() or 1
+    if workers is None:
+        workers = cpus
+    if threads_per_worker is None:
+        threads_per_worker = max(1, cpus // workers)
+    if mp_context is None:
+        mp_context = multiprocessing.get_context('spawn')
+
+    jobs = ((str(input), (str(input), _output_filename(input, output_spec),
+                          size, kwargs))
+            for input in inputs)
+
+    return Batch(_thumbnail_worker, jobs, workers, threads_per_worker,
+                 cache_max, mp_context)
+
+
+__all__ = ['Batch', 'BatchResult', 'BatchStats', 'thumbnail']
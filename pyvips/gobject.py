@@ -184,8 +184,9 @@ class GObject(object):
         # them being GCed
         # the callback might be a bound method (a closure) rather than a simple
         # function, so it can vanish
-        self._handles.append(handle)
-        self._handles.append(callback)
+        # a single extend keeps the pair together if several threads connect
+        # at once, even without a GIL
+        self._handles.extend((handle, callback))
 
         gobject_lib.g_signal_connect_data(go, _to_bytes(name),
                                           _marshalers[name],
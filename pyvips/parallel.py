@@ -0,0 +1,175 @@
+import collections
+import concurrent.futures
+import os
+import time
+
+import pyvips
+
+# marks the end of the input, since items can be None
+_END = object()
+
+
+def _cpu_count():
+    # the CPUs we may run on, not the CPUs in the machine
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+def _timed_call(fn, item):
+    start = time.perf_counter()
+    try:
+        return fn(item), None, time.perf_counter() - start
+    except Exception as e:
+        return None, e, time.perf_counter() - start
+
+
+class ParallelMap(object):
+    """A map of a function over many items on a pool of threads.
+
+    Iterate over this to run the map. Results are returned in the order of
+    the inputs. If a call raises an exception, the exception is raised again
+    when iteration reaches that item, and any jobs which have not started are
+    cancelled. For example::
+
+        def small(filename):
+            image = pyvips.Image.thumbnail(filename, 128)
+            return image.write_to_buffer('.webp')
+
+        jobs = pyvips.parallel.map(small, filenames)
+        for filename, data in zip(filenames, jobs):
+            print(f'{filename}: {len(data)} bytes')
+        print(f'{jobs.jobs_per_second:.1f} images/s')
+
+    Iterate to the end, or stop early with ``close()``, so the libvips
+    concurrency setting is restored.
+
+    Attributes:
+        workers (int): The number of worker threads.
+        threads_per_worker (int): The libvips concurrency while the map runs.
+        timings (list[float]): The time each call took, in seconds, in input
+            order. This grows as results are returned.
+        seconds (float): Wall-clock time since the map started.
+
+    """
+
+    def __init__(self, fn, items, workers, threads_per_worker):
+        self._fn = fn
+        self._items = items
+
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.timings = []
+        self.seconds = 0.0
+
+        self._iterator = None
+
+    @property
+    def jobs_per_second(self):
+        """The number of calls completed per second of wall-clock time."""
+        if self.seconds == 0:
+            return 0.0
+
+        return len(self.timings) / self.seconds
+
+    def __iter__(self):
+        if self._iterator is None:
+            self._iterator = self._run()
+
+        return self._iterator
+
+    def __next__(self):
+        return next(iter(self))
+
+    def close(self):
+        """Stop the map, cancelling any jobs which have not started."""
+        if self._iterator is not None:
+            self._iterator.close()
+
+    def _run(self):
+        start = time.perf_counter()
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix='pyvips-parallel')
+
+        # only keep a few jobs per worker in flight, so items can be a
+        # generator of any length
+        items = iter(self._items)
+        pending = collections.deque()
+
+        def submit():
+            item = next(items, _END)
+            if item is not _END:
+                pending.append(executor.submit(_timed_call, self._fn, item))
+
+        try:
+            # each pipeline gets a share of the CPUs, so workers running at
+            # the same time neither idle nor oversubscribe the machine
+            with pyvips.concurrency(self.threads_per_worker):
+                for _ in range(2 * self.workers):
+                    submit()
+
+                while len(pending) > 0:
+                    result, error, seconds = pending.popleft().result()
+                    self.timings.append(seconds)
+                    self.seconds = time.perf_counter() - start
+                    if error is not None:
+                        raise error
+                    submit()
+
+                    yield result
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+
+def map(fn, items, workers=None, threads_per_worker=None):
+    """Run a function over many items on a pool of threads.
+
+    This is useful for processing many small, independent images. pyvips
+    releases the GIL while libvips runs, so Python threads can drive
+    several pipelines at once with no need for multiprocessing.
+
+    Small images give libvips little to parallelise inside a single
+    pipeline, so it's usually quicker to run a pipeline per CPU, each with a
+    single libvips thread. By default, the CPUs this process may use are
+    shared out between ``workers`` threads, and the libvips concurrency is
+    set to match while the map runs. For example::
+
+        def average(filename):
+            return pyvips.Image.new_from_file(filename).avg()
+
+        averages = list(pyvips.parallel.map(average, filenames))
+
+    Args:
+        fn (Callable[[Any], Any]): The function to call. It is called with
+            each item in turn, on one of the worker threads.
+        items (Iterable): The items to process. This can be a generator.
+        workers (int): The number of worker threads. Defaults to the number
+            of CPUs this process can use.
+        threads_per_worker (int): The libvips concurrency for each pipeline.
+            Defaults to sharing the CPUs between the workers.
+
+    Returns:
+        A :class:`ParallelMap`. Iterate over it to run the jobs and get the
+        result of each call, in input order.
+
+    Raises:
+        :class:`.Error`
+
+    """
+
+    cpus = _cpu_count()
+    if workers is None:
+        workers = cpus
+    if workers < 1:
+        raise pyvips.Error(f'bad number of workers {workers}')
+    if threads_per_worker is None:
+        threads_per_worker = max(1, cpus // workers)
+
+    return ParallelMap(fn, items, workers, threads_per_worker)
+
+
+__all__ = ['ParallelMap', 'map']
@@ -0,0 +1,271 @@
+import logging
+import os
+import stat
+import threading
+
+import pyvips
+
+logger = logging.getLogger(__name__)
+
+
+def _rss():
+    # the resident set size of this process, or None if we can't find it
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+def _open_files():
+    # the number of regular files this process has open, or the files libvips
+    # has open if we can't count them ... sockets and pipes don't count,
+    # since shrinking the cache won't close them
+    try:
+        names = os.listdir('/proc/self/fd')
+    except OSError:
+        return pyvips.tracked_get_files()
+
+    files = 0
+    for name in names:
+        try:
+            if stat.S_ISREG(os.stat(os.path.join('/proc/self/fd', name))
+                            .st_mode):
+                files += 1
+        except OSError:
+            # closed since we listed it
+            pass
+
+    return files
+
+
+class CacheAutotuner(object):
+    """Adjust the operation cache limits to suit the workload.
+
+    Every ``interval`` seconds, the autotuner samples the operation cache
+    hit and eviction counts (see :func:`.cache_get_stats`, the autotuner
+    turns statistics on until :meth:`stop`), the process memory use, and
+    the number of regular files the process has open, and adjusts the
+    limits set by :func:`.cache_set_max`, :func:`.cache_set_max_mem` and
+    :func:`.cache_set_max_files`:
+
+    - If the process is over ``max_memory`` or ``max_files``, the cache
+      limits are halved.
+    - If the cache evicted operations which were then missed, it's too
+      small for the workload, so the limits are doubled, as far as the
+      ceilings allow.
+    - If no operations were called, the limits are halved, to give memory
+      and files back during idle periods.
+
+    The memory the cache can use is also capped at ``max_memory``, less the
+    memory the process is using for things other than libvips images. For
+    example::
+
+        tuner = pyvips.CacheAutotuner(max_memory=4 << 30, max_files=500)
+        tuner.start()
+        ...
+        tuner.stop()
+
+    Attributes:
+        max_memory (int): The process memory ceiling, in bytes.
+        max_files (int): The open file ceiling.
+        interval (float): Seconds between samples.
+        sample (dict): The last sample taken, or None.
+
+    """
+
+    def __init__(self, max_memory, max_files=None, interval=1.0,
+                 min_memory=16 << 20, min_operations=100, max_operations=10000,
+                 min_files=10):
+        """Make a new autotuner.
+
+        Args:
+            max_memory (int): The process memory ceiling, in bytes.
+            max_files (int): The open file ceiling. Defaults to half the
+                process file limit.
+            interval (float): Seconds between samples.
+            min_memory (int): Never shrink the cache memory limit below
+                this.
+            min_operations (int): Never shrink the cache below this many
+                operations.
+            max_operations (int): Never grow the cache beyond this many
+                operations.
+            min_files (int): Never shrink the cache file limit below this.
+
+        """
+
+        if max_files is None:
+            try:
+                import resource
+                soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+                max_files = max(min_files, soft // 2)
+            except ImportError:
+                max_files = 256
+
+        self.max_memory = max_memory
+        self.max_files = max_files
+        self.interval = interval
+        self.sample = None
+
+        self._min_memory = min_memory
+        self._min_operations = min_operations
+        self._max_operations = max_operations
+        self._min_files = min_files
+
+        self._last = None
+        self._restore = None
+        # the statistics setting before we turned it on, if we did
+        self._stats = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def step(self):
+        """Take a sample and adjust the cache limits.
+
+        The background thread calls this every ``interval`` seconds. You can
+        call it yourself instead of starting the thread.
+
+        Returns:
+            The sample, a dict of the figures used and the new limits.
+
+        """
+
+        # the first sample only sets a baseline for the counts
+        first = self._last is None
+        if first and self._stats is None:
+            self._stats = pyvips.voperation._cache_stats
+            pyvips.cache_set_stats(True)
+        stats = pyvips.cache_get_stats()
+        if first:
+            self._last = stats
+        hits = stats['hits'] - self._last['hits']
+        misses = stats['misses'] - self._last['misses']
+        evictions = stats['evictions'] - self._last['evictions']
+        self._last = stats
+
+        tracked = stats['memory']
+        rss = _rss()
+        if rss is None:
+            rss = tracked
+        files = _open_files()
+
+        max_mem = stats['max_mem']
+        max_operations = stats['max']
+        max_files = stats['max_files']
+
+        if rss > self.max_memory or files > self.max_files:
+            state = 'over'
+            scale = 0.5
+        elif first:
+            state = 'steady'
+            scale = 1
+        elif evictions > 0 and misses > 0:
+            state = 'thrashing'
+            scale = 2
+        elif hits + misses == 0:
+            state = 'idle'
+            scale = 0.5
+        else:
+            state = 'steady'
+            scale = 1
+
+        # the most the cache can use without pushing us over the ceiling
+        headroom = self.max_memory - max(0, rss - tracked)
+
+        max_mem = int(max_mem * scale)
+        max_mem = max(self._min_memory, min(max_mem, headroom))
+        max_operations = int(max_operations * scale)
+        max_operations = max(self._min_operations,
+                             min(max_operations, self._max_operations))
+        max_files = int(max_files * scale)
+        max_files = max(self._min_files, min(max_files, self.max_files))
+
+        pyvips.cache_set_max_mem(max_mem)
+        pyvips.cache_set_max(max_operations)
+        pyvips.cache_set_max_files(max_files)
+
+        self.sample = {
+            'state': state,
+            'hits': hits,
+            'misses': misses,
+            'evictions': evictions,
+            'rss': rss,
+            'memory': tracked,
+            'files': files,
+            'max_mem': max_mem,
+            'max': max_operations,
+            'max_files': max_files,
+        }
+        logger.debug('CacheAutotuner: %s', self.sample)
+
+        return self.sample
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.step()
+            except Exception as e:
+                # never let the tuner thread die
+                logger.warning('CacheAutotuner: %s', e)
+
+    def start(self):
+        """Start tuning in a background thread.
+
+        The current limits are saved, and restored by :meth:`stop`.
+
+        """
+
+        if self._thread is not None:
+            return
+
+        self._restore = (pyvips.cache_get_max(),
+                         pyvips.cache_get_max_mem(),
+                         pyvips.cache_get_max_files())
+        self._last = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='pyvips-cache-autotuner')
+        self._thread.start()
+
+    def stop(self, restore=True):
+        """Stop the background thread.
+
+        Operation cache statistics are put back to how they were before the
+        first sample, even if you called :meth:`step` yourself.
+
+        Args:
+            restore (bool): Put back the limits saved by :meth:`start`.
+
+        """
+
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+            if restore:
+                max_operations, max_mem, max_files = self._restore
+                pyvips.cache_set_max(max_operations)
+                pyvips.cache_set_max_mem(max_mem)
+                pyvips.cache_set_max_files(max_files)
+
+        if self._stats is not None:
+            pyvips.cache_set_stats(self._stats)
+            self._stats = None
+        self._last = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+__all__ = ['CacheAutotuner']
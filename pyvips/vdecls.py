@@ -77,6 +77,9 @@ def cdefs(features):
 
         void vips_shutdown (void);
 
+        void vips_concurrency_set (int concurrency);
+        int vips_concurrency_get (void);
+
         const char* vips_error_buffer (void);
         void vips_error_clear (void);
         void vips_error_freeze (void);
@@ -304,6 +307,12 @@ def cdefs(features):
 
         VipsImage* vips_image_copy_memory (VipsImage* image);
 
+        int vips_image_get_width (const VipsImage* image);
+        int vips_image_get_height (const VipsImage* image);
+        int vips_image_get_bands (const VipsImage* image);
+        int vips_image_get_format (const VipsImage* image);
+        guint64 vips_format_sizeof (int format);
+
         GType vips_image_get_typeof (const VipsImage* image,
             const char* name);
         int vips_image_get (const VipsImage* image,
@@ -315,6 +324,7 @@ def cdefs(features):
         char* vips_filename_get_filename (const char* vips_filename);
         char* vips_filename_get_options (const char* vips_filename);
 
+        VipsImage* vips_image_new (void);
         VipsImage* vips_image_new_temp_file (const char* format);
 
         int vips_image_write (VipsImage* image, VipsImage* out);
@@ -343,6 +353,7 @@ def cdefs(features):
 
         VipsOperation* vips_cache_operation_build (VipsOperation* operation);
         void vips_object_unref_outputs (VipsObject* object);
+        int vips_object_build (VipsObject* object);
 
         int vips_operation_get_flags (VipsOperation* operation);
 
@@ -356,6 +367,11 @@ def cdefs(features):
         size_t vips_cache_get_max_mem();
         int vips_cache_get_max_files();
 
+        size_t vips_tracked_get_mem (void);
+        size_t vips_tracked_get_mem_highwater (void);
+        int vips_tracked_get_allocs (void);
+        int vips_tracked_get_files (void);
+
     '''
 
     # we must only define this in ABI mode ... in API mode we use
@@ -430,6 +446,9 @@ def cdefs(features):
             VipsTarget* vips_target_new_to_descriptor (int descriptor);
             VipsTarget* vips_target_new_to_file (const char* filename);
             VipsTarget* vips_target_new_to_memory (void);
+            int vips_target_write (VipsTarget* target,
+                const void* data, size_t length);
+            void vips_target_finish (VipsTarget* target);
 
             typedef ... VipsTargetCustom;
 
@@ -441,6 +460,8 @@ def cdefs(features):
                 void*);
 
             const char* vips_foreign_find_load_source (VipsSource *source);
+            unsigned char* vips_source_sniff (VipsSource* source,
+                size_t length);
             const char* vips_foreign_find_save_target (const char* suffix);
 
         '''
@@ -450,6 +471,8 @@ def cdefs(features):
             extern "Python" int _marshal_end (VipsTarget*,
                 void*);
 
+            int vips_target_end (VipsTarget* target);
+
             void vips_block_untrusted_set (int state);
             void vips_operation_block_set (const char *name, int state);
 
@@ -0,0 +1,201 @@
+import os
+
+import pyvips
+
+# the libvips defaults for pipeline tiles and strips
+_TILE_SIZE = 128
+_STRIP_HEIGHT = 16
+
+# the defaults for tilecache
+_TILECACHE_TILE_SIZE = 128
+_TILECACHE_MAX_TILES = 1000
+
+# loaders which can read any part of the image on demand, so random access
+# doesn't need a decoded copy
+_RANDOM_ACCESS_LOADERS = ['vipsload', 'tiffload', 'openslideload',
+                          'jp2kload', 'dcrawload']
+
+# libvips decodes random access images larger than this to a temporary
+# file rather than to memory
+_DISC_THRESHOLD = 100 * 1024 * 1024
+
+
+def _disc_threshold():
+    value = os.environ.get('VIPS_DISC_THRESHOLD')
+    if value is None:
+        return _DISC_THRESHOLD
+
+    value = value.strip().lower()
+    scale = 1
+    for suffix, factor in [('gb', 1 << 30), ('mb', 1 << 20), ('kb', 1 << 10),
+                           ('g', 1 << 30), ('m', 1 << 20), ('k', 1 << 10),
+                           ('b', 1)]:
+        if value.endswith(suffix):
+            value = value[:-len(suffix)]
+            scale = factor
+            break
+
+    try:
+        return int(value) * scale
+    except ValueError:
+        return _DISC_THRESHOLD
+
+
+def _is_loader(name):
+    return name.endswith('load') or \
+        name.endswith('load_buffer') or \
+        name.endswith('load_source')
+
+
+def _is_thumbnail(name):
+    return name in ('thumbnail', 'thumbnail_buffer', 'thumbnail_source')
+
+
+def _is_sequential(options):
+    access = options.get('access')
+    if access is None:
+        return options.get('sequential', False) is True or \
+            'sequential' in options.get('string_options', '')
+
+    if isinstance(access, str):
+        return access.startswith('sequential')
+
+    # the enum values for sequential and sequential-unbuffered
+    return access in (1, 2)
+
+
+def _tilecache_memory(header, options):
+    width, height, sizeof_pel = header
+    tile_width = options.get('tile_width', _TILECACHE_TILE_SIZE)
+    tile_height = options.get('tile_height', _TILECACHE_TILE_SIZE)
+    max_tiles = options.get('max_tiles', _TILECACHE_MAX_TILES)
+
+    tiles_across = -(-width // tile_width)
+    tiles_down = -(-height // tile_height)
+    tiles = tiles_across * tiles_down
+    if max_tiles >= 0:
+        tiles = min(tiles, max_tiles)
+
+    return tiles * tile_width * tile_height * sizeof_pel
+
+
+def _linecache_memory(header, options, threads):
+    # linecache and sequential keep a few strips for each thread
+    width, _, sizeof_pel = header
+    tile_height = options.get('tile_height', _STRIP_HEIGHT)
+
+    return 2 * threads * tile_height * width * sizeof_pel
+
+
+class Estimate(object):
+    """A prediction of the cost of rendering an image.
+
+    See :meth:`.Image.estimate`.
+
+    Attributes:
+        peak_memory (int): The predicted peak memory use, in bytes.
+        input_bytes (int): The number of bytes of pixels loaders will
+            decode.
+        disc_bytes (int): The predicted size of temporary files for
+            random access loads which are too large to decode to memory.
+        access (str): ``'sequential'`` if every load is sequential,
+            otherwise ``'random'``.
+        operations (int): The number of operations in the pipeline.
+        memory (dict[str, int]): Where ``peak_memory`` comes from:
+            ``'regions'`` for per-thread tile buffers, ``'caches'`` for
+            tile and line caches, ``'copies'`` for images rendered to memory
+            (:meth:`.Image.copy_memory`, copies made by draw operations, and
+            random access decodes), and ``'output'`` for the buffers the
+            final write uses.
+
+    """
+
+    def __init__(self):
+        self.peak_memory = 0
+        self.input_bytes = 0
+        self.disc_bytes = 0
+        self.access = 'sequential'
+        self.operations = 0
+        self.memory = {'regions': 0, 'caches': 0, 'copies': 0, 'output': 0}
+
+    def __repr__(self):
+        return (f'<Estimate peak_memory={self.peak_memory}, '
+                f'input_bytes={self.input_bytes}, access={self.access}>')
+
+
+def _estimate(image, threads=None):
+    if threads is None:
+        threads = pyvips.concurrency_get()
+
+    disc_threshold = _disc_threshold()
+    estimate = Estimate()
+
+    # walk the graph without recursion, since pipelines can be very long,
+    # and visit each node once, since graphs can share branches
+    top = image._node()
+    seen = set()
+    stack = [top]
+    while len(stack) > 0:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+
+        name, inputs, options, modify, header = node
+        width, height, sizeof_pel = header
+        size = width * height * sizeof_pel
+
+        # each thread keeps a region on every image in the pipeline
+        region = min(width, _TILE_SIZE) * min(height, _TILE_SIZE) * sizeof_pel
+        estimate.memory['regions'] += threads * region
+
+        # images with no operation are already in memory, or were made
+        # outside pyvips
+        if name is None:
+            continue
+
+        if name.startswith('Vips'):
+            # new_from_file() and friends call loaders by type name
+            name = pyvips.nickname_find(pyvips.type_from_name(name))
+        estimate.operations += 1
+        stack.extend(inputs)
+
+        if name == 'copy_memory':
+            estimate.memory['copies'] += size
+        elif name in ('tilecache', 'cache'):
+            estimate.memory['caches'] += _tilecache_memory(header, options)
+        elif name in ('linecache', 'sequential'):
+            estimate.memory['caches'] += \
+                _linecache_memory(header, options, threads)
+        elif _is_thumbnail(name):
+            # thumbnail always loads sequentially, and shrinks on load where
+            # it can, so all we know is the size it produces
+            estimate.input_bytes += size
+        elif _is_loader(name):
+            estimate.input_bytes += size
+            if not _is_sequential(options):
+                estimate.access = 'random'
+                if not any(name.startswith(x)
+                           for x in _RANDOM_ACCESS_LOADERS):
+                    if size > disc_threshold:
+                        estimate.disc_bytes += size
+                    else:
+                        estimate.memory['copies'] += size
+
+        # draw operations work on a copy of the image in memory, the same
+        # size as the result
+        if modify:
+            estimate.memory['copies'] += size
+
+    # the final write has a pair of output buffers, each a strip for every
+    # thread
+    width, _, sizeof_pel = top[4]
+    estimate.memory['output'] = \
+        2 * threads * _STRIP_HEIGHT * width * sizeof_pel
+
+    estimate.peak_memory = sum(estimate.memory.values())
+
+    return estimate
+
+
+__all__ = ['Estimate']
@@ -0,0 +1,165 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pyvips
+from pyvips import Error
+from pyvips.vimage import _format_sizeof
+
+
+class MemoryGovernor(object):
+    """Hold back renders which would use too much memory.
+
+    Before each render, ask the governor to admit it. The render is admitted
+    if the memory libvips has allocated now, plus the estimated cost of all
+    the renders admitted but not yet finished, plus the cost of this render,
+    fits in the budget. Memory allocated since the first of the unfinished
+    renders was admitted is taken to be theirs, up to their estimated cost,
+    so it is not counted twice. If the render does not fit, the governor
+    either waits for memory to be freed, or rejects the render with an
+    :class:`.Error`. For example::
+
+        governor = pyvips.MemoryGovernor(1 << 30)
+
+        image = pyvips.Image.new_from_file(filename)
+        with governor.admit(image):
+            image.write_to_file('x.png')
+
+    The cost of a render is estimated from the image header as the size of
+    the uncompressed image. This is pessimistic for pipelines which stream,
+    but a good guide for ones which must decode the whole image, for
+    example, anything using random access.
+
+    libvips memory includes images held by the operation cache, so you may
+    want to limit the cache with :func:`.cache_set_max_mem` as well.
+
+    Attributes:
+        budget (int): The memory budget in bytes.
+        reserved (int): The total cost of all admitted renders.
+
+    """
+
+    def __init__(self, budget, block=True, timeout=None, poll=0.05):
+        """Make a new memory governor.
+
+        Args:
+            budget (int): The memory budget, in bytes.
+            block (bool): Wait for memory when a render doesn't fit, rather
+                than rejecting it.
+            timeout (float): The longest to wait, in seconds, or None to
+                wait for ever.
+            poll (float): How often to check libvips memory use while
+                waiting, in seconds. Memory can be freed by renders the
+                governor doesn't know about, so we can't just wait for an
+                admitted render to finish.
+
+        """
+
+        self.budget = budget
+        self.reserved = 0
+
+        # libvips memory when the governor last had nothing admitted
+        self._baseline = 0
+
+        self._block = block
+        self._timeout = timeout
+        self._poll = poll
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def estimate(image):
+        """Estimate the memory needed to render an image.
+
+        Args:
+            image (Image): The image to estimate.
+
+        Returns:
+            The size of the uncompressed image, in bytes.
+
+        """
+
+        return image.width * image.height * image.bands * \
+            _format_sizeof(image.format)
+
+    def _fits(self, cost):
+        # libvips memory includes whatever the admitted renders have
+        # allocated so far, and that is already covered by their
+        # reservation, so take it off ... growth since the first of them was
+        # admitted is our guess at their use
+        memory = pyvips.tracked_get_mem()
+        used = min(max(0, memory - self._baseline), self.reserved)
+
+        return memory - used + self.reserved + cost <= self.budget
+
+    def _acquire(self, cost, block, timeout):
+        if cost > self.budget:
+            raise Error('not enough memory',
+                        f'render needs {cost} bytes, '
+                        f'budget is {self.budget} bytes')
+
+        with self._condition:
+            if timeout is not None:
+                deadline = time.monotonic() + timeout
+
+            while not self._fits(cost):
+                if not block:
+                    raise Error('not enough memory',
+                                f'render needs {cost} bytes, '
+                                f'{self.reserved} bytes reserved, '
+                                f'{pyvips.tracked_get_mem()} bytes in use')
+
+                wait = self._poll
+                if timeout is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Error('not enough memory',
+                                    f'timeout waiting for {cost} bytes')
+                    wait = min(wait, remaining)
+
+                self._condition.wait(wait)
+
+            if self.reserved == 0:
+                self._baseline = pyvips.tracked_get_mem()
+            self.reserved += cost
+
+    def _release(self, cost):
+        with self._condition:
+            self.reserved -= cost
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, image=None, cost=None, block=None, timeout=None):
+        """Admit a render.
+
+        Use this as a context manager around the render. The estimated cost
+        is held until the block exits.
+
+        Args:
+            image (Image): The image which will be rendered. Its cost is
+                estimated with :meth:`estimate`.
+            cost (int): The cost in bytes, if you know better.
+            block (bool): Override the governor setting for this render.
+            timeout (float): Override the governor setting for this render.
+
+        Raises:
+            :class:`.Error`
+
+        """
+
+        if cost is None:
+            if image is None:
+                raise Error('admit needs an image or a cost')
+            cost = self.estimate(image)
+        if block is None:
+            block = self._block
+        if timeout is None:
+            timeout = self._timeout
+
+        self._acquire(cost, block, timeout)
+        try:
+            yield
+        finally:
+            self._release(cost)
+
+
+__all__ = ['MemoryGovernor']
@@ -2,8 +2,10 @@
 
 import array
 import numbers
+import queue
 import struct
 import sys
+import threading
 
 import pyvips
 from pyvips import ffi, glib_lib, vips_lib, Error, _to_bytes, \
@@ -123,6 +125,12 @@ TYPESTR_TO_FORMAT = {'|b1': 'uchar',
 # Rules for the mapping between libvips formats and numpy typestrings
 FORMAT_TO_TYPESTR = dict((v, k) for k, v in TYPESTR_TO_FORMAT.items())
 
+
+def _format_sizeof(format):
+    # bytes in one band element, eg. 8 for complex
+    return int(FORMAT_TO_TYPESTR[format][2:])
+
+
 # see https://docs.python.org/3/library/struct.html
 FORMAT_TO_PYFORMAT = {'uchar': 'B',
                       'char': 'c',
@@ -217,6 +225,212 @@ def _guess_interpretation(bands, format):
     return interp
 
 
+# the producer side of Image.iter_encode() ... this must not reference the
+# iterator, so that an abandoned iterator can be GCd and stop the encode
+class _EncodeStream(object):
+    # marks the end of the stream in the queue
+    END = object()
+
+    def __init__(self, chunk_size, queue_size):
+        self.chunk_size = chunk_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.cancelled = False
+
+    def put(self, item):
+        # block while the queue is full, but give up if the consumer goes away
+        while not self.cancelled:
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def write_handler(self, chunk):
+        # writes larger than the buffer come straight through, so we may need
+        # to split them
+        for i in range(0, len(chunk), self.chunk_size):
+            if not self.put(bytes(chunk[i:i + self.chunk_size])):
+                return -1
+
+        return len(chunk)
+
+
+# the iterator for Image.iter_encode()
+class _EncodeIterator(object):
+    def __init__(self, image, format_string, chunk_size, queue_size, kwargs):
+        stream = _EncodeStream(chunk_size, queue_size)
+        self._stream = stream
+        self._finished = False
+
+        target = pyvips.TargetCustom(buffer_size=chunk_size)
+        target.on_write(stream.write_handler)
+        target.on_end(lambda: 0)
+
+        def render():
+            try:
+                image.write_to_target(target, format_string, **kwargs)
+                stream.put(_EncodeStream.END)
+            except Exception as e:
+                stream.put(e)
+
+        self._thread = threading.Thread(target=render, daemon=True)
+        self._thread.start()
+
+    def _get(self):
+        # the next chunk, or END ... poll, so close() can always wake us,
+        # even if the sentinel it sends can't get into a full queue
+        while True:
+            if self._finished or self._stream.cancelled:
+                return _EncodeStream.END
+
+            try:
+                item = self._stream.queue.get(timeout=0.1)
+                break
+            except queue.Empty:
+                pass
+
+        if self._stream.cancelled:
+            return _EncodeStream.END
+
+        if item is _EncodeStream.END or isinstance(item, Exception):
+            self._finished = True
+            self._thread.join()
+            if isinstance(item, Exception):
+                raise item
+
+        return item
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = self._get()
+        if item is _EncodeStream.END:
+            raise StopIteration
+
+        return item
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        try:
+            item = await loop.run_in_executor(None, self._get)
+        except asyncio.CancelledError:
+            # the executor thread will still take the next chunk, so we can't
+            # carry on ... stop the encode, which also wakes the thread up
+            self.close()
+            raise
+
+        if item is _EncodeStream.END:
+            raise StopAsyncIteration
+
+        return item
+
+    def close(self):
+        """Stop encoding and discard any pending chunks."""
+        self._stream.cancelled = True
+        self._finished = True
+
+        # wake any thread waiting in _get()
+        try:
+            self._stream.queue.put_nowait(_EncodeStream.END)
+        except queue.Full:
+            pass
+
+    def __del__(self):
+        self._stream.cancelled = True
+
+
+# keeps the encoders in Image.write_many() in step ... an encoder which gets
+# more than lag pixels ahead of the slowest one waits in its ::eval handler,
+# so the tiles it needs are still in the shared cache when the others get there
+class _FanOut(object):
+    def __init__(self, n_encoders, lag):
+        self.lag = lag
+        self.condition = threading.Condition()
+        self.progress = [0] * n_encoders
+        self.local = threading.local()
+
+    def start(self, index):
+        self.local.index = index
+
+    def stop(self, index):
+        # finished (or failed) encoders never hold the others back
+        with self.condition:
+            self.progress[index] = float('inf')
+            self.condition.notify_all()
+
+    def eval_handler(self, image, progress):
+        index = getattr(self.local, 'index', None)
+        if index is None:
+            return
+
+        with self.condition:
+            self.progress[index] = progress.npels
+            self.condition.notify_all()
+            while self.progress[index] > min(self.progress) + self.lag:
+                self.condition.wait()
+
+
+# header fields we send with copy() when unpickling a shared memory image
+_PICKLE_HEADER = ['coding', 'interpretation',
+                  'xres', 'yres', 'xoffset', 'yoffset']
+
+# header fields we never pickle as metadata
+_PICKLE_SKIP = _PICKLE_HEADER + ['width', 'height', 'bands', 'format',
+                                 'filename']
+
+
+# the header fields Image.estimate() needs: width, height and bytes per pixel
+def _header(pointer):
+    format = vips_lib.vips_image_get_format(pointer)
+
+    return (vips_lib.vips_image_get_width(pointer),
+            vips_lib.vips_image_get_height(pointer),
+            vips_lib.vips_image_get_bands(pointer) *
+            vips_lib.vips_format_sizeof(format))
+
+
+# metadata types we can pickle by value
+def _pickle_types():
+    return [GValue.gbool_type, GValue.gint_type, GValue.gdouble_type,
+            GValue.gstr_type, GValue.refstr_type, GValue.blob_type,
+            GValue.array_int_type, GValue.array_double_type]
+
+
+def _unpickle_file(vips_filename, kwargs):
+    return Image.new_from_file(vips_filename, **kwargs)
+
+
+# a block of shared memory holding the pixels of a pickled image ... the
+# sending image owns it, and removes it when it is freed
+def _unpickle_shared(name, width, height, bands, format, header, metadata):
+    from multiprocessing import shared_memory
+
+    shm = shared_memory.SharedMemory(name=name)
+
+    # the block is ours now ... remove the name, and the memory is freed when
+    # the last process unmaps it. This also drops the registration the sender
+    # made with the resource tracker, so nothing removes it twice
+    if sys.platform != 'win32':
+        shm.unlink()
+
+    image = Image.new_from_memory(shm.buf, width, height, bands, format)
+    image._references.append(shm)
+
+    image = image.copy(**header)
+    for type_name, field, value in metadata:
+        image.set_type(pyvips.type_from_name(type_name), field, value)
+
+    return image
+
+
 # metaclass for Image ... getattr on this implements the class methods
 class ImageType(type):
     def __getattr__(cls, name):
@@ -242,7 +456,7 @@ class Image(pyvips.VipsObject, metaclass=ImageType):
     """Wrap a VipsImage object.
 
     """
-    __slots__ = ('_references',)
+    __slots__ = ('_references', '_recipe', '_operation')
 
     # private static
 
@@ -263,6 +477,12 @@ class Image(pyvips.VipsObject, metaclass=ImageType):
         # Python checks memoryview equality with hash functions, not pointer
         # equality
         self._references = []
+        # the filename and options this image was loaded with, if any, for
+        # pickling
+        self._recipe = None
+        # a summary of the operation which made this image, if any, see
+        # _node()
+        self._operation = None
         # logger.debug('Image.__init__: pointer = %s', pointer)
         super(Image, self).__init__(pointer)
 
@@ -309,6 +529,13 @@ class Image(pyvips.VipsObject, metaclass=ImageType):
                 the first serious error in the file. By default, libvips
                 will attempt to read everything it can from a damaged image.
 
+        pyvips also supports:
+
+        Keyword args:
+            loader (str): The loader to use, for example ``'jpegload'``.
+                This skips the search for a loader which can read the file,
+                see also :func:`.loader_cache_set`.
+
         Returns:
             A new :class:`.Image`.
 
@@ -316,20 +543,31 @@ class Image(pyvips.VipsObject, metaclass=ImageType):
             :class:`.Error`
 
         """
+        loader = kwargs.pop('loader', None)
+
         vips_filename = _to_bytes(vips_filename)
-        pointer = vips_lib.vips_filename_get_filename(vips_filename)
-        filename = _to_string_copy(pointer)
+        if vips_filename.endswith(b']'):
+            pointer = vips_lib.vips_filename_get_filename(vips_filename)
+            filename = _to_string_copy(pointer)
 
-        pointer = vips_lib.vips_filename_get_options(vips_filename)
-        options = _to_string_copy(pointer)
+            pointer = vips_lib.vips_filename_get_options(vips_filename)
+            options = _to_string_copy(pointer)
+        else:
+            # no options, so we can skip splitting the filename
+            filename = vips_filename.decode('utf-8')
+            options = ''
 
-        pointer = vips_lib.vips_foreign_find_load(vips_filename)
-        if pointer == ffi.NULL:
-            raise Error(f'unable to load from file {vips_filename}')
-        name = _to_string(pointer)
+        def load(name):
+            return pyvips.Operation.call(name, filename,
+                                         string_options=options, **kwargs)
 
-        return pyvips.Operation.call(name, filename,
-                                     string_options=options, **kwargs)
+        if loader is not None:
+            image = load(loader)
+        else:
+            image = pyvips.vloader._load_file(vips_filename, filename, load)
+        image._recipe = (vips_filename.decode('utf-8'), kwargs)
+
+        return image
 
     @staticmethod
     def new_from_buffer(data, options, **kwargs):
@@ -351,6 +589,9 @@ class Image(pyvips.VipsObject, metaclass=ImageType):
             fail (bool): If set True, the loader will fail with an error on the
                 first serious error in the image. By default, libvips will
                 attempt to read everything it can from a damaged image.
+            loader (str): The loader to use, for example ``'jpegload'`` or
+                ``'jpegload_buffer'``. This skips the search for a loader
+                which can read the buffer.
 
         Returns:
             A new :class:`Image`.
@@ -359,13 +600,18 @@ class Image(pyvips.VipsObject, metaclass=ImageType):
             :class:`.Error`
 
         """
-        pointer = vips_lib.vips_foreign_find_load_buffer(data, len(data))
-        if pointer == ffi.NULL:
-            raise Error('unable to load from buffer')
-        name = _to_string(pointer)
+        loader = kwargs.pop('loader', None)
 
-        return pyvips.Operation.call(name, data,
-                                     string_options=options, **kwargs)
+        def load(name):
+            return pyvips.Operation.call(name, data,
+                                         string_options=options, **kwargs)
+
+        if loader is not None:
+            if not loader.endswith('_buffer'):
+                loader += '_buffer'
+            return load(loader)
+
+        return pyvips.vloader._load_buffer(data, load)
 
     @staticmethod
     def new_from_list(array, scale=1.0, offset=0.0):
@@ -623,6 +869,9 @@ class Image(pyvips.VipsObject, metaclass=ImageType):
             fail (bool): If set True, the loader will fail with an error on the
                 first serious error in the image. By default, libvips will
                 attempt to read everything it can from a damaged image.
+            loader (str): The loader to use, for example ``'jpegload'`` or
+                ``'jpegload_source'``. This skips the search for a loader
+                which can read the source.
 
         Returns:
             A new :class:`Image`.
@@ -631,13 +880,18 @@ class Image(pyvips.VipsObject, metaclass=ImageType):
             :class:`.Error`
 
         """
-        pointer = vips_lib.vips_foreign_find_load_source(source.pointer)
-        if pointer == ffi.NULL:
-            raise Error('unable to load from source')
-        name = _to_string(pointer)
+        loader = kwargs.pop('loader', None)
+
+        def load(name):
+            return pyvips.Operation.call(name, source,
+                                         string_options=options, **kwargs)
 
-        image = pyvips.Operation.call(name, source,
-                                      string_options=options, **kwargs)
+        if loader is not None:
+            if not loader.endswith('_source'):
+                loader += '_source'
+            image = load(loader)
+        else:
+            image = pyvips.vloader._load_source(source, load)
 
         # keep a secret ref to the source object .. we need that to stay
         # alive, since it might be a custom source that triggers a python
@@ -646,6 +900,143 @@ class Image(pyvips.VipsObject, metaclass=ImageType):
 
         return image
 
+    @staticmethod
+    def new_from_mmap(filename, options='', advice='sequential', **kwargs):
+        """Load a formatted image from a memory-mapped file.
+
+        This behaves exactly as :meth:`new_from_file`, but the file is mapped
+        read-only and decoded from memory, see :meth:`.Source.new_from_mmap`.
+        No file descriptor is held open while the image is in use, and the
+        mapping lives until the image and everything derived from it have
+        been garbage-collected.
+
+        Args:
+            filename (str): The file to map.
+            options (str): Load options as a string. Use ``""`` for no options.
+            advice (str, list[str]): Access pattern hints for the mapping.
+
+        Keyword args:
+            access (Access): Hint the expected access pattern for the image.
+            fail (bool): If set True, the loader will fail with an error on the
+                first serious error in the image. By default, libvips will
+                attempt to read everything it can from a damaged image.
+
+        Returns:
+            A new :class:`Image`.
+
+        Raises:
+            :class:`.Error`
+
+        """
+        source = pyvips.Source.new_from_mmap(filename, advice=advice)
+
+        return Image.new_from_source(source, options, **kwargs)
+
+    @staticmethod
+    def thumbnail_set(source, widths, targets=None, format_string=None,
+                      **kwargs):
+        """Make thumbnails of an image at several widths.
+
+        Making a set of responsive image variants with :meth:`thumbnail` will
+        open and decode the source once for every size. This method opens
+        the source once, with the largest shrink-on-load that will do for the
+        biggest width, and then makes each smaller variant from the one
+        before. For example::
+
+            variants = pyvips.Image.thumbnail_set('photo.jpg',
+                                                  [1920, 1280, 640, 320])
+
+        The variants are returned in memory, in the same order as
+        ``widths``. Alternatively, pass a list of targets, one per width,
+        and a format string, and each variant is written as soon as it has
+        been made. For example::
+
+            targets = [pyvips.Target.new_to_file(f'photo-{width}.webp')
+                       for width in widths]
+            pyvips.Image.thumbnail_set('photo.jpg', widths,
+                                       targets=targets,
+                                       format_string='.webp[Q=75]')
+
+        Args:
+            source (str, Path, bytes, Source): The image to thumbnail. A
+                filename, a buffer holding a formatted image, or a source.
+            widths (list[int]): The widths to make.
+            targets (list[Target]): Optionally, a target for each width.
+            format_string (str): The suffix, plus any string-form arguments,
+                to use for ``targets``.
+
+        Other arguments are passed to the thumbnail operation, for example
+        ``size``, ``linear``, ``no_rotate`` or ``export_profile``. Variants
+        always fit the width, so ``height``, ``crop`` and
+        ``size='force'`` are not supported.
+
+        Returns:
+            A list with an :class:`Image` for each width, or ``None`` where
+            the variant was written to a target.
+
+        Raises:
+            :class:`.Error`
+
+        """
+        widths = list(widths)
+        if 'height' in kwargs or 'crop' in kwargs:
+            raise Error('thumbnail_set() does not support height or crop')
+        # force would stretch every variant to the "fit the width" height
+        # below
+        if kwargs.get('size') == 'force':
+            raise Error('thumbnail_set() does not support size=force')
+        if targets is not None:
+            if len(targets) != len(widths):
+                raise Error('need one target for each width')
+            if format_string is None:
+                raise Error('no format_string for targets')
+        if len(widths) == 0:
+            return []
+
+        # a height this large means "fit the width"
+        height = 10000000
+
+        # largest first, so every variant can be made from the one before
+        order = sorted(range(len(widths)),
+                       key=lambda i: widths[i], reverse=True)
+        largest = widths[order[0]]
+
+        if isinstance(source, pyvips.Source):
+            image = Image.thumbnail_source(source, largest,
+                                           height=height, **kwargs)
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            image = Image.thumbnail_buffer(source, largest,
+                                           height=height, **kwargs)
+        else:
+            image = Image.thumbnail(str(source), largest,
+                                    height=height, **kwargs)
+
+        # load, rotate and colour options have been applied by the first
+        # thumbnail, so only these are needed for the others
+        step_kwargs = {name: kwargs[name]
+                       for name in ['size', 'linear'] if name in kwargs}
+
+        variants = [None] * len(widths)
+        previous = None
+        for i in order:
+            if previous is None:
+                variant = image
+            else:
+                variant = previous.thumbnail_image(widths[i], height=height,
+                                                   **step_kwargs)
+
+            # render each variant once, since we will make the next one from
+            # it
+            variant = variant.copy_memory()
+
+            if targets is not None and targets[i] is not None:
+                variant.write_to_target(targets[i], format_string)
+            else:
+                variants[i] = variant
+            previous = variant
+
+        return variants
+
     @staticmethod
     def new_temp_file(format):
         """Make a new temporary image.
@@ -728,7 +1119,56 @@ class Image(pyvips.VipsObject, metaclass=ImageType):
         if vi == ffi.NULL:
             raise Error('unable to copy to memory')
 
-        return pyvips.Image(vi)
+        # the copy is already rendered, so it has no inputs to estimate
+        image = pyvips.Image(vi)
+        if pyvips.voperation._tracing():
+            image._operation = ('copy_memory', (), {}, False, _header(vi))
+
+        return image
+
+    def _node(self):
+        # how this image was made, for estimate(), as a tuple of
+        # (operation_name, input_nodes, options, modify, header) ... we must
+        # not keep references to input images, since that would keep them
+        # alive
+        if self._operation is None:
+            self._operation = (None, (), {}, False, _header(self.pointer))
+
+        return self._operation
+
+    def estimate(self, threads=None):
+        """Estimate the cost of rendering this image.
+
+        This walks the graph of operations which made this image and
+        predicts the peak memory use and the amount of input which will be
+        decoded, without computing any pixels. For example, to reject
+        decompression bombs::
+
+            with pyvips.estimate_trace():
+                image = pyvips.Image.new_from_file(filename)
+                image = image.resize(0.5)
+
+            if image.estimate().input_bytes > 1 << 30:
+                raise ValueError('image too large')
+
+        The graph is only recorded for operations called while tracing is
+        on, see :func:`.estimate_trace` and :func:`.estimate_set_trace`.
+        Anything made without tracing counts as an image already in memory.
+        The figures are approximate, so use them to route and reject jobs,
+        not to size buffers.
+
+        Args:
+            threads (int): The number of libvips threads the render will use.
+                Defaults to the current concurrency.
+
+        Returns:
+            An :class:`.Estimate`.
+
+        """
+
+        from pyvips.vestimate import _estimate
+
+        return _estimate(self, threads)
 
     # writers
 
@@ -898,6 +1338,157 @@ class Image(pyvips.VipsObject, metaclass=ImageType):
         return pyvips.Operation.call(name, self, target,
                                      string_options=options, **kwargs)
 
+    def iter_encode(self, format_string, chunk_size=1 << 16, queue_size=4,
+                    **kwargs):
+        """Encode an image as a stream of chunks.
+
+        The image is saved in the format given by the suffix in the format
+        string, exactly as :meth:`write_to_buffer`, but the encoded bytes are
+        returned as an iterator of chunks. This is useful for (for example)
+        streaming an HTTP response::
+
+            for chunk in image.iter_encode('.jpg', Q=90):
+                response.write(chunk)
+
+        The iterator can also be used with ``async for``.
+
+        The encode runs on a background thread. At most ``queue_size``
+        chunks are held waiting for you to take them, after which the encoder
+        pauses, so memory use is bounded no matter how large the output is.
+
+        Call ``close()`` on the iterator to stop encoding early. If an
+        ``await`` on the iterator is cancelled, for example by
+        :func:`asyncio.wait_for`, the iterator is closed, since the chunk it
+        was waiting for is lost.
+
+        Args:
+            format_string (str): The suffix, plus any string-form arguments.
+            chunk_size (int): The largest chunk to return, in bytes.
+            queue_size (int): The number of chunks to buffer.
+
+        Other arguments depend upon the save operation.
+
+        Returns:
+            An iterator of byte strings.
+
+        Raises:
+            :class:`.Error`
+
+        """
+        pointer = vips_lib.vips_foreign_find_save_target(
+            _to_bytes(format_string))
+        if pointer == ffi.NULL:
+            raise Error('unable to write to target')
+
+        return _EncodeIterator(self, format_string,
+                               chunk_size, queue_size, kwargs)
+
+    def write_many(self, destinations, tile_height=128, max_tiles=None):
+        """Write an image to several formats with a single render.
+
+        Saving an image three times with :meth:`write_to_buffer` will run
+        the whole pipeline behind the image three times. This method runs
+        the pipeline once and encodes to all the destinations at the same
+        time, each on its own thread. For example::
+
+            jpeg, webp, _ = image.write_many([
+                ('.jpg', {'Q': 90}),
+                ('.webp', {'Q': 75}),
+                (target, '.avif', {'effort': 2}),
+            ])
+
+        Each destination is a format string, optionally with a dict of
+        save options, in which case the encoded bytes are returned, or a
+        :class:`.Target`, a format string and optional save options, in
+        which case ``None`` is returned in that position.
+
+        The pixels are shared via a cache of ``max_tiles`` strips of
+        ``tile_height`` scanlines, so memory use depends on the width of the
+        image and not its height. Encoders which get ahead wait for the
+        slowest one to catch up.
+
+        Args:
+            destinations (list): The destinations to write to.
+            tile_height (int): The height of the strips to cache.
+            max_tiles (int): The number of strips to cache. The default is
+                enough for the current concurrency level.
+
+        Returns:
+            A list with the encoded bytes for each format string destination,
+            and ``None`` for each target.
+
+        Raises:
+            :class:`.Error`
+
+        """
+        entries = []
+        for destination in destinations:
+            if isinstance(destination, str):
+                destination = (destination,)
+            destination = list(destination)
+
+            kwargs = {}
+            if len(destination) > 0 and isinstance(destination[-1], dict):
+                kwargs = destination.pop()
+
+            if len(destination) == 1:
+                entries.append((None, destination[0], kwargs))
+            elif len(destination) == 2 and \
+                    isinstance(destination[0], pyvips.Target):
+                entries.append((destination[0], destination[1], kwargs))
+            else:
+                raise Error(f'bad destination {destination}')
+
+        if max_tiles is None:
+            max_tiles = 4 + 2 * pyvips.concurrency_get()
+
+        # the first encoder to finish will minimise the pipeline, so the
+        # cache must be persistent or the others would lose their tiles
+        cache = self.tilecache(tile_width=self.width,
+                               tile_height=tile_height,
+                               max_tiles=max_tiles,
+                               threaded=True,
+                               persistent=True)
+
+        # the cache image can be shared with other pipelines via the
+        # operation cache, so attach our progress handler to a private
+        # partial image which reads from it
+        image = cache._private_view()
+
+        fan_out = _FanOut(len(entries),
+                          tile_height * max(1, max_tiles // 2) * self.width)
+        image.set_progress(True)
+        image.signal_connect('eval', fan_out.eval_handler)
+
+        results = [None] * len(entries)
+        errors = [None] * len(entries)
+
+        def encode(index, target, format_string, kwargs):
+            fan_out.start(index)
+            try:
+                if target is None:
+                    results[index] = image.write_to_buffer(format_string,
+                                                           **kwargs)
+                else:
+                    image.write_to_target(target, format_string, **kwargs)
+            except Exception as e:
+                errors[index] = e
+            finally:
+                fan_out.stop(index)
+
+        threads = [threading.Thread(target=encode, args=(index,) + entry)
+                   for index, entry in enumerate(entries)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for error in errors:
+            if error is not None:
+                raise error
+
+        return results
+
     def write_to_memory(self):
         """Write the image to a large memory array.
 
@@ -982,6 +1573,18 @@ class Image(pyvips.VipsObject, metaclass=ImageType):
         """
         vips_lib.vips_image_set_kill(self.pointer, kill)
 
+    def _private_view(self):
+        # images can be shared between pipelines by the operation cache, so
+        # signal handlers and kill flags go on a private partial image which
+        # reads from this one
+        vi = vips_lib.vips_image_new()
+        if vi == ffi.NULL:
+            raise Error('unable to make image')
+        image = pyvips.Image(vi)
+        self.write(image)
+
+        return image
+
     # get/set metadata
 
     def get_gainmap(self):
@@ -1111,6 +1714,9 @@ class Image(pyvips.VipsObject, metaclass=ImageType):
         gv.set(value)
         vips_lib.vips_image_set(self.pointer, _to_bytes(name), gv.pointer)
 
+        # the image no longer matches the file it was loaded from
+        self._recipe = None
+
     def set(self, name, value):
         """Set the value of an item of metadata.
 
@@ -1150,6 +1756,8 @@ class Image(pyvips.VipsObject, metaclass=ImageType):
             None
 
         """
+        self._recipe = None
+
         return vips_lib.vips_image_remove(self.pointer, _to_bytes(name)) != 0
 
     def tolist(self):
@@ -1345,6 +1953,76 @@ class Image(pyvips.VipsObject, metaclass=ImageType):
             return (f'<pyvips.Image {self.width}x{self.height} {self.format}, '
                     f'{self.bands} bands, {self.interpretation}>')
 
+    def __reduce__(self):
+        """Support pickling.
+
+        Images loaded with :meth:`new_from_file` are pickled as the filename
+        and load options, so they are loaded again, lazily, when they are
+        unpickled. This is very fast, but the file must be readable by the
+        process that unpickles the image.
+
+        Any other image is rendered to a block of shared memory (see
+        :mod:`multiprocessing.shared_memory`) and the pickle holds just the
+        name of the block, the image header and any metadata. The receiving
+        process uses the shared pixels with :meth:`new_from_memory`, so no
+        pixels are copied through the pickle. For example::
+
+            with concurrent.futures.ProcessPoolExecutor() as executor:
+                small = executor.submit(shrink, image.copy_memory()).result()
+
+        Each pickle is rendered to a new block, and the block belongs to
+        the process which loads the pickle. The sending image can be freed
+        straight away, but each pickle can only be loaded once. A pickle
+        which is never loaded is removed by the :mod:`multiprocessing`
+        resource tracker when the processes sharing it exit. On Windows,
+        the block is freed when the last handle to it closes, so this image
+        keeps its handles until it is freed.
+
+        Use :meth:`copy_memory` on a file image to force the shared memory
+        mode. This needs Python 3.8 or later.
+
+        """
+        if self._recipe is not None:
+            return (_unpickle_file, self._recipe)
+
+        try:
+            from multiprocessing import shared_memory
+        except ImportError:
+            raise Error('pickling images needs Python 3.8 or later')
+
+        format = self.format
+
+        size = self.width * self.height * self.bands * _format_sizeof(format)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+
+        # render straight into the shared memory
+        memory = Image.new_from_memory(shm.buf, self.width, self.height,
+                                       self.bands, format)
+        self.write(memory)
+        del memory
+
+        # the receiver removes the block ... until then, the resource tracker
+        # has it registered in case the pickle is never loaded. Windows frees
+        # it when the last handle closes, so there we must keep ours open
+        if sys.platform == 'win32':
+            self._references.append(shm)
+        else:
+            shm.close()
+
+        header = {name: self.get(name) for name in _PICKLE_HEADER}
+
+        metadata = []
+        types = _pickle_types()
+        for name in self.get_fields():
+            gtype = self.get_typeof(name)
+            if name not in _PICKLE_SKIP and gtype in types:
+                metadata.append((pyvips.type_name(gtype), name,
+                                 self.get(name)))
+
+        return (_unpickle_shared,
+                (shm.name, self.width, self.height, self.bands, format,
+                 header, metadata))
+
     def __getattr__(self, name):
         """Divert unknown names to libvips.
 
@@ -0,0 +1,198 @@
+import os
+import threading
+
+from pyvips import ffi, vips_lib, Error, _to_string
+
+# loaders are remembered by the first few bytes of the file ... enough to
+# tell formats apart, but not so many that per-file fields like the JPEG
+# APP segment length make every file different
+_MAGIC_LENGTH = 4
+
+_loader_lock = threading.Lock()
+_loader_enabled = False
+_loader_hits = 0
+_loader_misses = 0
+_loader_fallbacks = 0
+
+# key -> loader name, one dict for each kind of load
+_file_loaders = {}
+_buffer_loaders = {}
+_source_loaders = {}
+
+
+def _count(hits=0, misses=0, fallbacks=0):
+    global _loader_hits, _loader_misses, _loader_fallbacks
+
+    with _loader_lock:
+        _loader_hits += hits
+        _loader_misses += misses
+        _loader_fallbacks += fallbacks
+
+
+def _cached_load(cache, key, find, load):
+    # load with the loader we found last time for this key, if any ... if
+    # that loader fails, the guess was wrong, so find the loader properly
+    # and try again
+    if not _loader_enabled or key is None:
+        return load(find())
+
+    name = cache.get(key)
+    if name is None:
+        _count(misses=1)
+        name = cache.setdefault(key, find())
+        return load(name)
+
+    _count(hits=1)
+    try:
+        return load(name)
+    except Error:
+        cache.pop(key, None)
+        _count(fallbacks=1)
+        return load(find())
+
+
+def _find_load(vips_filename):
+    pointer = vips_lib.vips_foreign_find_load(vips_filename)
+    if pointer == ffi.NULL:
+        raise Error(f'unable to load from file {vips_filename}')
+
+    return _to_string(pointer)
+
+
+def _load_file(vips_filename, filename, load):
+    key = None
+    if _loader_enabled:
+        try:
+            with open(filename, 'rb') as f:
+                magic = f.read(_MAGIC_LENGTH)
+            key = (os.path.splitext(filename)[1].lower(), magic)
+        except OSError:
+            # let libvips report the error
+            pass
+
+    return _cached_load(_file_loaders, key,
+                        lambda: _find_load(vips_filename), load)
+
+
+def _find_load_buffer(data):
+    pointer = vips_lib.vips_foreign_find_load_buffer(data, len(data))
+    if pointer == ffi.NULL:
+        raise Error('unable to load from buffer')
+
+    return _to_string(pointer)
+
+
+def _load_buffer(data, load):
+    key = None
+    if _loader_enabled:
+        try:
+            key = memoryview(data).cast('B')[:_MAGIC_LENGTH].tobytes()
+        except (TypeError, ValueError):
+            pass
+
+    return _cached_load(_buffer_loaders, key,
+                        lambda: _find_load_buffer(data), load)
+
+
+def _find_load_source(source):
+    pointer = vips_lib.vips_foreign_find_load_source(source.pointer)
+    if pointer == ffi.NULL:
+        raise Error('unable to load from source')
+
+    return _to_string(pointer)
+
+
+def _load_source(source, load):
+    key = None
+    if _loader_enabled:
+        pointer = vips_lib.vips_source_sniff(source.pointer, _MAGIC_LENGTH)
+        if pointer != ffi.NULL:
+            key = ffi.buffer(pointer, _MAGIC_LENGTH)[:]
+
+    return _cached_load(_source_loaders, key,
+                        lambda: _find_load_source(source), load)
+
+
+def loader_cache_set(enabled):
+    """Remember which loader opened each kind of file.
+
+    Finding the loader for a file, buffer or source means asking each
+    loader in turn if it can read it, and that can cost more than reading
+    the header of a small image. With the loader cache enabled, pyvips
+    remembers the loader it found for each file suffix and first few bytes,
+    and uses it again for the next file which matches. This is useful for
+    large batches of similar files. For example::
+
+        pyvips.loader_cache_set(True)
+        for filename in filenames:
+            image = pyvips.Image.new_from_file(filename)
+
+    The cache can pick the wrong loader for formats which share a suffix
+    and magic number, for example, a TIFF which OpenSlide would load. If
+    the remembered loader fails, pyvips finds the loader properly and tries
+    again. If you know the format in advance, it's better to pass
+    ``loader=``, see :meth:`.Image.new_from_file`.
+
+    The cache is off by default.
+
+    Args:
+        enabled (bool): Use the loader cache.
+
+    """
+
+    global _loader_enabled
+
+    _loader_enabled = enabled
+
+
+def loader_cache_get():
+    """Is the loader cache enabled? See :func:`loader_cache_set`.
+
+    Returns:
+        True if the loader cache is enabled.
+
+    """
+
+    return _loader_enabled
+
+
+def loader_cache_get_stats():
+    """Get loader cache statistics.
+
+    Returns:
+        A dict with ``'hits'`` and ``'misses'`` counts, ``'fallbacks'``, the
+        number of hits where the remembered loader failed, and ``'size'``,
+        the number of loaders remembered.
+
+    """
+
+    with _loader_lock:
+        return {
+            'hits': _loader_hits,
+            'misses': _loader_misses,
+            'fallbacks': _loader_fallbacks,
+            'size': len(_file_loaders) + len(_buffer_loaders) +
+            len(_source_loaders),
+        }
+
+
+def loader_cache_clear():
+    """Forget all remembered loaders, and zero the statistics."""
+
+    global _loader_hits, _loader_misses, _loader_fallbacks
+
+    with _loader_lock:
+        _file_loaders.clear()
+        _buffer_loaders.clear()
+        _source_loaders.clear()
+        _loader_hits = 0
+        _loader_misses = 0
+        _loader_fallbacks = 0
+
+
+__all__ = [
+    'loader_cache_set',
+    'loader_cache_get',
+    'loader_cache_get_stats',
+    'loader_cache_clear',
+]
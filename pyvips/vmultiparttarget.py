@@ -0,0 +1,141 @@
+import concurrent.futures
+import logging
+import threading
+import weakref
+
+import pyvips
+
+logger = logging.getLogger(__name__)
+
+
+class MultipartTarget(pyvips.TargetCustom):
+    """A target that uploads the encoded stream in parts.
+
+    This is useful for writing to (for example) an object store with a
+    multipart upload API. The output is sliced into fixed-size parts, and
+    each part is handed to your ``upload_part`` function on a thread pool
+    while libvips carries on encoding, so the encode and the upload overlap.
+
+    When the encode finishes, the final (possibly short) part is uploaded,
+    all uploads are waited for, and ``complete`` is called with the results
+    of each ``upload_part`` call, in part order. For example::
+
+        upload = s3.create_multipart_upload(Bucket=bucket, Key=key)
+
+        def upload_part(number, data):
+            response = s3.upload_part(Bucket=bucket, Key=key,
+                UploadId=upload["UploadId"], PartNumber=number, Body=data)
+            return {"PartNumber": number, "ETag": response["ETag"]}
+
+        def complete(parts):
+            s3.complete_multipart_upload(Bucket=bucket, Key=key,
+                UploadId=upload["UploadId"],
+                MultipartUpload={"Parts": parts})
+
+        target = pyvips.MultipartTarget(upload_part, complete)
+        image.write_to_target(target, ".jpg")
+
+    Targets made like this can't seek, so they can't be used for formats
+    like TIFF.
+
+    Attributes:
+        parts (list): The results of ``upload_part``, in part order, once the
+            write has ended.
+        error (Exception): The first upload error, or None.
+
+    """
+
+    def __init__(self, upload_part, complete=None, part_size=8 << 20,
+                 max_workers=4):
+        """Make a new multipart target.
+
+        Args:
+            upload_part (Callable[[int, bytes], Any]): Called with a part
+                number, counting from 1, and the bytes for that part. It may
+                be called from several threads at once.
+            complete (Callable[[list], None]): Called at the end of the write
+                with the results of all the ``upload_part`` calls.
+            part_size (int): The size of every part except the last.
+            max_workers (int): The number of parts to upload at once.
+
+        """
+
+        super(MultipartTarget, self).__init__()
+
+        self._upload_part = upload_part
+        self._complete = complete
+        self._part_size = part_size
+
+        self._part_buffer = bytearray()
+        self._futures = []
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='pyvips-multipart')
+        # stop the pool if we are dropped before the write ends, for example
+        # when the save fails
+        self._finalizer = weakref.finalize(self, self._executor.shutdown,
+                                           wait=False)
+
+        # bound the number of parts we hold in memory ... writes block while
+        # this many are queued or uploading
+        self._slots = threading.BoundedSemaphore(2 * max_workers)
+
+        self.parts = None
+        self.error = None
+
+        self.on_write(self._part_write)
+        self.on_end(self._part_end)
+
+    def _upload(self, number, data):
+        try:
+            return self._upload_part(number, data)
+        except Exception as e:
+            if self.error is None:
+                self.error = e
+            raise
+        finally:
+            self._slots.release()
+
+    def _submit(self, data):
+        self._slots.acquire()
+        number = len(self._futures) + 1
+        future = self._executor.submit(self._upload, number, data)
+        self._futures.append(future)
+
+    def _part_write(self, chunk):
+        if self.error is not None:
+            # stop the encode as soon as an upload fails ... libvips may not
+            # call our end handler after this, so stop the pool now
+            self._finalizer()
+            return -1
+
+        self._part_buffer += chunk
+        while len(self._part_buffer) >= self._part_size:
+            self._submit(bytes(self._part_buffer[:self._part_size]))
+            del self._part_buffer[:self._part_size]
+
+        return len(chunk)
+
+    def _part_end(self):
+        try:
+            # there's always at least one part, even if it's empty
+            if self.error is None and \
+                    (len(self._part_buffer) > 0 or len(self._futures) == 0):
+                self._submit(bytes(self._part_buffer))
+                self._part_buffer = bytearray()
+
+            self.parts = [future.result() for future in self._futures]
+            if self._complete is not None:
+                self._complete(self.parts)
+        except Exception as e:
+            # we can't throw exceptions over libvips, we must return an error
+            if self.error is None:
+                self.error = e
+            logger.error('MultipartTarget upload failed: %s', self.error)
+            return -1
+        finally:
+            self._finalizer()
+
+        return 0
+
+
+__all__ = ['MultipartTarget']
@@ -34,25 +34,33 @@ class VipsObject(pyvips.GObject):
 
         # this is pretty slow, and used a lot, so we cache results
         # this cache makes the libvips test suite about 10% faster
+        # this can be called from many threads at once, and without a GIL on
+        # free-threaded pythons ... fills must never replace a dict another
+        # thread might be reading, so we use setdefault and local refs
         class_pointer = self.gobject.g_type_instance.g_class
-        cache = VipsObject._pspec_cache
-        if class_pointer not in cache:
-            cache[class_pointer] = {}
-        if name not in cache[class_pointer]:
-            pspec = ffi.new('GParamSpec **')
+        class_cache = VipsObject._pspec_cache.get(class_pointer)
+        if class_cache is None:
+            class_cache = VipsObject._pspec_cache.setdefault(class_pointer, {})
+
+        pspec = class_cache.get(name)
+        if pspec is None:
+            pspec_out = ffi.new('GParamSpec **')
             argument_class = ffi.new('VipsArgumentClass **')
             argument_instance = ffi.new('VipsArgumentInstance **')
             result = vips_lib.vips_object_get_argument(self.vobject,
                                                        _to_bytes(name),
-                                                       pspec, argument_class,
+                                                       pspec_out,
+                                                       argument_class,
                                                        argument_instance)
 
             if result != 0:
                 return None
 
-            cache[class_pointer][name] = pspec[0]
+            # pspecs live as long as their class, so every thread will find
+            # the same pointer and it doesn't matter who stores it
+            pspec = class_cache.setdefault(name, pspec_out[0])
 
-        return cache[class_pointer][name]
+        return pspec
 
     def get_typeof(self, name):
         """Get the GType of a GObject property.
@@ -1,8 +1,13 @@
+import collections
 import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
 
 import pyvips
 from pyvips import ffi, vips_lib, Error, _to_bytes, _to_string, GValue, \
-    type_map, type_from_name, nickname_find, at_least_libvips
+    type_map, type_from_name, nickname_find, at_least_libvips, get_suffixes
 
 logger = logging.getLogger(__name__)
 
@@ -148,10 +153,15 @@ class Introspect(object):
 
     @classmethod
     def get(cls, operation_name):
-        if operation_name not in cls._introspect_cache:
-            cls._introspect_cache[operation_name] = Introspect(operation_name)
+        # reads take no lock ... on a miss, threads may race to build the
+        # same entry, but setdefault means they all end up sharing the
+        # first one stored
+        intro = cls._introspect_cache.get(operation_name)
+        if intro is None:
+            intro = Introspect(operation_name)
+            intro = cls._introspect_cache.setdefault(operation_name, intro)
 
-        return cls._introspect_cache[operation_name]
+        return intro
 
 
 # search an array with a predicate, recursing into subarrays as we see them
@@ -236,6 +246,29 @@ class Operation(pyvips.VipsObject):
             raise Error(f'{operation_name} needs {len(intro.required_input)} '
                         f'arguments, but {len(args)} given')
 
+        # cache=bool picks the operation cache for this call, unless the
+        # operation has an argument of that name
+        use_cache = None
+        if 'cache' in kwargs and 'cache' not in intro.details:
+            use_cache = kwargs.pop('cache')
+
+        # an explicit cache argument wins over any cache_scope() ... scopes
+        # keep their own cache, and skip the libvips one
+        scope = None
+        scope_key = None
+        if use_cache is None:
+            scopes = getattr(_cache_local, 'scopes', None)
+            if scopes:
+                scope = scopes[-1]
+                scope_key = _scope_key(operation_name, args, kwargs)
+                if scope_key is not None:
+                    result = scope._lookup(scope_key)
+                    if result is not _NOT_FOUND:
+                        return result
+                use_cache = False
+            else:
+                use_cache = getattr(_cache_local, 'enabled', True)
+
         op = Operation.new_from_name(operation_name)
 
         # set any string options before any args so they can't be
@@ -266,17 +299,27 @@ class Operation(pyvips.VipsObject):
                     return True
             return False
 
+        # and all the input images, if we are tracing for Image.estimate()
+        # ... we only keep a summary of each one, see Image._node()
+        trace = _tracing()
+        inputs = []
+        modify = False
+
         def add_reference(x):
             if isinstance(x, pyvips.Image):
                 for i in x._references:
                     if not contains(references, i):
                         references.append(i)
+                if trace and not contains(inputs, x):
+                    inputs.append(x)
             return False
 
         # set required input args
         for name, value in zip(intro.required_input, args):
             _find_inside(add_reference, value)
-            op.set(name, intro.details[name]['flags'], match_image, value)
+            flags = intro.details[name]['flags']
+            modify = modify or (flags & _MODIFY) != 0
+            op.set(name, flags, match_image, value)
 
         # set any optional args
         for name in kwargs:
@@ -296,16 +339,40 @@ class Operation(pyvips.VipsObject):
             op.set(name, details['flags'], match_image, value)
 
         # build operation
-        vop = vips_lib.vips_cache_operation_build(op.pointer)
-        if vop == ffi.NULL:
-            vips_lib.vips_object_unref_outputs(op.vobject)
-            raise Error(f'unable to call {operation_name}')
-        op = Operation(vop)
+        if use_cache:
+            vop = vips_lib.vips_cache_operation_build(op.pointer)
+            if vop == ffi.NULL:
+                vips_lib.vips_object_unref_outputs(op.vobject)
+                raise Error(f'unable to call {operation_name}')
+            _cache_record(operation_name, op.pointer, vop)
+            op = Operation(vop)
+        else:
+            if vips_lib.vips_object_build(op.vobject) != 0:
+                vips_lib.vips_object_unref_outputs(op.vobject)
+                raise Error(f'unable to call {operation_name}')
+            _cache_record_uncached(operation_name)
+
+        if trace:
+            options = {name: value for name, value in kwargs.items()
+                       if _find_inside(lambda x: isinstance(x, pyvips.Image),
+                                       value) is None}
+            if string_options != '':
+                options['string_options'] = string_options
+
+            # draw operations render their input to memory before they run,
+            # so there's nothing upstream left to estimate
+            if modify:
+                inputs = ()
+            else:
+                inputs = tuple(x._node() for x in inputs)
 
         # attach all input refs to output x
         def set_reference(x):
             if isinstance(x, pyvips.Image):
                 x._references.extend(references)
+                if trace:
+                    x._operation = (operation_name, inputs, options, modify,
+                                    pyvips.vimage._header(x.pointer))
             return False
 
         # fetch required output args (plus modified input images)
@@ -335,6 +402,13 @@ class Operation(pyvips.VipsObject):
 
         logger.debug('VipsOperation.call: result = %s', result)
 
+        # operations which libvips would never cache, or which draw on
+        # images, are never reused
+        if scope_key is not None and not modify and \
+                (vips_lib.vips_operation_get_flags(op.pointer) &
+                 _OPERATION_NOCACHE) == 0:
+            scope._add(scope_key, result, (args, kwargs))
+
         return result
 
     @staticmethod
@@ -355,8 +429,9 @@ class Operation(pyvips.VipsObject):
         """
 
         # we cache these to save regeneration
-        if operation_name in Operation._docstring_cache:
-            return Operation._docstring_cache[operation_name]
+        result = Operation._docstring_cache.get(operation_name)
+        if result is not None:
+            return result
 
         intro = Introspect.get(operation_name)
         if (intro.flags & _OPERATION_DEPRECATED) != 0:
@@ -412,9 +487,7 @@ class Operation(pyvips.VipsObject):
         result += '\nRaises:\n    :class:`.Error`\n'
 
         # add to cache to save building again
-        Operation._docstring_cache[operation_name] = result
-
-        return result
+        return Operation._docstring_cache.setdefault(operation_name, result)
 
     @staticmethod
     def generate_sphinx(operation_name):
@@ -607,6 +680,518 @@ def cache_get_max_files():
     return vips_lib.vips_cache_get_max_files()
 
 
+# libvips doesn't keep cache statistics, so we count hits and misses as
+# operations are built, and keep a model of the cache contents
+# statistics are off by default, since they take a lock on every call
+_cache_stats = False
+_cache_lock = threading.Lock()
+# operation name -> [hits, misses, uncached]
+_cache_counts = {}
+_HIT = 0
+_MISS = 1
+_UNCACHED = 2
+_cache_evictions = 0
+# address of cached operation -> [name, hits, time added, time last used],
+# least recently used first, like the libvips cache
+_cache_entries = collections.OrderedDict()  # type: ignore[var-annotated]
+
+
+def _cache_trim(size):
+    # libvips drops the least recently used operations first
+    global _cache_evictions
+
+    while len(_cache_entries) > size:
+        _cache_entries.popitem(last=False)
+        _cache_evictions += 1
+
+
+def _cache_record(operation_name, pointer, vop):
+    if not _cache_stats:
+        return
+
+    # vips_cache_operation_build() returns the operation we built on a miss,
+    # or a different, cached operation on a hit
+    hit = vop != pointer
+    if hit:
+        kind = _HIT
+    elif (vips_lib.vips_operation_get_flags(vop) & _OPERATION_NOCACHE) != 0:
+        kind = _UNCACHED
+    else:
+        kind = _MISS
+
+    address = int(ffi.cast('uintptr_t', vop))
+    now = time.monotonic()
+
+    with _cache_lock:
+        if operation_name not in _cache_counts:
+            _cache_counts[operation_name] = [0, 0, 0]
+        _cache_counts[operation_name][kind] += 1
+
+        if kind == _UNCACHED:
+            return
+
+        entry = _cache_entries.get(address)
+        if hit and entry is not None:
+            entry[1] += 1
+            entry[3] = now
+            _cache_entries.move_to_end(address)
+        else:
+            # a miss, or an operation cached before we were counting
+            _cache_entries.pop(address, None)
+            _cache_entries[address] = [operation_name, int(hit), now, now]
+
+        if not hit:
+            # adding this operation may have pushed others out
+            _cache_trim(vips_lib.vips_cache_get_size())
+
+
+def _cache_record_uncached(operation_name):
+    if not _cache_stats:
+        return
+
+    with _cache_lock:
+        if operation_name not in _cache_counts:
+            _cache_counts[operation_name] = [0, 0, 0]
+        _cache_counts[operation_name][_UNCACHED] += 1
+
+
+def _nickname(operation_name):
+    # loaders are called by type name
+    if operation_name.startswith('Vips'):
+        return nickname_find(type_from_name(operation_name))
+
+    return operation_name
+
+
+_fork_lock_registered = False
+
+
+def cache_set_stats(stats):
+    """Turn operation cache statistics on or off.
+
+    Counting takes a lock on every operation call, which can hold back
+    threads making many small calls, so statistics are off by default. See
+    :func:`cache_get_stats`.
+
+    Args:
+        stats (bool): Count operation cache hits and misses.
+
+    """
+    global _cache_stats, _fork_lock_registered
+
+    with _cache_lock:
+        if stats and not _cache_stats:
+            # we've missed any changes to the cache, so start the model of
+            # its contents again
+            _cache_entries.clear()
+
+        _cache_stats = stats
+
+        # don't fork while another thread is updating statistics
+        if stats and not _fork_lock_registered and \
+                hasattr(os, 'register_at_fork'):
+            os.register_at_fork(before=_cache_lock.acquire,
+                                after_in_parent=_cache_lock.release,
+                                after_in_child=_cache_lock.release)
+            _fork_lock_registered = True
+
+
+def cache_get_stats():
+    """Get operation cache statistics.
+
+    Once statistics are turned on with :func:`cache_set_stats`, pyvips
+    counts cache hits and misses as operations are called. For example::
+
+        pyvips.cache_set_stats(True)
+        ...
+        stats = pyvips.cache_get_stats()
+        print(f"hit rate {stats['hits'] / (stats['hits'] + stats['misses'])}")
+        for name, counts in stats['operations'].items():
+            print(f"{name}: {counts['hits']} hits, {counts['misses']} misses")
+
+    Operations which can't be cached are counted as ``uncached``.
+    Evictions are inferred from changes in the size of the cache, so they
+    may be approximate if you call operations from several threads.
+
+    Returns:
+        A dict with ``'hits'``, ``'misses'``, ``'uncached'`` and
+        ``'evictions'`` counts, the current ``'size'`` and ``'memory'`` use
+        (the memory libvips tracks, which is what the cache is limited by),
+        the limits ``'max'``, ``'max_mem'`` and ``'max_files'``, and
+        ``'operations'``, a dict of counts for each operation nickname.
+
+    """
+
+    size = vips_lib.vips_cache_get_size()
+
+    with _cache_lock:
+        _cache_trim(size)
+
+        operations = {}
+        for operation_name, (hits, misses, uncached) in _cache_counts.items():
+            counts = operations.setdefault(_nickname(operation_name),
+                                           {'hits': 0, 'misses': 0,
+                                            'uncached': 0})
+            counts['hits'] += hits
+            counts['misses'] += misses
+            counts['uncached'] += uncached
+        evictions = _cache_evictions
+
+    return {
+        'hits': sum(x['hits'] for x in operations.values()),
+        'misses': sum(x['misses'] for x in operations.values()),
+        'uncached': sum(x['uncached'] for x in operations.values()),
+        'evictions': evictions,
+        'size': size,
+        'memory': vips_lib.vips_tracked_get_mem(),
+        'max': vips_lib.vips_cache_get_max(),
+        'max_mem': vips_lib.vips_cache_get_max_mem(),
+        'max_files': vips_lib.vips_cache_get_max_files(),
+        'operations': operations,
+    }
+
+
+def cache_get_entries():
+    """List the operations in the cache.
+
+    Only operations called from pyvips while statistics are on are listed,
+    see :func:`cache_set_stats`.
+
+    Returns:
+        A list of dicts, least recently used first, each with the
+        ``'operation'`` nickname, the number of ``'hits'``, the ``'age'``
+        in seconds, and the seconds since it was ``'last_used'``.
+
+    """
+
+    size = vips_lib.vips_cache_get_size()
+    now = time.monotonic()
+
+    with _cache_lock:
+        _cache_trim(size)
+        entries = [list(entry) for entry in _cache_entries.values()]
+
+    return [{'operation': _nickname(name),
+             'hits': hits,
+             'age': now - added,
+             'last_used': now - used}
+            for name, hits, added, used in entries]
+
+
+def cache_reset_stats():
+    """Reset the operation cache hit, miss and eviction counts."""
+    global _cache_evictions
+
+    size = vips_lib.vips_cache_get_size()
+
+    with _cache_lock:
+        # catch up with any evictions first, so we don't count them later
+        _cache_trim(size)
+        _cache_counts.clear()
+        _cache_evictions = 0
+
+
+# per-thread cache settings, see no_cache() and cache_scope()
+_cache_local = threading.local()
+
+# marks a scope cache miss, since operations can return None
+_NOT_FOUND = object()
+
+
+def _freeze(value):
+    # a hashable version of an argument ... images are equal if they are the
+    # same libvips image
+    if isinstance(value, pyvips.Image):
+        return ('image', int(ffi.cast('uintptr_t', value.pointer)))
+    elif isinstance(value, (list, tuple)):
+        return tuple(_freeze(x) for x in value)
+    else:
+        return value
+
+
+def _scope_key(operation_name, args, kwargs):
+    key = (operation_name, _freeze(args),
+           tuple(sorted((name, _freeze(value))
+                        for name, value in kwargs.items())))
+
+    # we can't reuse calls with unhashable arguments, like arrays
+    try:
+        hash(key)
+    except (TypeError, ValueError):
+        return None
+
+    return key
+
+
+class CacheScope(object):
+    """A private operation cache, see :func:`cache_scope`.
+
+    Attributes:
+        hits (int): The number of calls answered from this scope.
+        misses (int): The number of calls which had to be run.
+
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return _NOT_FOUND
+
+        self.hits += 1
+        return entry[0]
+
+    def _add(self, key, result, arguments):
+        # keep the arguments alive too, so no image in the key can be freed
+        # and its address reused
+        self._entries[key] = (result, arguments)
+
+    def clear(self):
+        """Drop everything in this scope."""
+        self._entries = {}
+
+
+@contextmanager
+def no_cache():
+    """Don't use the operation cache within a block.
+
+    Operations called in this thread inside the block are built directly,
+    so they neither use nor disturb the libvips operation cache. This is
+    useful for one-shot work on unique inputs, which would otherwise push
+    useful operations out of the cache. For example::
+
+        with pyvips.no_cache():
+            image = pyvips.Image.new_from_buffer(upload, '')
+            thumb = image.thumbnail_image(128)
+
+    You can also pass ``cache=False`` to any operation, or ``cache=True``
+    to use the cache inside a block like this.
+
+    """
+
+    enabled = getattr(_cache_local, 'enabled', True)
+    _cache_local.enabled = False
+    try:
+        yield
+    finally:
+        _cache_local.enabled = enabled
+
+
+@contextmanager
+def cache_scope():
+    """Cache operations for the length of a block.
+
+    Operations called in this thread inside the block skip the libvips
+    operation cache and use a private cache instead, which is dropped when
+    the block exits. Everything a request computes is then freed together
+    when the request ends, and can't evict anything useful from the main
+    cache. For example::
+
+        with pyvips.cache_scope() as scope:
+            image = pyvips.Image.new_from_file(filename)
+            for size in [64, 128, 256]:
+                ...
+        print(f'{scope.hits} hits')
+
+    Calls with unhashable arguments, such as arrays, are never reused.
+    Scopes can nest, and the innermost one is used. Pass ``cache=True`` to
+    an operation to use the main cache instead.
+
+    Returns:
+        A :class:`CacheScope`.
+
+    """
+
+    scope = CacheScope()
+    scopes = getattr(_cache_local, 'scopes', None)
+    if scopes is None:
+        scopes = _cache_local.scopes = []
+
+    scopes.append(scope)
+    try:
+        yield scope
+    finally:
+        scopes.remove(scope)
+        scope.clear()
+
+
+# record how images are made, for Image.estimate() ... this costs a little
+# on every call, so it's off unless asked for, see estimate_set_trace() and
+# estimate_trace()
+_trace = False
+_trace_local = threading.local()
+
+
+def _tracing():
+    return _trace or getattr(_trace_local, 'enabled', False)
+
+
+def estimate_set_trace(trace):
+    """Record how every image is made, for :meth:`.Image.estimate`.
+
+    Tracing costs a little on every operation call, and each traced image
+    keeps a summary of the whole pipeline which made it, so it is off by
+    default. Use :func:`estimate_trace` to trace just a block.
+
+    Args:
+        trace (bool): Trace all operations in all threads.
+
+    """
+    global _trace
+
+    _trace = trace
+
+
+@contextmanager
+def estimate_trace():
+    """Record how images are made within a block, for :meth:`.Image.estimate`.
+
+    Only operations called in this thread inside the block are traced. For
+    example::
+
+        with pyvips.estimate_trace():
+            image = pyvips.Image.new_from_file(filename)
+            image = image.resize(0.5)
+
+        if image.estimate().input_bytes > 1 << 30:
+            raise ValueError('image too large')
+
+    """
+
+    enabled = getattr(_trace_local, 'enabled', False)
+    _trace_local.enabled = True
+    try:
+        yield
+    finally:
+        _trace_local.enabled = enabled
+
+
+# loader and saver operation names are these suffixes on a format name
+_FOREIGN_SUFFIXES = ['load', 'load_buffer', 'load_source',
+                     'save', 'save_buffer', 'save_target']
+
+
+def _operation_names():
+    names = []
+
+    def add_name(gtype, a, b):
+        names.append(nickname_find(gtype))
+        type_map(gtype, add_name)
+
+        return ffi.NULL
+
+    type_map(type_from_name('VipsOperation'), add_name)
+
+    return names
+
+
+def warmup(operations=None, loaders=None):
+    """Fill the pyvips and libvips type caches ahead of time.
+
+    The first call to an operation is slower than later ones, since pyvips
+    has to look up the GTypes involved, introspect the operation and build
+    its argument tables. This function does that work now.
+
+    This is useful in pre-fork servers: warm up in the master process, then
+    fork, and the children will start with everything ready. For example::
+
+        pyvips.warmup(operations=['thumbnail_buffer', 'resize'],
+                      loaders=['jpeg', 'png', 'webp'])
+
+    With no arguments, every operation is warmed up, including all loaders
+    and savers, which takes a fraction of a second.
+
+    No pixels are processed, so no libvips worker threads are started. This
+    matters, since a child forked after the parent has run a pipeline can
+    hang, as the libvips thread pool does not survive a fork. Don't process
+    images in the master before you fork.
+
+    Calling this function also makes forked children drop the libvips
+    operation cache they inherit, since cached images can share file
+    descriptors with the parent. This happens in the child straight after
+    the fork, so only fork while no other thread is using libvips.
+
+    Args:
+        operations (list[str]): Names of operations to warm up, for example
+            ``'resize'``.
+        loaders (list[str]): Names of formats, for example ``'jpeg'``. All
+            the load and save operations for each format are warmed up.
+
+    Returns:
+        The list of operation names that were warmed up.
+
+    Raises:
+        :class:`.Error` if a named operation, or every load and save
+        operation for a named format, does not exist.
+
+    """
+    if operations is None and loaders is None:
+        # abstract classes, like "foreign", will fail introspection, so we
+        # skip errors
+        names = _operation_names()
+        required = []
+        get_suffixes()
+    else:
+        names = []
+        required = list(operations or [])
+        for loader in loaders or []:
+            names += [loader + suffix for suffix in _FOREIGN_SUFFIXES]
+
+    _register_fork_handler()
+
+    warmed = []
+    for name in required + names:
+        try:
+            intro = Introspect.get(name)
+        except Error:
+            if name in required:
+                raise
+            continue
+
+        if (intro.flags & _OPERATION_DEPRECATED) == 0:
+            Operation.generate_docstring(name)
+        warmed.append(name)
+
+    # formats only need some of the load and save operations, but a format
+    # with none of them is probably misspelled
+    for loader in loaders or []:
+        if not any(loader + suffix in warmed
+                   for suffix in _FOREIGN_SUFFIXES):
+            raise Error(f'no such format {loader}')
+
+    return warmed
+
+
+def _after_fork_in_child():
+    # cached operations can hold images with file descriptors we share with
+    # the parent, so start with an empty cache
+    max_operations = vips_lib.vips_cache_get_max()
+    vips_lib.vips_cache_set_max(0)
+    vips_lib.vips_cache_set_max(max_operations)
+
+
+_fork_handler_registered = False
+
+
+def _register_fork_handler():
+    # emptying the cache takes libvips locks, which another thread in the
+    # parent could hold at the moment of the fork ... so we only do this for
+    # pre-fork servers which opt in with warmup()
+    global _fork_handler_registered
+
+    if not _fork_handler_registered and hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_after_fork_in_child)
+        _fork_handler_registered = True
+
+
 def block_untrusted_set(state):
     """Set the block state for all untrusted operations."""
     if at_least_libvips(8, 13):
@@ -630,6 +1215,16 @@ __all__ = [
     'cache_get_max_mem',
     'cache_get_max_files',
     'cache_get_size',
+    'cache_get_stats',
+    'cache_get_entries',
+    'cache_set_stats',
+    'cache_reset_stats',
+    'CacheScope',
+    'no_cache',
+    'cache_scope',
+    'estimate_set_trace',
+    'estimate_trace',
+    'warmup',
     'block_untrusted_set',
     'operation_block_set'
 ]
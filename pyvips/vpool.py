@@ -0,0 +1,228 @@
+import collections
+import logging
+import os
+import threading
+
+import pyvips
+from pyvips import vips_lib, Error, _to_bytes, _to_string_copy
+from pyvips.vestimate import _is_sequential
+from pyvips.voperation import _freeze
+
+logger = logging.getLogger(__name__)
+
+
+def _split_filename(vips_filename):
+    vips_filename = _to_bytes(vips_filename)
+    pointer = vips_lib.vips_filename_get_filename(vips_filename)
+    filename = _to_string_copy(pointer)
+    pointer = vips_lib.vips_filename_get_options(vips_filename)
+    options = _to_string_copy(pointer)
+
+    return filename, options
+
+
+def _loader_name(image):
+    # new_from_file() calls loaders by type name, so find the nickname
+    name = image._node()[0]
+    if name is None:
+        return None
+
+    if name.startswith('Vips'):
+        name = pyvips.nickname_find(pyvips.type_from_name(name))
+
+    return name
+
+
+class ImagePool(object):
+    """Keep opened images for reuse.
+
+    Opening an image finds the loader by sniffing the file, reads the
+    header, and may hold a file open. If you open the same files over and
+    over, a pool lets you skip all that. For example::
+
+        pool = pyvips.ImagePool(max_images=1000, max_files=200)
+
+        def handle(filename, left, top):
+            image = pool.get(filename, access='random')
+            return image.crop(left, top, 256, 256).jpegsave_buffer()
+
+    Images are looked up by path, load options, file modification time and
+    file size, so a file which changes on disc is loaded again. The least
+    recently used images are dropped when the pool is over any of its
+    limits.
+
+    Pooled images are shared, so you must not modify them in place, for
+    example with :meth:`.Image.set`. Make a copy first. For the same reason,
+    images opened with ``access='sequential'`` can't be pooled, since they
+    can only be rendered once.
+
+    Attributes:
+        max_images (int): The most images to keep.
+        max_files (int): The most open files to keep, or None for no limit.
+            Each pooled image is assumed to hold one file open.
+        max_memory (int): The most memory, in bytes, for images which have
+            to be decoded to memory for random access, or None for no
+            limit. See :meth:`.Image.estimate`.
+        hits (int): The number of times an image was found in the pool.
+        misses (int): The number of times an image had to be loaded.
+        invalidations (int): The number of images dropped because the file
+            changed.
+
+    """
+
+    def __init__(self, max_images=100, max_files=None, max_memory=None):
+        """Make a new image pool.
+
+        Args:
+            max_images (int): The most images to keep.
+            max_files (int): The most open files to keep.
+            max_memory (int): The most memory to keep, in bytes.
+
+        """
+
+        self.max_images = max_images
+        self.max_files = max_files
+        self.max_memory = max_memory
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        # (path, options) -> (mtime, size, image, cost), least recently used
+        # first
+        self._entries = collections.OrderedDict()
+        self._memory = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def memory(self):
+        """The estimated memory held by the pooled images, in bytes."""
+        return self._memory
+
+    def _key(self, vips_filename, kwargs):
+        filename, options = _split_filename(vips_filename)
+        if _is_sequential(dict(kwargs, string_options=options)):
+            raise Error('unable to pool image',
+                        f'{vips_filename} is opened for sequential access')
+
+        try:
+            options = (options, tuple(sorted((name, _freeze(value))
+                                             for name, value in
+                                             kwargs.items())))
+            hash(options)
+        except (TypeError, ValueError):
+            raise Error('unable to pool image',
+                        f'unhashable load options for {vips_filename}')
+
+        return os.path.abspath(filename), options
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._memory -= entry[3]
+
+    def _trim(self):
+        while len(self._entries) > 0 and \
+                (len(self._entries) > self.max_images or
+                 (self.max_files is not None and
+                  len(self._entries) > self.max_files) or
+                 (self.max_memory is not None and
+                  self._memory > self.max_memory)):
+            key = next(iter(self._entries))
+            logger.debug('ImagePool: dropping %s', key)
+            self._remove(key)
+
+    def get(self, vips_filename, **kwargs):
+        """Get an image from the pool, loading it if necessary.
+
+        This takes the same arguments as :meth:`.Image.new_from_file`.
+
+        Args:
+            vips_filename (str): The disc file to load the image from, with
+                optional appended arguments.
+
+        Returns:
+            An :class:`.Image`.
+
+        Raises:
+            :class:`.Error`
+
+        """
+
+        key = self._key(vips_filename, kwargs)
+        try:
+            stat = os.stat(key[0])
+        except OSError as e:
+            raise Error(f'unable to load from file {vips_filename}', str(e))
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        stale = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[:2] == stamp:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+
+                stale = entry[2]
+                self._remove(key)
+                self.invalidations += 1
+            self.misses += 1
+
+        # the operation cache would give us back the old image, so ask the
+        # loader to check the file again, if it can
+        if stale is not None and 'revalidate' not in kwargs:
+            name = _loader_name(stale)
+            if name is not None and \
+                    'revalidate' in pyvips.Introspect.get(name).details:
+                kwargs = dict(kwargs, revalidate=True)
+
+        # load outside the lock, since this can be slow ... trace the load so
+        # we can estimate its cost, and find the loader if it goes stale
+        with pyvips.estimate_trace():
+            image = pyvips.Image.new_from_file(vips_filename, **kwargs)
+        cost = image.estimate(threads=1).memory['copies']
+
+        with self._lock:
+            # another thread may have loaded this file meanwhile
+            entry = self._entries.get(key)
+            if entry is not None and entry[:2] == stamp:
+                self._entries.move_to_end(key)
+                return entry[2]
+            if entry is not None:
+                self._remove(key)
+
+            self._entries[key] = (stamp[0], stamp[1], image, cost)
+            self._memory += cost
+            self._trim()
+
+        return image
+
+    def invalidate(self, vips_filename=None):
+        """Drop images from the pool.
+
+        Args:
+            vips_filename (str): Drop every image loaded from this file,
+                whatever the load options, or None to drop everything.
+
+        """
+
+        with self._lock:
+            if vips_filename is None:
+                self._entries.clear()
+                self._memory = 0
+                return
+
+            filename, _ = _split_filename(vips_filename)
+            path = os.path.abspath(filename)
+            for key in [key for key in self._entries if key[0] == path]:
+                self._remove(key)
+
+    def clear(self):
+        """Drop every image from the pool."""
+        self.invalidate()
+
+
+__all__ = ['ImagePool']
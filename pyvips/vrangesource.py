@@ -0,0 +1,240 @@
+import collections
+import concurrent.futures
+import io
+import logging
+import threading
+import weakref
+
+import pyvips
+
+logger = logging.getLogger(__name__)
+
+
+class RangeSource(pyvips.SourceCustom):
+    """A source that loads byte ranges on demand.
+
+    This is useful for images held in (for example) an object store, where
+    you can request byte ranges of a file. Loaders often only need a small
+    part of a file, such as a header and a thumbnail, so fetching just those
+    ranges can be much quicker than downloading the whole thing.
+
+    The file is divided into blocks. Blocks are fetched with your ``fetch``
+    function, and kept in an LRU cache. Runs of adjacent missing blocks are
+    fetched with a single call, and when reads are sequential, the next few
+    blocks are fetched ahead of time in a thread pool.
+
+    For example::
+
+        def fetch(offset, length):
+            response = s3.get_object(Bucket=bucket, Key=key,
+                Range=f"bytes={offset}-{offset + length - 1}")
+            return response["Body"].read()
+
+        source = pyvips.RangeSource(fetch, size)
+        image = pyvips.Image.thumbnail_source(source, 128)
+
+    Attributes:
+        bytes_fetched (int): The number of bytes returned by ``fetch``.
+        bytes_consumed (int): The number of bytes read by libvips.
+        fetches (int): The number of calls to ``fetch``.
+
+    """
+
+    def __init__(self, fetch, size, block_size=1 << 16, cache_blocks=64,
+                 readahead=4, max_workers=4):
+        """Make a new range source.
+
+        Args:
+            fetch (Callable[[int, int], bytes]): Called with an offset and a
+                length, and should return that range of bytes from the file.
+                It may be called from several threads at once.
+            size (int): The size of the file in bytes.
+            block_size (int): The unit of fetching and caching.
+            cache_blocks (int): The number of blocks to keep in the cache.
+            readahead (int): The number of blocks to prefetch during
+                sequential reads. Use 0 to disable prefetch.
+            max_workers (int): The size of the prefetch thread pool.
+
+        """
+
+        super(RangeSource, self).__init__()
+
+        self._fetch = fetch
+        self._size = size
+        self._block_size = block_size
+        self._cache_blocks = max(cache_blocks, readahead + 1)
+        self._readahead = readahead
+
+        self._position = 0
+        self._next_sequential = 0
+
+        # block number -> bytes, and block number -> Future for blocks being
+        # prefetched
+        self._lock = threading.Lock()
+        self._cache = collections.OrderedDict()
+        self._pending = {}
+        self._executor = None
+        self._finalizer = None
+        if readahead > 0:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix='pyvips-rangesource')
+            # stop the pool if we are dropped without close(), for example
+            # when a load fails
+            self._finalizer = weakref.finalize(self, self._executor.shutdown,
+                                               wait=False)
+
+        self.bytes_fetched = 0
+        self.bytes_consumed = 0
+        self.fetches = 0
+
+        self.on_readinto(self._readinto_handler)
+        self.on_seek(self._seek_handler)
+
+    def close(self):
+        """Stop the prefetch thread pool.
+
+        The pool is also stopped when the source is garbage collected.
+
+        """
+
+        if self._finalizer is not None:
+            self._finalizer()
+            self._executor = None
+
+    def _fetch_blocks(self, first, last):
+        # fetch blocks first to last inclusive with a single call, and add
+        # them to the cache
+        offset = first * self._block_size
+        length = min((last + 1) * self._block_size, self._size) - offset
+        try:
+            data = self._fetch(offset, length)
+            if len(data) != length:
+                raise pyvips.Error(f'fetch of {length} bytes at {offset} '
+                                   f'returned {len(data)} bytes')
+        except Exception:
+            # don't leave failed prefetches pending, or we'll never retry
+            with self._lock:
+                for block in range(first, last + 1):
+                    self._pending.pop(block, None)
+            raise
+
+        with self._lock:
+            self.fetches += 1
+            self.bytes_fetched += length
+
+            for block in range(first, last + 1):
+                start = (block - first) * self._block_size
+                self._cache[block] = data[start:start + self._block_size]
+                self._cache.move_to_end(block)
+                self._pending.pop(block, None)
+
+            while len(self._cache) > self._cache_blocks:
+                self._cache.popitem(last=False)
+
+    def _missing_runs(self, first, last):
+        # runs of adjacent blocks which are neither cached nor pending ... you
+        # must hold the lock
+        runs = []
+        for block in range(first, last + 1):
+            if block in self._cache or block in self._pending:
+                continue
+
+            if len(runs) > 0 and runs[-1][1] == block - 1:
+                runs[-1][1] = block
+            else:
+                runs.append([block, block])
+
+        return runs
+
+    def _get_block(self, block):
+        with self._lock:
+            if block in self._cache:
+                self._cache.move_to_end(block)
+                return self._cache[block]
+            future = self._pending.get(block)
+
+        if future is not None:
+            # if the prefetch failed, we try again below
+            concurrent.futures.wait([future])
+            with self._lock:
+                if block in self._cache:
+                    return self._cache[block]
+
+        # not found, or prefetched and then evicted
+        self._fetch_blocks(block, block)
+        with self._lock:
+            return self._cache[block]
+
+    def _prefetch(self, first, last):
+        last = min(last, (self._size - 1) // self._block_size)
+
+        with self._lock:
+            runs = self._missing_runs(first, last)
+            for run_first, run_last in runs:
+                future = self._executor.submit(self._fetch_blocks,
+                                               run_first, run_last)
+                for block in range(run_first, run_last + 1):
+                    self._pending[block] = future
+
+    def _readinto_handler(self, buf):
+        try:
+            return self._readinto(buf)
+        except Exception as e:
+            # we can't throw exceptions over libvips, we must return an error
+            logger.error('RangeSource read failed: %s', e)
+            return -1
+
+    def _readinto(self, buf):
+        end = min(self._position + len(buf), self._size)
+        if end <= self._position:
+            return 0
+
+        first = self._position // self._block_size
+        last = (end - 1) // self._block_size
+
+        # fetch all the missing blocks we need in as few calls as possible
+        with self._lock:
+            runs = self._missing_runs(first, last)
+        for run_first, run_last in runs:
+            self._fetch_blocks(run_first, run_last)
+
+        sequential = self._position == self._next_sequential
+
+        bytes_read = 0
+        while self._position < end:
+            block = self._position // self._block_size
+            data = self._get_block(block)
+            start = self._position - block * self._block_size
+            n = min(len(data) - start, end - self._position)
+            buf[bytes_read:bytes_read + n] = data[start:start + n]
+            bytes_read += n
+            self._position += n
+
+        self._next_sequential = self._position
+        self.bytes_consumed += bytes_read
+
+        if sequential and self._executor is not None:
+            self._prefetch(last + 1, last + self._readahead)
+
+        return bytes_read
+
+    def _seek_handler(self, offset, whence):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._size + offset
+        else:
+            return -1
+
+        if position < 0:
+            return -1
+
+        self._position = position
+
+        return position
+
+
+__all__ = ['RangeSource']
@@ -0,0 +1,358 @@
+import collections
+import concurrent.futures
+import os
+import threading
+import time
+
+import pyvips
+from pyvips import vips_lib, Error
+
+
+class _Job(object):
+    def __init__(self, fn, image, tenant, priority, threads, preemptible):
+        self.fn = fn
+        self.image = image
+        self.tenant = tenant
+        self.priority = priority
+        self.threads = threads
+        self.preemptible = preemptible
+        self.future = concurrent.futures.Future()
+        self.kill = False
+        self.started = 0.0
+
+    def eval_handler(self, image, progress):
+        if self.kill:
+            image.set_kill(True)
+
+
+class Scheduler(object):
+    """Run image jobs for several tenants, with priorities.
+
+    Jobs are admitted while there are free threads in the CPU budget and,
+    optionally, while libvips has less than ``max_memory`` bytes allocated.
+    Waiting jobs with the highest priority run first. Between tenants at the
+    same priority, the tenant which has used the least time so far goes
+    first, so a tenant with a large backlog can't starve the others.
+
+    Jobs with a priority of ``interactive`` or more never wait for
+    low-priority work: if they can't be admitted, running jobs with a lower
+    priority are killed with :meth:`.Image.set_kill` to make room, and put
+    back at the front of the queue to be run again from the start later.
+
+    The libvips concurrency setting is process-wide, so jobs only run
+    together if they asked for the same number of threads. A job with a
+    different thread count waits for the running jobs to finish, or, if it
+    is interactive, preempts them. For example::
+
+        scheduler = pyvips.Scheduler(threads=16, max_memory=2 << 30)
+
+        def thumbnail(image):
+            return image.thumbnail_image(128).write_to_buffer('.jpg')
+
+        # a bulk job
+        scheduler.submit(lambda image: image.write_to_file('x.tif'),
+                         big_image, tenant='batch', threads=4)
+
+        # this can preempt the bulk job
+        future = scheduler.submit(thumbnail, image, tenant='alice',
+                                  priority=pyvips.Scheduler.INTERACTIVE)
+        jpeg = future.result()
+
+    Attributes:
+        threads (int): The CPU thread budget.
+        max_memory (int): The libvips memory limit for admission, or None.
+        interactive (int): Jobs at this priority or above can preempt.
+        preemptions (int): The number of jobs killed to make room so far.
+
+    """
+
+    INTERACTIVE = 10
+
+    def __init__(self, threads=None, max_memory=None,
+                 interactive=INTERACTIVE):
+        """Make a new scheduler.
+
+        Args:
+            threads (int): The CPU thread budget. Defaults to the number of
+                CPUs.
+            max_memory (int): Don't start new jobs while libvips has this
+                many bytes allocated. Defaults to no limit.
+            interactive (int): The lowest priority which can preempt other
+                jobs.
+
+        """
+
+        if threads is None:
+            threads = os.cpu_count() or 1
+        if threads < 1:
+            raise Error(f'bad thread budget {threads}')
+
+        self.threads = threads
+        self.max_memory = max_memory
+        self.interactive = interactive
+        self.preemptions = 0
+
+        self._lock = threading.Lock()
+        # signalled when the last job finishes
+        self._idle = threading.Condition(self._lock)
+        # priority -> tenant -> deque of jobs
+        self._queues = {}
+        self._running = []
+        self._threads_used = 0
+        # tenant -> seconds used, for fairness
+        self._used = collections.defaultdict(float)
+        self._shutdown = False
+
+        # each job has at least one thread, so this is enough workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='pyvips-scheduler')
+
+    @property
+    def running(self):
+        """The number of jobs running now."""
+        with self._lock:
+            return len(self._running)
+
+    @property
+    def queued(self):
+        """The number of jobs waiting to run."""
+        with self._lock:
+            return sum(len(jobs)
+                       for tenants in self._queues.values()
+                       for jobs in tenants.values())
+
+    def submit(self, fn, image=None, tenant='default', priority=0, threads=1,
+               preemptible=None):
+        """Queue a job.
+
+        The job runs ``fn(image)`` on a worker thread, with the libvips
+        concurrency set to ``threads``. Since that setting is shared by the
+        whole process, the job never runs alongside jobs with a different
+        thread count. ``fn`` is given a private view
+        of ``image`` which the scheduler can kill, so it should make its
+        output from that rather than from the original image. If ``fn`` is
+        preempted, it will be run again later, so it must be safe to repeat.
+
+        Args:
+            fn (Callable[[Image], Any]): The function to run.
+            image (Image): The image the job renders, or None for a job
+                which can't be killed.
+            tenant (str): Who the job is for.
+            priority (int): Higher priority jobs run first.
+            threads (int): The number of threads this job will use.
+            preemptible (bool): Whether the job can be killed to make room
+                for interactive jobs. Defaults to True for jobs below
+                ``interactive`` priority with an image.
+
+        Returns:
+            A :class:`concurrent.futures.Future` for the result of ``fn``.
+
+        Raises:
+            :class:`.Error`
+
+        """
+
+        if threads < 1:
+            raise Error(f'bad thread count {threads}')
+        if preemptible is None:
+            preemptible = priority < self.interactive
+        preemptible = preemptible and image is not None
+
+        job = _Job(fn, image, tenant, priority, threads, preemptible)
+
+        with self._lock:
+            if self._shutdown:
+                raise Error('scheduler has been shut down')
+
+            self._enqueue(job)
+            self._dispatch()
+
+        return job.future
+
+    def shutdown(self, wait=True, cancel=False):
+        """Stop accepting jobs.
+
+        Args:
+            wait (bool): Wait for all queued and running jobs to finish.
+            cancel (bool): Cancel jobs which have not started.
+
+        """
+
+        with self._lock:
+            self._shutdown = True
+            if cancel:
+                for tenants in self._queues.values():
+                    for jobs in tenants.values():
+                        for job in jobs:
+                            # preempted jobs are already running
+                            if not job.future.cancel():
+                                job.future.set_exception(
+                                    Error('scheduler has been shut down'))
+                self._queues = {}
+
+            # jobs are only started by other jobs finishing, so we must wait
+            # for the queue to drain before we can stop the workers
+            if wait:
+                while len(self._running) > 0 or len(self._queues) > 0:
+                    self._idle.wait()
+
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    # all of these must be called with the lock held
+
+    def _enqueue(self, job, front=False):
+        tenants = self._queues.setdefault(job.priority, {})
+        jobs = tenants.setdefault(job.tenant, collections.deque())
+        if front:
+            jobs.appendleft(job)
+        else:
+            jobs.append(job)
+
+    def _peek(self):
+        if len(self._queues) == 0:
+            return None
+
+        tenants = self._queues[max(self._queues)]
+
+        # the tenant with the least use so far goes first
+        def usage(tenant):
+            threads = sum(job.threads
+                          for job in self._running if job.tenant == tenant)
+            return (threads, self._used[tenant])
+
+        return tenants[min(tenants, key=usage)][0]
+
+    def _dequeue(self, job):
+        tenants = self._queues[job.priority]
+        tenants[job.tenant].popleft()
+        if len(tenants[job.tenant]) == 0:
+            del tenants[job.tenant]
+        if len(tenants) == 0:
+            del self._queues[job.priority]
+
+    def _can_admit(self, job):
+        # always run something, even if it's over budget, or we'd never
+        # finish
+        if len(self._running) == 0:
+            return True
+
+        # concurrency is process-wide, so every running job must agree
+        if self._running[0].threads != job.threads:
+            return False
+
+        if self._threads_used + job.threads > self.threads:
+            return False
+
+        if self.max_memory is not None and \
+                vips_lib.vips_tracked_get_mem() >= self.max_memory:
+            return False
+
+        return True
+
+    def _preempt(self, job):
+        # wait for any jobs we've already killed to stop before we kill
+        # more, they will dispatch again as they finish
+        if any(x.kill for x in self._running):
+            return
+
+        # kill the lowest priority, most recently started jobs first, until
+        # there will be enough threads ... we can't know how much memory a
+        # job will free, so if we are over the memory limit, we kill one
+        # and look again when it's gone
+        victims = sorted((x for x in self._running
+                          if x.preemptible and x.priority < job.priority),
+                         key=lambda x: (x.priority, -x.started))
+        free = self.threads - self._threads_used
+        over_memory = self.max_memory is not None and \
+            vips_lib.vips_tracked_get_mem() >= self.max_memory
+
+        # jobs with another thread count must all go, since they share the
+        # concurrency setting ... if any of them can't be killed, there's
+        # no point killing the rest
+        others = [x for x in self._running if x.threads != job.threads]
+        if any(x not in victims for x in others):
+            return
+        for victim in others:
+            victim.kill = True
+            free += victim.threads
+            over_memory = False
+
+        for victim in victims:
+            if victim.kill:
+                continue
+            if free >= job.threads and not over_memory:
+                break
+
+            victim.kill = True
+            free += victim.threads
+            over_memory = False
+
+    def _dispatch(self):
+        while True:
+            job = self._peek()
+            if job is None:
+                break
+
+            if not self._can_admit(job):
+                if job.priority >= self.interactive:
+                    self._preempt(job)
+                break
+
+            self._dequeue(job)
+
+            # preempted jobs are already running
+            if not job.future.running() and \
+                    not job.future.set_running_or_notify_cancel():
+                continue
+
+            self._running.append(job)
+            self._threads_used += job.threads
+            job.started = time.perf_counter()
+            self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        result = None
+        error = None
+        try:
+            image = None
+            if job.image is not None:
+                image = job.image._private_view()
+                image.set_progress(True)
+                image.signal_connect('eval', job.eval_handler)
+
+            with pyvips.concurrency(job.threads):
+                result = job.fn(image)
+        except Exception as e:
+            error = e
+
+        with self._lock:
+            self._running.remove(job)
+            self._threads_used -= job.threads
+            self._used[job.tenant] += time.perf_counter() - job.started
+
+            # a job can finish before it sees the kill
+            requeue = job.kill and error is not None
+            job.kill = False
+            if requeue:
+                # start again from the beginning later
+                self.preemptions += 1
+                self._enqueue(job, front=True)
+
+            self._dispatch()
+            if len(self._running) == 0 and len(self._queues) == 0:
+                self._idle.notify_all()
+
+        if not requeue:
+            if error is None:
+                job.future.set_result(result)
+            else:
+                job.future.set_exception(error)
+
+
+__all__ = ['Scheduler']
@@ -1,10 +1,24 @@
+import io
 import logging
+import mmap
+import os
+import struct
+import tarfile
+import zipfile
 
 import pyvips
 from pyvips import ffi, vips_lib, Error, _to_bytes
 
 logger = logging.getLogger(__name__)
 
+# advice names for new_from_mmap ... not all platforms have all of these
+_MADVISE = {
+    'normal': getattr(mmap, 'MADV_NORMAL', None),
+    'random': getattr(mmap, 'MADV_RANDOM', None),
+    'sequential': getattr(mmap, 'MADV_SEQUENTIAL', None),
+    'willneed': getattr(mmap, 'MADV_WILLNEED', None),
+}
+
 
 class Source(pyvips.Connection):
     """An input connection.
@@ -91,5 +105,309 @@ class Source(pyvips.Connection):
 
         return source
 
+    @staticmethod
+    def new_from_mmap(filename, advice='sequential'):
+        """Make a new source from a memory-mapped file.
+
+        The file is mapped read-only and attached as a memory source, so
+        loaders decode straight from the page cache with no copy to the heap,
+        and libvips does not hold a file descriptor open. For example::
+
+            source = pyvips.Source.new_from_mmap("huge.tif")
+
+        The mapping stays alive until the source and every image made from
+        it have been garbage-collected.
+
+        Args:
+            filename (str): The file to map.
+            advice (str, list[str]): Hint the kernel about the access
+                pattern, one or more of ``'normal'``, ``'random'``,
+                ``'sequential'`` and ``'willneed'``. Use ``None`` for no
+                hint. Hints are ignored on platforms without ``madvise()``.
+
+        You can pass this source to (for example) :meth:`new_from_source`.
+
+        """
+
+        if advice is None:
+            advice = []
+        elif isinstance(advice, str):
+            advice = [advice]
+        for name in advice:
+            if name not in _MADVISE:
+                raise Error(f'unknown mmap advice {name}')
+
+        try:
+            with open(filename, 'rb') as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise Error(f"can't map file {filename}", str(e))
+
+        if hasattr(mapping, 'madvise'):
+            for name in advice:
+                if _MADVISE[name] is not None:
+                    mapping.madvise(_MADVISE[name])
+
+        return Source.new_from_memory(mapping)
+
+    @staticmethod
+    def new_from_fileobj(fileobj):
+        """Make a new source from a Python file object.
+
+        Make a new source that reads from a binary file-like object. For
+        example::
+
+            with open("myfile.jpg", "rb") as f:
+                source = pyvips.Source.new_from_fileobj(f)
+                image = pyvips.Image.new_from_source(source, "")
+
+        If the object is a real file at the start of its data, or an
+        unbuffered pipe or socket, the source is attached to its descriptor
+        and libvips reads from it directly, with no Python callbacks.
+        Otherwise, reads go via ``readinto()`` (or ``read()``), and if the
+        object is seekable, ``seek()`` is used too, so libvips can avoid
+        buffering the whole input. Buffered streams, such as
+        ``socket.makefile('rb')`` or ``sys.stdin.buffer``, always use the
+        Python path, since they may already have read ahead.
+
+        The file object is kept alive for as long as the source is in use,
+        but it is not closed.
+
+        You can pass this source to (for example) :meth:`new_from_source`.
+
+        """
+
+        descriptor = _fileobj_descriptor(fileobj)
+        if descriptor is not None:
+            source = Source.new_from_descriptor(descriptor)
+        else:
+            source = pyvips.SourceCustom()
+
+            if hasattr(fileobj, 'readinto'):
+                source.on_readinto(fileobj.readinto)
+            else:
+                source.on_read(fileobj.read)
+
+            if _fileobj_seekable(fileobj):
+                source.on_seek(_fileobj_seek_handler(fileobj))
+
+        # keep a secret reference to the file object to make sure it's not
+        # GCed (and closed) while libvips is using it
+        source._references = [fileobj]
+
+        return source
+
+    @staticmethod
+    def new_from_archive_member(archive, name):
+        """Make a new source from a member of a zip or tar archive.
+
+        The member is read directly from the archive, with no extraction to
+        disc or memory. For example::
+
+            source = pyvips.Source.new_from_archive_member("scans.zip",
+                                                           "page-001.tif")
+            image = pyvips.Image.new_from_source(source, "")
+
+        Members which are stored uncompressed (all members of a plain tar
+        file, and stored zip members) become seekable byte ranges over the
+        archive file. Compressed members are decompressed as they are read,
+        and so are not seekable.
+
+        Args:
+            archive (str, ZipFile, TarFile): The archive filename, or an open
+                archive.
+            name (str): The name of the member.
+
+        You can pass this source to (for example) :meth:`new_from_source`.
+
+        """
+
+        if isinstance(archive, zipfile.ZipFile):
+            return _zip_member_source(archive, name)
+        elif isinstance(archive, tarfile.TarFile):
+            return _tar_member_source(archive, name)
+        elif zipfile.is_zipfile(archive):
+            return _zip_member_source(zipfile.ZipFile(archive), name)
+        elif tarfile.is_tarfile(archive):
+            return _tar_member_source(tarfile.open(archive), name)
+        else:
+            raise Error(f'{archive} is not a zip or tar archive')
+
+
+class _FileWindow(io.RawIOBase):
+    """A read-only view of a byte range within a file."""
+
+    def __init__(self, fileobj, start, size):
+        self._fileobj = fileobj
+        self._start = start
+        self._size = size
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        elif whence == io.SEEK_END:
+            self._position = self._size + offset
+        self._position = max(0, self._position)
+
+        return self._position
+
+    def readinto(self, buf):
+        n = max(0, min(len(buf), self._size - self._position))
+        if n == 0:
+            return 0
+
+        self._fileobj.seek(self._start + self._position)
+        n = self._fileobj.readinto(memoryview(buf)[:n])
+        self._position += n
+
+        return n
+
+
+class _Unseekable(io.RawIOBase):
+    """Hide the seek method of a file object.
+
+    Decompressors can seek, but only by decompressing again from the start.
+
+    """
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        return self._fileobj.readinto(buf)
+
+
+def _member_source(fileobj, archive):
+    source = Source.new_from_fileobj(fileobj)
+
+    # the archive must stay open while the source is in use
+    source._references.append(archive)
+
+    return source
+
+
+def _zip_member_source(archive, name):
+    try:
+        info = archive.getinfo(name)
+    except KeyError:
+        raise Error(f'no member {name} in archive')
+
+    if (info.compress_type != zipfile.ZIP_STORED or
+            info.flag_bits & 0x1 or
+            archive.filename is None):
+        # compressed or encrypted, so we must stream
+        return _member_source(_Unseekable(archive.open(info)), archive)
+
+    # the data follows the local file header, whose name and extra fields
+    # can differ in length from the central directory copy
+    fileobj = open(archive.filename, 'rb')
+    fileobj.seek(info.header_offset)
+    header = fileobj.read(zipfile.sizeFileHeader)
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    start = (info.header_offset + zipfile.sizeFileHeader +
+             name_length + extra_length)
+
+    source = _member_source(_FileWindow(fileobj, start, info.file_size),
+                            archive)
+    source._references.append(fileobj)
+
+    return source
+
+
+def _tar_member_source(archive, name):
+    try:
+        info = archive.getmember(name)
+    except KeyError:
+        raise Error(f'no member {name} in archive')
+
+    if not info.isfile():
+        raise Error(f'{name} is not a regular file')
+
+    # plain tar files have a real file underneath, so we can read the member
+    # as a range ... compressed tars have a decompressor, so we must stream
+    fileobj = archive.fileobj
+    if (isinstance(fileobj, io.BufferedReader) and
+            isinstance(getattr(fileobj, 'name', None), str) and
+            not info.sparse):
+        fileobj = open(fileobj.name, 'rb')
+        source = _member_source(_FileWindow(fileobj,
+                                            info.offset_data, info.size),
+                                archive)
+        source._references.append(fileobj)
+
+        return source
+    else:
+        return _member_source(_Unseekable(archive.extractfile(info)),
+                              archive)
+
+
+def _fileobj_seekable(fileobj):
+    try:
+        return fileobj.seekable()
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def _fileobj_seek_handler(fileobj):
+    # libvips seek offsets are relative to the position we start at
+    start = fileobj.tell()
+
+    def seek_handler(offset, whence):
+        if whence == io.SEEK_SET:
+            offset += start
+        fileobj.seek(offset, whence)
+        return fileobj.tell() - start
+
+    return seek_handler
+
+
+def _fileobj_descriptor(fileobj, writing=False):
+    """The descriptor behind a file object, or None if libvips can't use it
+    directly.
+
+    We need the descriptor to be at the start of the data, since libvips will
+    seek from there. A buffered reader we can't seek may have read ahead of
+    its position, and we can't get those bytes back, so for reading we only
+    use the descriptor of an unbuffered object.
+
+    """
+
+    try:
+        descriptor = fileobj.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+    if _fileobj_seekable(fileobj):
+        # push out any pending writes, so the descriptor and the file
+        # object agree
+        if hasattr(fileobj, 'flush'):
+            fileobj.flush()
+        if fileobj.tell() != 0:
+            return None
+
+        # a buffered reader may have read ahead on the descriptor
+        os.lseek(descriptor, 0, os.SEEK_SET)
+    elif not writing and not isinstance(fileobj, io.RawIOBase):
+        return None
+    elif hasattr(fileobj, 'flush'):
+        fileobj.flush()
+
+    return descriptor
+
 
 __all__ = ['Source']
@@ -11,7 +11,7 @@ class SourceCustom(pyvips.Source):
     Requires libvips `>= 8.9.0`.
 
     To use, create a SourceCustom object, then provide callbacks to
-    :meth:`on_read` and :meth:`on_seek`.
+    :meth:`on_read` (or :meth:`on_readinto`) and :meth:`on_seek`.
     """
 
     def __init__(self):
@@ -46,6 +46,35 @@ class SourceCustom(pyvips.Source):
 
         self.signal_connect("read", interface_handler)
 
+    def on_readinto(self, handler):
+        """Attach a readinto handler.
+
+        The interface is exactly as io.RawIOBase.readinto(). The handler is
+        given a writable buffer, and should read up to that number of bytes
+        into it and return the number of bytes read. At the end of the data,
+        it should return 0.
+
+        The buffer is libvips' own memory, so data goes straight into libvips
+        without making a new bytes object for each chunk. For example::
+
+            source.on_readinto(input_file.readinto)
+
+        The buffer is only valid for the duration of the call, so the handler
+        must not keep a reference to it.
+
+        Attach either a read or a readinto handler, not both.
+
+        """
+
+        def interface_handler(buf):
+            bytes_read = handler(buf)
+            if bytes_read is None:
+                return 0
+
+            return bytes_read
+
+        self.signal_connect("read", interface_handler)
+
     def on_seek(self, handler):
         """Attach a seek handler.
 
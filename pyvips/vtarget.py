@@ -2,6 +2,8 @@ import logging
 
 import pyvips
 from pyvips import ffi, vips_lib, Error, _to_bytes
+from pyvips.vsource import _fileobj_descriptor, _fileobj_seekable, \
+    _fileobj_seek_handler
 
 logger = logging.getLogger(__name__)
 
@@ -84,5 +86,76 @@ class Target(pyvips.Connection):
 
         return Target(pointer)
 
+    @staticmethod
+    def new_to_fileobj(fileobj):
+        """Make a new target to write to a Python file object.
+
+        Make a new target that writes to a binary file-like object. For
+        example::
+
+            with open("myfile.jpg", "wb") as f:
+                target = pyvips.Target.new_to_fileobj(f)
+                image.write_to_target(target, ".jpg")
+
+        If the object is a real file or socket at the start of its data, the
+        target is attached to its descriptor and libvips writes to it
+        directly, with no Python callbacks. Otherwise, writes go via
+        ``write()``, and if the object is seekable and readable, ``seek()``
+        and ``read()`` are used too, so formats like TIFF can be written.
+
+        The file object is flushed when the write ends, but it is not closed.
+
+        You can pass this target to (for example) :meth:`write_to_target`.
+
+        """
+
+        descriptor = _fileobj_descriptor(fileobj, writing=True)
+        if descriptor is not None:
+            target = Target.new_to_descriptor(descriptor)
+        else:
+            target = pyvips.TargetCustom()
+            target.on_write(fileobj.write)
+
+            if _fileobj_seekable(fileobj):
+                target.on_seek(_fileobj_seek_handler(fileobj))
+
+                readable = getattr(fileobj, 'readable', lambda: False)
+                if readable():
+                    target.on_read(fileobj.read)
+
+            def end_handler():
+                if hasattr(fileobj, 'flush'):
+                    try:
+                        fileobj.flush()
+                    except (OSError, ValueError):
+                        return -1
+
+                return 0
+
+            target.on_end(end_handler)
+
+        # keep a secret reference to the file object to make sure it's not
+        # GCed (and closed) while libvips is using it
+        target._references = [fileobj]
+
+        return target
+
+    @staticmethod
+    def tee(*sinks, hashers=None):
+        """Make a new target that writes to several sinks at once.
+
+        For example::
+
+            target = pyvips.Target.tee(pyvips.Target.new_to_file("x.jpg"),
+                                       upload_stream, hashers=["sha256"])
+            image.write_to_target(target, ".jpg")
+            print(target.digests["sha256"])
+
+        See :class:`.TeeTarget`.
+
+        """
+
+        return pyvips.TeeTarget(*sinks, hashers=hashers)
+
 
 __all__ = ['Target']
@@ -12,16 +12,94 @@ class TargetCustom(pyvips.Target):
 
     """
 
-    def __init__(self):
+    def __init__(self, buffer_size=0):
         """Make a new target you can customise.
 
         You can pass this target to (for example) :meth:`write_to_target`.
 
+        Savers write in small chunks, and each chunk is a separate call to
+        your write handler. Set ``buffer_size`` to collect chunks into a
+        buffer of that many bytes, so your write handler is only called with
+        large chunks, and finally to flush any remaining bytes just before
+        your end handler runs. For example::
+
+            target = pyvips.TargetCustom(buffer_size=4 << 20)
+
+        This only reduces the number of calls to your write handler, and so
+        to whatever it writes to, such as a socket or an object store. The
+        buffer is kept in Python, so the number of callbacks from libvips,
+        each of which takes the GIL, is unchanged.
+
+        Args:
+            buffer_size (int): Collect writes into a buffer of this size
+                before calling the write handler. The default of 0 means no
+                buffering.
+
         """
 
         target = ffi.cast('VipsTarget*', vips_lib.vips_target_custom_new())
         super(TargetCustom, self).__init__(target)
 
+        self._buffer = None
+        if buffer_size > 0:
+            self._buffer = bytearray(buffer_size)
+            self._buffer_used = 0
+            self._write_handler = None
+            self._end_handler = None
+
+            # we must always flush at the end, even if there's no end handler
+            if at_least_libvips(8, 13):
+                self.signal_connect("end", self._buffered_end)
+            else:
+                self.signal_connect("finish", self._buffered_end)
+
+    def _write_all(self, view):
+        # loop until the write handler has taken everything
+        while len(view) > 0:
+            bytes_written = self._write_handler(view)
+            if bytes_written is None or bytes_written <= 0:
+                return -1
+            view = view[bytes_written:]
+
+        return 0
+
+    def _flush(self):
+        if self._buffer_used == 0:
+            return 0
+
+        with memoryview(self._buffer) as view:
+            result = self._write_all(view[:self._buffer_used])
+        self._buffer_used = 0
+
+        return result
+
+    def _buffered_write(self, buf):
+        length = len(buf)
+
+        if self._buffer_used + length > len(self._buffer):
+            if self._flush() != 0:
+                return -1
+
+        if length >= len(self._buffer):
+            # too large to be worth buffering, pass straight through
+            if self._write_all(memoryview(buf)) != 0:
+                return -1
+        else:
+            self._buffer[self._buffer_used:self._buffer_used + length] = buf
+            self._buffer_used += length
+
+        return length
+
+    def _buffered_end(self):
+        result = self._flush()
+
+        if self._end_handler is not None:
+            end_result = self._end_handler()
+            if result == 0 and end_result is not None:
+                result = end_result
+
+        return result
+
     def on_write(self, handler):
         """Attach a write handler.
 
@@ -29,8 +107,17 @@ class TargetCustom(pyvips.Target):
         bytes-like object to write, and should return the number of bytes
         written.
 
+        If this target has a buffer, the bytes-like object is only valid for
+        the duration of the call, so the handler must copy anything it needs
+        to keep.
+
         """
 
+        if self._buffer is not None:
+            self._write_handler = handler
+            self.signal_connect("write", self._buffered_write)
+            return
+
         def interface_handler(buf):
             return handler(buf)
 
@@ -51,6 +138,9 @@ class TargetCustom(pyvips.Target):
         """
 
         def interface_handler(buf):
+            if self._buffer is not None and self._flush() != 0:
+                return -1
+
             chunk = handler(len(buf))
             if chunk is None:
                 return 0
@@ -78,8 +168,14 @@ class TargetCustom(pyvips.Target):
 
         """
 
+        def interface_handler(offset, whence):
+            if self._buffer is not None and self._flush() != 0:
+                return -1
+
+            return handler(offset, whence)
+
         if at_least_libvips(8, 13):
-            self.signal_connect("seek", handler)
+            self.signal_connect("seek", interface_handler)
 
     def on_end(self, handler):
         """Attach an end handler.
@@ -89,7 +185,10 @@ class TargetCustom(pyvips.Target):
 
         """
 
-        if not at_least_libvips(8, 13):
+        if self._buffer is not None:
+            # we flush, then call this, from our own end handler
+            self._end_handler = handler
+        elif not at_least_libvips(8, 13):
             # fall back for older libvips
             self.on_finish(handler)
         else:
@@ -103,7 +202,10 @@ class TargetCustom(pyvips.Target):
 
         """
 
-        self.signal_connect("finish", handler)
+        if self._buffer is not None:
+            self._end_handler = handler
+        else:
+            self.signal_connect("finish", handler)
 
 
 __all__ = ['TargetCustom']
@@ -0,0 +1,123 @@
+import hashlib
+import logging
+
+import pyvips
+from pyvips import ffi, vips_lib, at_least_libvips
+
+logger = logging.getLogger(__name__)
+
+
+def _write_all(write, chunk):
+    # sinks which say how much they wrote may write less than all of it
+    view = memoryview(chunk)
+    while len(view) > 0:
+        bytes_written = write(view)
+        if not isinstance(bytes_written, int) or \
+                bytes_written >= len(view):
+            break
+        if bytes_written <= 0:
+            raise pyvips.Error('sink wrote nothing')
+        view = view[bytes_written:]
+
+
+class TeeTarget(pyvips.TargetCustom):
+    """A target that copies the output to several sinks.
+
+    Each chunk the saver writes is passed on to every sink, and fed to a set
+    of hash functions, so you can (for example) write to a local cache and
+    an upload stream and compute an ETag in a single encode. For example::
+
+        with open("cache.jpg", "wb") as f:
+            target = pyvips.Target.tee(f, upload_stream,
+                                       hashers=["sha256", "md5"])
+            image.write_to_target(target, ".jpg")
+        etag = target.digests["md5"]
+
+    Sinks can be :class:`.Target` objects, file-like objects with a
+    ``write()`` method, or callables which are passed each chunk. Sinks
+    are ended (for targets) or flushed (for file-like objects) when the
+    write ends, but are not closed.
+
+    Each chunk is a view of a libvips buffer which is only valid during the
+    call, so sinks which keep chunks must copy them, for example with
+    ``bytes(chunk)``. If a sink returns a count of bytes written, as
+    ``write()`` on an unbuffered file does, it's called again with the
+    rest of the chunk until everything is written, and a count of zero is
+    an error.
+
+    Tee targets can't seek, so they can't be used for formats like TIFF.
+
+    Attributes:
+        hashers (list): The hash objects, see :mod:`hashlib`.
+        digests (dict): Hash name to hex digest, once the write has ended.
+
+    """
+
+    def __init__(self, *sinks, hashers=None):
+        """Make a new tee target.
+
+        Args:
+            sinks (Target, file, Callable[[bytes], Any]): Write to these.
+            hashers (list[str, hash]): Hash names such as ``"sha256"`` to
+                pass to :func:`hashlib.new`, or hash objects with
+                ``update()`` and ``hexdigest()`` methods.
+
+        """
+
+        super(TeeTarget, self).__init__()
+
+        self._sinks = list(sinks)
+        self.hashers = [hashlib.new(hasher) if isinstance(hasher, str)
+                        else hasher
+                        for hasher in (hashers or [])]
+        self.digests = None
+
+        self.on_write(self._tee_write)
+        self.on_end(self._tee_end)
+
+    def _tee_write(self, chunk):
+        for hasher in self.hashers:
+            hasher.update(chunk)
+
+        for sink in self._sinks:
+            if isinstance(sink, pyvips.Target):
+                data = ffi.from_buffer(chunk)
+                if vips_lib.vips_target_write(sink.pointer,
+                                              data, len(chunk)) != 0:
+                    return -1
+            else:
+                write = getattr(sink, 'write', sink)
+                try:
+                    _write_all(write, chunk)
+                except Exception as e:
+                    # we can't throw exceptions over libvips, we must return
+                    # an error
+                    logger.error('TeeTarget write failed: %s', e)
+                    return -1
+
+        return len(chunk)
+
+    def _tee_end(self):
+        result = 0
+
+        for sink in self._sinks:
+            if isinstance(sink, pyvips.Target):
+                if at_least_libvips(8, 13):
+                    if vips_lib.vips_target_end(sink.pointer) != 0:
+                        result = -1
+                else:
+                    vips_lib.vips_target_finish(sink.pointer)
+            elif hasattr(sink, 'flush'):
+                try:
+                    sink.flush()
+                except Exception as e:
+                    logger.error('TeeTarget flush failed: %s', e)
+                    result = -1
+
+        self.digests = {hasher.name: hasher.hexdigest()
+                        for hasher in self.hashers}
+
+        return result
+
+
+__all__ = ['TeeTarget']
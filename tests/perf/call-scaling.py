@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import sys
+import threading
+
+import pyperf
+import pyvips
+
+# small pipelines are dominated by python overhead, so this scales with
+# python threads only on a free-threaded build
+PYTHON_THREADS = [1, 2, 4, 8]
+PIPELINES_PER_THREAD = 100
+
+
+def render():
+    for _ in range(PIPELINES_PER_THREAD):
+        image = pyvips.Image.black(32, 32, bands=3) + 1
+        image = image.embed(4, 4, 40, 40, extend='copy').flip('horizontal')
+        _ = image.avg()
+
+
+def call_scaling(loops, python_threads):
+    # we want to time the calls, not the operation cache, and keep libvips
+    # to one thread so any speedup comes from python
+    pyvips.cache_set_max(0)
+    pyvips.concurrency_set(1)
+
+    range_it = range(loops)
+
+    t0 = pyperf.perf_counter()
+
+    for loops in range_it:
+        threads = [threading.Thread(target=render)
+                   for _ in range(python_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return pyperf.perf_counter() - t0
+
+
+runner = pyperf.Runner()
+gil = 'GIL' if getattr(sys, '_is_gil_enabled', lambda: True)() else 'no GIL'
+for python_threads in PYTHON_THREADS:
+    # inner_loops makes pyperf report time per pipeline
+    runner.bench_time_func(f'{python_threads} python threads ({gil})',
+                           call_scaling, python_threads,
+                           inner_loops=python_threads * PIPELINES_PER_THREAD)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import os
+
+import pyperf
+import pyvips
+
+# many small files, so the time to find the loader and read the header
+# dominates
+N_FILES = 10000
+TMP = os.path.join('tmp', 'small-jpegs')
+
+
+def make_files():
+    if os.path.isdir(TMP) and len(os.listdir(TMP)) == N_FILES:
+        return
+
+    os.makedirs(TMP, exist_ok=True)
+    data = (pyvips.Image.black(64, 64, bands=3) + 128).jpegsave_buffer()
+    for i in range(N_FILES):
+        with open(os.path.join(TMP, f'{i}.jpg'), 'wb') as f:
+            f.write(data)
+
+
+def open_files(loops, mode):
+    # time opening files, not the operation cache
+    pyvips.cache_set_max(0)
+    pyvips.loader_cache_set(mode == 'loader cache')
+    pyvips.loader_cache_clear()
+    kwargs = {'loader': 'jpegload'} if mode == 'loader=' else {}
+    filenames = [os.path.join(TMP, f'{i}.jpg') for i in range(N_FILES)]
+
+    range_it = range(loops)
+
+    t0 = pyperf.perf_counter()
+
+    for loops in range_it:
+        for filename in filenames:
+            _ = pyvips.Image.new_from_file(filename, **kwargs).width
+
+    return pyperf.perf_counter() - t0
+
+
+make_files()
+runner = pyperf.Runner()
+for mode in ['sniff', 'loader cache', 'loader=']:
+    # inner_loops makes pyperf report time per file
+    runner.bench_time_func(f'new_from_file ({mode})', open_files, mode,
+                           inner_loops=N_FILES)
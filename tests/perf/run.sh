@@ -27,6 +27,18 @@ echo testing operation-call.py ...
 python3 operation-call.py -o operation-call.json
 python3 -m pyperf stats operation-call.json
 
+echo testing thread-scaling.py ...
+python3 thread-scaling.py -o thread-scaling.json
+python3 -m pyperf stats thread-scaling.json
+
+echo testing call-scaling.py ...
+python3 call-scaling.py -o call-scaling.json
+python3 -m pyperf stats call-scaling.json
+
+echo testing loader-overhead.py ...
+python3 loader-overhead.py -o loader-overhead.json
+python3 -m pyperf stats loader-overhead.json
+
 # command to test if a difference is significant
 # python3 -m pyperf compare_to operation-call2.json operation-call.json --table
 
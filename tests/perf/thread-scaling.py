@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+import os
+import threading
+
+import pyperf
+import pyvips
+
+# python threads x libvips worker threads per pipeline
+PYTHON_THREADS = [1, 2, 4, 8]
+VIPS_THREADS = sorted(set([1, 2, 4, os.cpu_count() or 1]))
+
+
+def render():
+    im = pyvips.Image.new_from_file("tmp/x.jpg", access='sequential')
+    im = im.resize(0.5)
+    im = im.sharpen()
+    _ = im.write_to_buffer(".jpg")
+
+
+def thread_scaling(loops, python_threads, vips_threads):
+    # we want to time the pipelines, not the operation cache
+    pyvips.cache_set_max(0)
+    pyvips.concurrency_set(vips_threads)
+
+    range_it = range(loops)
+
+    t0 = pyperf.perf_counter()
+
+    for loops in range_it:
+        threads = [threading.Thread(target=render)
+                   for _ in range(python_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return pyperf.perf_counter() - t0
+
+
+runner = pyperf.Runner()
+for python_threads in PYTHON_THREADS:
+    for vips_threads in VIPS_THREADS:
+        # inner_loops makes pyperf report time per image, ie. 1 / throughput
+        runner.bench_time_func(f'{python_threads} python threads x '
+                               f'{vips_threads} libvips threads',
+                               thread_scaling, python_threads, vips_threads,
+                               inner_loops=python_threads)
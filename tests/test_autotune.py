@@ -0,0 +1,115 @@
+# vim: set fileencoding=utf-8 :
+
+import os
+import socket
+import tempfile
+import time
+
+import pytest
+import pyvips
+from pyvips.vautotune import _open_files
+
+
+class TestAutotune:
+    def setup_method(self):
+        self.limits = (pyvips.cache_get_max(),
+                       pyvips.cache_get_max_mem(),
+                       pyvips.cache_get_max_files())
+
+    def teardown_method(self):
+        max_operations, max_mem, max_files = self.limits
+        pyvips.cache_set_max(max_operations)
+        pyvips.cache_set_max_mem(max_mem)
+        pyvips.cache_set_max_files(max_files)
+        # tests which only step() leave statistics on
+        pyvips.cache_set_stats(False)
+
+    def test_autotune_thrashing(self):
+        tuner = pyvips.CacheAutotuner(max_memory=1 << 40, max_files=1000,
+                                      min_operations=2)
+        pyvips.cache_set_max(2)
+        tuner.step()
+
+        # more distinct operations than the cache can hold, twice over
+        for _ in range(2):
+            for i in range(5):
+                pyvips.Image.black(10, 10 + i)
+
+        sample = tuner.step()
+        assert sample['state'] == 'thrashing'
+        assert sample['evictions'] > 0
+        assert pyvips.cache_get_max() == 4
+
+    def test_autotune_idle(self):
+        tuner = pyvips.CacheAutotuner(max_memory=1 << 40, max_files=1000)
+        pyvips.cache_set_max(1000)
+        pyvips.cache_set_max_mem(100 << 20)
+        tuner.step()
+
+        sample = tuner.step()
+        assert sample['state'] == 'idle'
+        assert pyvips.cache_get_max() == 500
+        assert pyvips.cache_get_max_mem() == 50 << 20
+
+    def test_autotune_over(self):
+        # we're always over a 1 byte ceiling
+        tuner = pyvips.CacheAutotuner(max_memory=1, max_files=1000,
+                                      min_memory=1 << 20)
+        pyvips.cache_set_max_mem(100 << 20)
+
+        sample = tuner.step()
+        assert sample['state'] == 'over'
+        assert pyvips.cache_get_max_mem() == 1 << 20
+
+    def test_autotune_thread(self):
+        with pyvips.CacheAutotuner(max_memory=1 << 40,
+                                   interval=0.01) as tuner:
+            for i in range(20):
+                pyvips.Image.black(10, 10 + i)
+                time.sleep(0.005)
+
+        assert tuner.sample is not None
+        assert (pyvips.cache_get_max(),
+                pyvips.cache_get_max_mem(),
+                pyvips.cache_get_max_files()) == self.limits
+
+    def test_autotune_stats(self):
+        assert not pyvips.voperation._cache_stats
+
+        # stats are on while tuning, and put back afterwards
+        tuner = pyvips.CacheAutotuner(max_memory=1 << 40, max_files=1000)
+        tuner.step()
+        assert pyvips.voperation._cache_stats
+        tuner.stop()
+        assert not pyvips.voperation._cache_stats
+
+        with pyvips.CacheAutotuner(max_memory=1 << 40, interval=0.01):
+            time.sleep(0.05)
+        assert not pyvips.voperation._cache_stats
+
+        # and if they were already on, they stay on
+        pyvips.cache_set_stats(True)
+        try:
+            tuner.step()
+            tuner.stop()
+            assert pyvips.voperation._cache_stats
+        finally:
+            pyvips.cache_set_stats(False)
+
+    @pytest.mark.skipif(not os.path.isdir('/proc/self/fd'),
+                        reason="needs /proc/self/fd")
+    def test_autotune_open_files(self):
+        files = _open_files()
+
+        # pipes and sockets aren't files the cache can close
+        read_fd, write_fd = os.pipe()
+        sock = socket.socket()
+        try:
+            assert _open_files() == files
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+            sock.close()
+
+        with tempfile.TemporaryFile():
+            assert _open_files() == files + 1
@@ -0,0 +1,84 @@
+# vim: set fileencoding=utf-8 :
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import pyvips
+from helpers import JPEG_FILE, skip_if_no
+
+
+class TestBatch:
+    @classmethod
+    def setup_class(cls):
+        cls.tempdir = tempfile.mkdtemp()
+
+        cls.inputs = []
+        for name in ['a', 'b', 'c']:
+            filename = os.path.join(cls.tempdir, f'{name}.jpg')
+            shutil.copy(JPEG_FILE, filename)
+            cls.inputs.append(filename)
+
+        cls.bad = os.path.join(cls.tempdir, 'bad.jpg')
+        with open(cls.bad, 'wb') as f:
+            f.write(b'not an image')
+
+    @classmethod
+    def teardown_class(cls):
+        shutil.rmtree(cls.tempdir, ignore_errors=True)
+
+    @skip_if_no('jpegload')
+    def test_batch_thumbnail(self):
+        batch = pyvips.batch.thumbnail(self.inputs + [self.bad], 64,
+                                       'tn_%s.png', workers=2)
+        results = {result.input: result for result in batch}
+
+        assert sorted(results) == sorted(self.inputs + [self.bad])
+        for filename in self.inputs:
+            result = results[filename]
+            assert result.ok
+            name = os.path.splitext(os.path.basename(filename))[0]
+            assert result.output == \
+                os.path.join(self.tempdir, f'tn_{name}.png')
+            assert result.bytes_written == os.path.getsize(result.output)
+            assert pyvips.Image.new_from_file(result.output).width == 64
+
+        result = results[self.bad]
+        assert not result.ok
+        assert isinstance(result.error, pyvips.Error)
+        assert result.output is None
+
+        assert batch.stats.items == 4
+        assert batch.stats.failures == 1
+        assert batch.stats.items_per_second > 0
+
+    @skip_if_no('jpegload')
+    def test_batch_output_function(self):
+        def output(filename):
+            return filename + '.small.png[compression=1]'
+
+        batch = pyvips.batch.thumbnail(iter(self.inputs[:1]), 32, output,
+                                       workers=1, threads_per_worker=1,
+                                       height=16, crop='centre')
+        results = list(batch)
+
+        assert len(results) == 1
+        assert results[0].output == self.inputs[0] + '.small.png'
+        image = pyvips.Image.new_from_file(results[0].output)
+        assert image.width == 32
+        assert image.height == 16
+
+    def test_batch_worker_crash(self):
+        # every job kills its worker process
+        jobs = [(f'item{i}', (1,)) for i in range(3)]
+        batch = pyvips.batch.Batch(os._exit, jobs, 1, 1, None,
+                                   multiprocessing.get_context('spawn'))
+        results = list(batch)
+
+        assert sorted(result.input for result in results) == \
+            [input for input, _ in jobs]
+        for result in results:
+            assert not result.ok
+            assert isinstance(result.error, pyvips.Error)
+        assert batch.stats.failures == 3
@@ -0,0 +1,134 @@
+# vim: set fileencoding=utf-8 :
+
+import pyvips
+
+
+class TestCache:
+    def setup_method(self):
+        self.max = pyvips.cache_get_max()
+        pyvips.cache_set_stats(True)
+
+    def teardown_method(self):
+        pyvips.cache_set_max(self.max)
+        pyvips.cache_set_stats(False)
+
+    def test_cache_stats_off(self):
+        pyvips.cache_reset_stats()
+        pyvips.cache_set_stats(False)
+        pyvips.Image.black(12, 34)
+        pyvips.Image.black(12, 34)
+        assert pyvips.cache_get_stats()['operations'] == {}
+
+    def test_cache_stats(self):
+        # start with an empty cache
+        pyvips.cache_set_max(0)
+        pyvips.cache_set_max(100)
+        pyvips.cache_reset_stats()
+
+        image = pyvips.Image.black(123, 456)
+        image = pyvips.Image.black(123, 456)
+        image = pyvips.Image.black(123, 457)
+
+        stats = pyvips.cache_get_stats()
+        assert stats['operations']['black'] == \
+            {'hits': 1, 'misses': 2, 'uncached': 0}
+        assert stats['hits'] == 1
+        assert stats['misses'] == 2
+        assert stats['evictions'] == 0
+        assert stats['size'] == 2
+        assert stats['max'] == 100
+        assert stats['memory'] >= 0
+
+        entries = pyvips.cache_get_entries()
+        assert [entry['operation'] for entry in entries] == ['black', 'black']
+        # least recently used first
+        assert [entry['hits'] for entry in entries] == [1, 0]
+        assert all(entry['age'] >= entry['last_used'] for entry in entries)
+
+        del image
+
+    def test_cache_evictions(self):
+        pyvips.cache_set_max(0)
+        pyvips.cache_set_max(2)
+        pyvips.cache_reset_stats()
+
+        for i in range(5):
+            pyvips.Image.black(10, 10 + i)
+
+        stats = pyvips.cache_get_stats()
+        assert stats['misses'] == 5
+        assert stats['size'] == 2
+        assert stats['evictions'] == 3
+        assert len(pyvips.cache_get_entries()) == 2
+
+        pyvips.cache_set_max(0)
+        assert pyvips.cache_get_stats()['evictions'] == 5
+        assert pyvips.cache_get_entries() == []
+
+    def test_cache_reset_stats(self):
+        pyvips.Image.black(10, 10)
+        pyvips.cache_reset_stats()
+
+        stats = pyvips.cache_get_stats()
+        assert stats['hits'] == 0
+        assert stats['misses'] == 0
+        assert stats['operations'] == {}
+
+    def test_cache_false(self):
+        pyvips.cache_set_max(0)
+        pyvips.cache_set_max(100)
+        pyvips.cache_reset_stats()
+
+        image = pyvips.Image.black(321, 123, cache=False)
+        assert image.width == 321
+        assert pyvips.cache_get_size() == 0
+
+        with pyvips.no_cache():
+            image = pyvips.Image.black(321, 123)
+            assert (image + 1).avg() == 1
+            assert pyvips.cache_get_size() == 0
+
+            # and back on again
+            image = pyvips.Image.black(321, 123, cache=True)
+            assert pyvips.cache_get_size() == 1
+
+        stats = pyvips.cache_get_stats()
+        assert stats['operations']['black']['uncached'] == 2
+        assert stats['operations']['black']['misses'] == 1
+
+        # operations with their own cache argument keep it
+        intro = pyvips.Introspect.get('system')
+        assert 'cache' in intro.details
+
+    def test_cache_scope(self):
+        pyvips.cache_set_max(0)
+        pyvips.cache_set_max(100)
+
+        with pyvips.cache_scope() as scope:
+            a = pyvips.Image.black(321, 123)
+            b = pyvips.Image.black(321, 123)
+            assert a is b
+            c = pyvips.Image.black(321, 124)
+            assert c is not a
+            assert (a + 1).avg() == 1
+            assert (b + 1).avg() == 1
+
+            assert scope.hits == 3
+            assert scope.misses == 4
+            assert len(scope) == 4
+            assert pyvips.cache_get_size() == 0
+
+            # unhashable arguments are never reused
+            pyvips.Image.new_from_memory(bytearray(4), 2, 2, 1, 'uchar')
+            pyvips.Image.new_from_memory(bytearray(4), 2, 2, 1, 'uchar')
+
+            # nested scopes are separate
+            with pyvips.cache_scope() as inner:
+                pyvips.Image.black(321, 123)
+                assert inner.misses == 1
+
+            # this goes in the main cache
+            pyvips.Image.black(321, 123, cache=True)
+            assert pyvips.cache_get_size() == 1
+
+        assert len(scope) == 0
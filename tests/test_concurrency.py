@@ -0,0 +1,61 @@
+# vim: set fileencoding=utf-8 :
+
+import threading
+
+import pyvips
+
+
+class TestConcurrency:
+    def test_concurrency_set(self):
+        old = pyvips.concurrency_get()
+
+        pyvips.concurrency_set(3)
+        assert pyvips.concurrency_get() == 3
+
+        pyvips.concurrency_set(old)
+        assert pyvips.concurrency_get() == old
+
+    def test_concurrency_block(self):
+        old = pyvips.concurrency_get()
+
+        with pyvips.concurrency(2):
+            assert pyvips.concurrency_get() == 2
+
+            # the tightest bound wins
+            with pyvips.concurrency(5):
+                assert pyvips.concurrency_get() == 2
+
+            with pyvips.concurrency(1):
+                assert pyvips.concurrency_get() == 1
+
+            assert pyvips.concurrency_get() == 2
+
+            image = pyvips.Image.black(100, 100) + 1
+            assert image.avg() == 1
+
+        assert pyvips.concurrency_get() == old
+
+    def test_concurrency_threads(self):
+        old = pyvips.concurrency_get()
+        inside = threading.Barrier(4)
+        errors = []
+
+        def worker():
+            try:
+                with pyvips.concurrency(2):
+                    inside.wait()
+                    image = pyvips.Image.black(200, 200) + 3
+                    assert image.avg() == 3
+                    assert pyvips.concurrency_get() == 2
+                    inside.wait()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert pyvips.concurrency_get() == old
@@ -1,6 +1,12 @@
 # vim: set fileencoding=utf-8 :
 
+import hashlib
+import io
+import os
+import tarfile
 import tempfile
+import threading
+import zipfile
 import pytest
 
 import pyvips
@@ -67,6 +73,26 @@ class TestConnections:
 
         assert (image - image2).abs().max() == 0
 
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_source_custom_readinto(self):
+        input_file = open(JPEG_FILE, "rb")
+
+        def seek_handler(offset, whence):
+            input_file.seek(offset, whence)
+            return input_file.tell()
+
+        source = pyvips.SourceCustom()
+        source.on_readinto(input_file.readinto)
+        source.on_seek(seek_handler)
+
+        image = pyvips.Image.new_from_source(source, '',
+                                             access='sequential')
+        image2 = pyvips.Image.new_from_file(JPEG_FILE, access='sequential')
+
+        assert (image - image2).abs().max() == 0
+
     @skip_if_no('jpegload')
     @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
                         reason="requires libvips >= 8.9")
@@ -137,6 +163,262 @@ class TestConnections:
 
         assert (image - image2).abs().max() == 0
 
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_target_custom_buffered(self):
+        chunks = []
+        ended = False
+
+        def write_handler(chunk):
+            chunks.append(bytes(chunk))
+            return len(chunk)
+
+        def end_handler():
+            nonlocal ended
+            ended = True
+            return 0
+
+        target = pyvips.TargetCustom(buffer_size=1 << 20)
+        target.on_write(write_handler)
+        target.on_end(end_handler)
+
+        image = pyvips.Image.new_from_file(JPEG_FILE, access='sequential')
+        image.write_to_target(target, '.png')
+
+        assert ended
+        # the whole png is less than the buffer size
+        assert len(chunks) == 1
+
+        image = pyvips.Image.new_from_file(JPEG_FILE, access='sequential')
+        assert chunks[0] == image.write_to_buffer('.png')
+
+    @skip_if_no('jpegload')
+    @skip_if_no('tiffsave')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 13),
+                        reason="requires libvips >= 8.13")
+    def test_target_custom_buffered_seek(self):
+        filename = temp_filename(self.tempdir, '.tif')
+        output_file = open(filename, "w+b")
+
+        def write_handler(chunk):
+            return output_file.write(chunk)
+
+        def read_handler(size):
+            return output_file.read(size)
+
+        def seek_handler(offset, whence):
+            output_file.seek(offset, whence)
+            return output_file.tell()
+
+        def end_handler():
+            output_file.close()
+            return 0
+
+        # a small buffer, so we get a mix of buffered writes and flushes
+        target = pyvips.TargetCustom(buffer_size=1000)
+        target.on_write(write_handler)
+        target.on_read(read_handler)
+        target.on_seek(seek_handler)
+        target.on_end(end_handler)
+
+        image = pyvips.Image.new_from_file(JPEG_FILE, access='sequential')
+        image.write_to_target(target, '.tif')
+
+        image = pyvips.Image.new_from_file(JPEG_FILE, access='sequential')
+        image2 = pyvips.Image.new_from_file(filename, access='sequential')
+
+        assert (image - image2).abs().max() == 0
+
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_fileobj_descriptor(self):
+        filename = temp_filename(self.tempdir, '.png')
+
+        with open(JPEG_FILE, 'rb') as f:
+            source = pyvips.Source.new_from_fileobj(f)
+            assert not isinstance(source, pyvips.SourceCustom)
+            image = pyvips.Image.new_from_source(source, '',
+                                                 access='sequential')
+
+            with open(filename, 'wb') as g:
+                target = pyvips.Target.new_to_fileobj(g)
+                assert not isinstance(target, pyvips.TargetCustom)
+                image.write_to_target(target, '.png')
+
+        image = pyvips.Image.new_from_file(JPEG_FILE, access='sequential')
+        image2 = pyvips.Image.new_from_file(filename, access='sequential')
+
+        assert (image - image2).abs().max() == 0
+
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_fileobj_pipe(self):
+        with open(JPEG_FILE, 'rb') as f:
+            data = f.read()
+        image2 = pyvips.Image.new_from_file(JPEG_FILE)
+
+        def load(buffering):
+            read_fd, write_fd = os.pipe()
+
+            def writer():
+                with os.fdopen(write_fd, 'wb') as g:
+                    g.write(data)
+
+            thread = threading.Thread(target=writer)
+            thread.start()
+            with os.fdopen(read_fd, 'rb', buffering=buffering) as f:
+                if buffering != 0:
+                    # read ahead into the python buffer
+                    assert f.peek(1)[:2] == data[:2]
+                source = pyvips.Source.new_from_fileobj(f)
+                image = pyvips.Image.new_from_source(source, '')
+                assert (image - image2).abs().max() == 0
+            thread.join()
+
+            return source
+
+        # unbuffered pipes can use the descriptor, buffered ones can't
+        assert not isinstance(load(0), pyvips.SourceCustom)
+        assert isinstance(load(-1), pyvips.SourceCustom)
+
+    @skip_if_no('jpegload')
+    @skip_if_no('tiffsave')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 13),
+                        reason="requires libvips >= 8.13")
+    def test_fileobj_custom(self):
+        with open(JPEG_FILE, 'rb') as f:
+            data = f.read()
+
+        # not at the start, so seeks must be relative to the first byte
+        f = io.BytesIO(b'junk' + data)
+        f.seek(4)
+        source = pyvips.Source.new_from_fileobj(f)
+        assert isinstance(source, pyvips.SourceCustom)
+        image = pyvips.Image.new_from_source(source, '')
+
+        g = io.BytesIO()
+        target = pyvips.Target.new_to_fileobj(g)
+        assert isinstance(target, pyvips.TargetCustom)
+        image.write_to_target(target, '.tif')
+
+        image = pyvips.Image.new_from_file(JPEG_FILE)
+        image2 = pyvips.Image.new_from_buffer(g.getvalue(), '')
+
+        assert (image - image2).abs().max() == 0
+
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_mmap(self):
+        image = pyvips.Image.new_from_mmap(JPEG_FILE, '',
+                                           advice=['random', 'willneed'])
+        image = image.invert()
+        image2 = pyvips.Image.new_from_file(JPEG_FILE).invert()
+
+        assert (image - image2).abs().max() == 0
+
+        with pytest.raises(pyvips.Error):
+            pyvips.Source.new_from_mmap(JPEG_FILE, advice='fast')
+
+        with pytest.raises(pyvips.Error):
+            pyvips.Source.new_from_mmap(temp_filename(self.tempdir, '.jpg'))
+
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_archive_member(self):
+        zip_filename = temp_filename(self.tempdir, '.zip')
+        with zipfile.ZipFile(zip_filename, 'w') as archive:
+            archive.write(JPEG_FILE, 'stored.jpg',
+                          compress_type=zipfile.ZIP_STORED)
+            archive.write(JPEG_FILE, 'deflated.jpg',
+                          compress_type=zipfile.ZIP_DEFLATED)
+
+        tar_filename = temp_filename(self.tempdir, '.tar')
+        with tarfile.open(tar_filename, 'w') as archive:
+            archive.add(JPEG_FILE, 'plain.jpg')
+
+        tgz_filename = temp_filename(self.tempdir, '.tar.gz')
+        with tarfile.open(tgz_filename, 'w:gz') as archive:
+            archive.add(JPEG_FILE, 'gzipped.jpg')
+
+        members = [
+            (zip_filename, 'stored.jpg'),
+            (zip_filename, 'deflated.jpg'),
+            (tar_filename, 'plain.jpg'),
+            (tgz_filename, 'gzipped.jpg'),
+        ]
+        for archive, name in members:
+            source = pyvips.Source.new_from_archive_member(archive, name)
+            image = pyvips.Image.new_from_source(source, '',
+                                                 access='sequential')
+            image2 = pyvips.Image.new_from_file(JPEG_FILE,
+                                                access='sequential')
+
+            assert (image - image2).abs().max() == 0
+
+        with pytest.raises(pyvips.Error):
+            pyvips.Source.new_from_archive_member(zip_filename, 'banana')
+
+        with pytest.raises(pyvips.Error):
+            pyvips.Source.new_from_archive_member(JPEG_FILE, 'banana')
+
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_tee(self):
+        filename = temp_filename(self.tempdir, '.png')
+        stream = io.BytesIO()
+        chunks = []
+
+        target = pyvips.Target.tee(pyvips.Target.new_to_file(filename),
+                                   stream,
+                                   lambda chunk: chunks.append(bytes(chunk)),
+                                   hashers=['sha256', hashlib.md5()])
+        image = pyvips.Image.new_from_file(JPEG_FILE, access='sequential')
+        image.write_to_target(target, '.png')
+
+        image = pyvips.Image.new_from_file(JPEG_FILE, access='sequential')
+        data = image.write_to_buffer('.png')
+
+        with open(filename, 'rb') as f:
+            assert f.read() == data
+        assert stream.getvalue() == data
+        assert b''.join(chunks) == data
+        assert target.digests == {
+            'sha256': hashlib.sha256(data).hexdigest(),
+            'md5': hashlib.md5(data).hexdigest(),
+        }
+
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_tee_partial(self):
+        class Trickle(object):
+            # a sink like a raw file, which only takes a little at a time
+            def __init__(self, limit):
+                self.limit = limit
+                self.chunks = []
+
+            def write(self, chunk):
+                n = min(len(chunk), self.limit)
+                self.chunks.append(bytes(chunk[:n]))
+                return n
+
+        image = pyvips.Image.new_from_file(JPEG_FILE)
+        data = image.write_to_buffer('.png')
+
+        sink = Trickle(100)
+        image.write_to_target(pyvips.Target.tee(sink), '.png')
+        assert b''.join(sink.chunks) == data
+
+        # a sink which makes no progress is an error
+        with pytest.raises(pyvips.Error):
+            image.write_to_target(pyvips.Target.tee(Trickle(0)), '.png')
+
     # test webp as well, since that maps the stream rather than using read
 
     @skip_if_no('webpload')
@@ -0,0 +1,120 @@
+# vim: set fileencoding=utf-8 :
+
+import gc
+
+import pyvips
+from helpers import JPEG_FILE, skip_if_no
+
+
+class TestEstimate:
+    @classmethod
+    def setup_class(cls):
+        pyvips.estimate_set_trace(True)
+
+    @classmethod
+    def teardown_class(cls):
+        pyvips.estimate_set_trace(False)
+
+    def test_estimate_pipeline(self):
+        image = pyvips.Image.black(1000, 1000, bands=3)
+        image = (image + 1).cast('uchar').flip('horizontal')
+
+        estimate = image.estimate(threads=4)
+        assert estimate.operations == 4
+        assert estimate.input_bytes == 0
+        assert estimate.access == 'sequential'
+        assert estimate.memory['copies'] == 0
+        assert estimate.memory['output'] == 2 * 4 * 16 * 1000 * 3
+        assert estimate.peak_memory == sum(estimate.memory.values())
+
+        # more threads need more buffers
+        assert image.estimate(threads=8).peak_memory > estimate.peak_memory
+
+    def test_estimate_copies(self):
+        image = pyvips.Image.black(1000, 1000)
+        small = image.estimate(threads=1)
+
+        copied = (image + 1).cast('uchar').copy_memory().invert()
+        estimate = copied.estimate(threads=1)
+        assert estimate.memory['copies'] == 1000 * 1000
+
+        drawn = image.draw_rect(255, 10, 10, 100, 100)
+        estimate = drawn.estimate(threads=1)
+        assert estimate.memory['copies'] == 1000 * 1000
+        assert estimate.peak_memory > small.peak_memory
+
+    def test_estimate_caches(self):
+        image = pyvips.Image.black(1000, 1000)
+        cached = image.tilecache(tile_width=100, tile_height=100, max_tiles=10)
+        estimate = cached.estimate(threads=1)
+        assert estimate.memory['caches'] == 10 * 100 * 100
+
+    def test_estimate_shared(self):
+        # a branch used twice is only counted once
+        image = pyvips.Image.black(100, 100).copy_memory()
+        joined = image.bandjoin([image, image])
+        estimate = joined.estimate(threads=1)
+        assert estimate.memory['copies'] == 100 * 100
+
+    @skip_if_no('jpegload')
+    def test_estimate_load(self):
+        image = pyvips.Image.new_from_file(JPEG_FILE)
+        size = image.width * image.height * image.bands
+
+        estimate = image.resize(0.5).estimate()
+        assert estimate.input_bytes == size
+        assert estimate.access == 'random'
+        assert estimate.memory['copies'] == size
+
+        image = pyvips.Image.new_from_file(JPEG_FILE, access='sequential')
+        estimate = image.resize(0.5).estimate()
+        assert estimate.input_bytes == size
+        assert estimate.access == 'sequential'
+        assert estimate.memory['copies'] == 0
+
+        image = pyvips.Image.new_from_file(JPEG_FILE + '[access=sequential]')
+        assert image.estimate().access == 'sequential'
+
+    def test_estimate_no_leak(self):
+        # the operation cache would keep intermediates alive anyway
+        max_operations = pyvips.cache_get_max()
+        pyvips.cache_set_max(0)
+        try:
+            gc.collect()
+            start = pyvips.tracked_get_mem()
+            size = 1000 * 1000
+
+            # each draw makes a new copy in memory, and only the last one
+            # should be kept
+            image = pyvips.Image.black(1000, 1000)
+            for i in range(10):
+                image = image.draw_rect(255, i, i, 10, 10)
+            gc.collect()
+            assert pyvips.tracked_get_mem() - start < 2 * size
+            assert image.estimate(threads=1).memory['copies'] == size
+
+            image = pyvips.Image.black(1000, 1000).copy_memory()
+            for i in range(10):
+                image = (image + 1).cast('uchar').copy_memory()
+            gc.collect()
+            assert pyvips.tracked_get_mem() - start < 2 * size
+            assert image.avg() == 10
+        finally:
+            pyvips.cache_set_max(max_operations)
+
+    def test_estimate_trace(self):
+        pyvips.estimate_set_trace(False)
+        try:
+            # nothing is recorded without tracing
+            image = (pyvips.Image.black(100, 100) + 1).copy_memory()
+            assert image._operation is None
+            assert image.invert()._operation is None
+            assert image.invert().estimate().operations == 0
+
+            # tracing can be turned on for just a block
+            with pyvips.estimate_trace():
+                image = pyvips.Image.black(100, 100) + 1
+            assert image.estimate().operations == 2
+            assert image.invert()._operation is None
+        finally:
+            pyvips.estimate_set_trace(True)
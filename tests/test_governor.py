@@ -0,0 +1,102 @@
+# vim: set fileencoding=utf-8 :
+
+import threading
+
+import pytest
+import pyvips
+
+
+class TestGovernor:
+    def test_tracked(self):
+        image = pyvips.Image.black(1000, 1000).copy_memory()
+
+        assert pyvips.tracked_get_mem() >= 1000 * 1000
+        assert pyvips.tracked_get_mem_highwater() >= \
+            pyvips.tracked_get_mem()
+        assert pyvips.tracked_get_allocs() > 0
+        assert pyvips.tracked_get_files() >= 0
+
+        del image
+
+    def test_estimate(self):
+        image = pyvips.Image.black(100, 50, bands=3)
+        assert pyvips.MemoryGovernor.estimate(image) == 100 * 50 * 3
+        assert pyvips.MemoryGovernor.estimate(image.cast('double')) == \
+            100 * 50 * 3 * 8
+        assert pyvips.MemoryGovernor.estimate(image.cast('complex')) == \
+            100 * 50 * 3 * 8
+
+    def test_admit(self):
+        budget = pyvips.tracked_get_mem() + 10000
+        governor = pyvips.MemoryGovernor(budget, block=False)
+        image = pyvips.Image.black(50, 50)
+
+        with governor.admit(image):
+            assert governor.reserved == 2500
+            with governor.admit(cost=2500):
+                assert governor.reserved == 5000
+                with pytest.raises(pyvips.Error):
+                    with governor.admit(cost=6000):
+                        pass
+            assert image.avg() == 0
+
+        assert governor.reserved == 0
+
+        # can never fit
+        with pytest.raises(pyvips.Error):
+            with governor.admit(cost=budget + 1, block=True):
+                pass
+
+        with pytest.raises(pyvips.Error):
+            with governor.admit():
+                pass
+
+    def test_admit_block(self):
+        budget = pyvips.tracked_get_mem() + 10000
+        governor = pyvips.MemoryGovernor(budget, poll=0.01)
+        admitted = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            with governor.admit(cost=8000):
+                admitted.set()
+                release.wait()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        admitted.wait()
+
+        with pytest.raises(pyvips.Error):
+            with governor.admit(cost=8000, timeout=0.05):
+                pass
+
+        threading.Timer(0.05, release.set).start()
+        with governor.admit(cost=8000):
+            assert governor.reserved == 8000
+
+        thread.join()
+        assert governor.reserved == 0
+
+    def test_admit_no_double_count(self):
+        max_operations = pyvips.cache_get_max()
+        pyvips.cache_set_max(0)
+        budget = pyvips.tracked_get_mem() + 1500000
+        governor = pyvips.MemoryGovernor(budget, block=False)
+
+        with governor.admit(cost=1200000):
+            # the admitted render allocates most of its reservation, and
+            # that must not be counted again
+            image = pyvips.Image.black(1000, 1000).copy_memory()
+            with governor.admit(cost=200000):
+                pass
+
+            # but memory beyond the reservation is still counted
+            image2 = pyvips.Image.black(1000, 1000).copy_memory()
+            with pytest.raises(pyvips.Error):
+                with governor.admit(cost=200000):
+                    pass
+
+            del image, image2
+
+        assert governor.reserved == 0
+        pyvips.cache_set_max(max_operations)
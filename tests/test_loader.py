@@ -0,0 +1,111 @@
+# vim: set fileencoding=utf-8 :
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+import pyvips
+from helpers import JPEG_FILE, WEBP_FILE, skip_if_no
+
+
+class TestLoader:
+    @classmethod
+    def setup_class(cls):
+        cls.tempdir = tempfile.mkdtemp()
+
+    @classmethod
+    def teardown_class(cls):
+        shutil.rmtree(cls.tempdir, ignore_errors=True)
+
+    def setup_method(self):
+        pyvips.loader_cache_clear()
+
+    def teardown_method(self):
+        pyvips.loader_cache_set(False)
+        pyvips.loader_cache_clear()
+
+    @skip_if_no('jpegload')
+    def test_loader_option(self):
+        image = pyvips.Image.new_from_file(JPEG_FILE, loader='jpegload')
+        assert image.width == 1024
+        image = pyvips.Image.new_from_file(JPEG_FILE + '[shrink=2]',
+                                           loader='jpegload')
+        assert image.width == 512
+
+        with open(JPEG_FILE, 'rb') as f:
+            data = f.read()
+        image = pyvips.Image.new_from_buffer(data, '', loader='jpegload')
+        assert image.width == 1024
+        image = pyvips.Image.new_from_buffer(data, '',
+                                             loader='jpegload_buffer')
+        assert image.width == 1024
+
+        # the wrong loader fails
+        with pytest.raises(pyvips.Error):
+            pyvips.Image.new_from_buffer(data, '',
+                                         loader='pngload').avg()
+
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_loader_option_source(self):
+        source = pyvips.Source.new_from_file(JPEG_FILE)
+        image = pyvips.Image.new_from_source(source, '', loader='jpegload')
+        assert image.width == 1024
+
+    @skip_if_no('jpegload')
+    def test_loader_cache(self):
+        assert not pyvips.loader_cache_get()
+        pyvips.loader_cache_set(True)
+        assert pyvips.loader_cache_get()
+
+        filenames = []
+        for i in range(3):
+            filename = os.path.join(self.tempdir, f'{i}.jpg')
+            shutil.copyfile(JPEG_FILE, filename)
+            filenames.append(filename)
+
+        for filename in filenames:
+            image = pyvips.Image.new_from_file(filename)
+            assert image.width == 1024
+
+        with open(JPEG_FILE, 'rb') as f:
+            data = f.read()
+        for _ in range(2):
+            image = pyvips.Image.new_from_buffer(data, '')
+            assert image.width == 1024
+
+        stats = pyvips.loader_cache_get_stats()
+        assert stats['misses'] == 2
+        assert stats['hits'] == 3
+        assert stats['size'] == 2
+
+        pyvips.loader_cache_clear()
+        assert pyvips.loader_cache_get_stats()['size'] == 0
+
+    @skip_if_no('jpegload')
+    @skip_if_no('webpload')
+    def test_loader_cache_fallback(self):
+        pyvips.loader_cache_set(True)
+
+        # a webp file with a jpg suffix, after a jpeg with the same suffix
+        # and magic ... since the magic differs, this should be a miss
+        filename = os.path.join(self.tempdir, 'webp.jpg')
+        shutil.copyfile(WEBP_FILE, filename)
+        pyvips.Image.new_from_file(JPEG_FILE)
+        image = pyvips.Image.new_from_file(filename)
+        assert image.get('vips-loader').startswith('webp')
+        assert pyvips.loader_cache_get_stats()['hits'] == 0
+
+        # make a wrong guess on purpose
+        key = ('.jpg', b'RIFF')
+        assert key in pyvips.vloader._file_loaders
+        pyvips.vloader._file_loaders[key] = 'VipsForeignLoadPngFile'
+        image = pyvips.Image.new_from_file(filename)
+        assert image.get('vips-loader').startswith('webp')
+
+        stats = pyvips.loader_cache_get_stats()
+        assert stats['hits'] == 1
+        assert stats['fallbacks'] == 1
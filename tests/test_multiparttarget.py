@@ -0,0 +1,104 @@
+# vim: set fileencoding=utf-8 :
+
+import gc
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+import pyvips
+from helpers import JPEG_FILE, skip_if_no
+
+
+def pool_threads():
+    return [thread for thread in threading.enumerate()
+            if thread.name.startswith('pyvips-multipart')]
+
+
+def wait_for_pool():
+    for i in range(100):
+        if len(pool_threads()) == 0:
+            break
+        time.sleep(0.05)
+
+    return len(pool_threads())
+
+
+def directory_uploader(directory):
+    # write each part to a file, then join them on complete
+    def upload_part(number, data):
+        filename = os.path.join(directory, f'part-{number:05d}')
+        with open(filename, 'wb') as f:
+            f.write(data)
+        return filename
+
+    def complete(parts):
+        with open(os.path.join(directory, 'complete'), 'wb') as f:
+            for filename in parts:
+                with open(filename, 'rb') as part:
+                    f.write(part.read())
+
+    return upload_part, complete
+
+
+class TestMultipartTarget:
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_multipart_target(self):
+        directory = tempfile.mkdtemp()
+        upload_part, complete = directory_uploader(directory)
+
+        target = pyvips.MultipartTarget(upload_part, complete,
+                                        part_size=10000, max_workers=3)
+        image = pyvips.Image.new_from_file(JPEG_FILE, access='sequential')
+        image.write_to_target(target, '.png')
+
+        image = pyvips.Image.new_from_file(JPEG_FILE, access='sequential')
+        data = image.write_to_buffer('.png')
+
+        assert len(target.parts) == (len(data) + 9999) // 10000
+        assert all(os.path.getsize(filename) == 10000
+                   for filename in target.parts[:-1])
+        with open(os.path.join(directory, 'complete'), 'rb') as f:
+            assert f.read() == data
+
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_multipart_target_error(self):
+        def upload_part(number, data):
+            if number == 3:
+                raise IOError('upload failed')
+
+        target = pyvips.MultipartTarget(upload_part, part_size=10000)
+        image = pyvips.Image.new_from_file(JPEG_FILE, access='sequential')
+
+        with pytest.raises(pyvips.Error):
+            image.write_to_target(target, '.png')
+
+        assert isinstance(target.error, IOError)
+        assert wait_for_pool() == 0
+
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_multipart_target_dropped(self):
+        # a truncated jpeg fails part way through the save, after some parts
+        # have been uploaded, and the end handler never runs
+        with open(JPEG_FILE, 'rb') as f:
+            data = f.read()
+        image = pyvips.Image.new_from_buffer(data[:len(data) // 2], '',
+                                             access='sequential', fail=True)
+
+        target = pyvips.MultipartTarget(lambda number, data: None,
+                                        part_size=100)
+        with pytest.raises(pyvips.Error):
+            image.write_to_target(target, '.png')
+        assert target.parts is None
+        assert len(pool_threads()) > 0
+
+        del target
+        gc.collect()
+        assert wait_for_pool() == 0
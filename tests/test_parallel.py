@@ -0,0 +1,71 @@
+# vim: set fileencoding=utf-8 :
+
+import threading
+
+import pytest
+import pyvips
+
+
+def average(value):
+    return (pyvips.Image.black(50, 50) + value).avg()
+
+
+class TestParallel:
+    def test_parallel_map(self):
+        old = pyvips.concurrency_get()
+
+        jobs = pyvips.parallel.map(average, range(20), workers=4,
+                                   threads_per_worker=1)
+        assert list(jobs) == list(range(20))
+
+        assert len(jobs.timings) == 20
+        assert all(seconds >= 0 for seconds in jobs.timings)
+        assert jobs.seconds > 0
+        assert jobs.jobs_per_second > 0
+        assert pyvips.concurrency_get() == old
+
+    def test_parallel_concurrency(self):
+        seen = []
+
+        def job(value):
+            seen.append((threading.current_thread().name,
+                         pyvips.concurrency_get()))
+            return average(value)
+
+        jobs = pyvips.parallel.map(job, iter([1, 2, 3]), workers=2,
+                                   threads_per_worker=1)
+        assert list(jobs) == [1, 2, 3]
+        assert all(concurrency == 1 for _, concurrency in seen)
+        assert all(name.startswith('pyvips-parallel') for name, _ in seen)
+
+    def test_parallel_error(self):
+        old = pyvips.concurrency_get()
+
+        def job(value):
+            if value == 3:
+                return pyvips.Image.new_from_file('banana.jpg')
+            return average(value)
+
+        jobs = pyvips.parallel.map(job, range(10), workers=2)
+        results = []
+        with pytest.raises(pyvips.Error):
+            for result in jobs:
+                results.append(result)
+
+        assert results == [0, 1, 2]
+        assert pyvips.concurrency_get() == old
+
+    def test_parallel_close(self):
+        old = pyvips.concurrency_get()
+
+        jobs = pyvips.parallel.map(average, range(100), workers=2,
+                                   threads_per_worker=1)
+        assert next(jobs) == 0
+        jobs.close()
+
+        assert len(jobs.timings) == 1
+        assert pyvips.concurrency_get() == old
+
+    def test_parallel_bad_workers(self):
+        with pytest.raises(pyvips.Error):
+            pyvips.parallel.map(average, [1], workers=0)
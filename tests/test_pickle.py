@@ -0,0 +1,97 @@
+# vim: set fileencoding=utf-8 :
+
+import concurrent.futures
+import gc
+import multiprocessing
+import pickle
+import sys
+
+import pytest
+import pyvips
+from helpers import JPEG_FILE, skip_if_no
+
+
+def invert(image):
+    return image.avg(), image.invert()
+
+
+def make(value):
+    # the worker frees this as soon as it is pickled
+    return (pyvips.Image.black(256, 256) + value).cast('uchar')
+
+
+class TestPickle:
+    @skip_if_no('jpegload')
+    def test_pickle_file(self):
+        im = pyvips.Image.new_from_file(JPEG_FILE, access='sequential')
+
+        # just the filename and options
+        data = pickle.dumps(im)
+        assert len(data) < 1000
+
+        im2 = pickle.loads(data)
+        assert im2.width == im.width
+        assert im2.avg() == im.avg()
+
+        # derived images and modified images are rendered
+        im = pyvips.Image.new_from_file(JPEG_FILE)
+        im = im.copy()
+        im.set_type(pyvips.GValue.gstr_type, 'banana', 'yellow')
+        assert im._recipe is None
+
+    @pytest.mark.skipif(sys.version_info < (3, 8),
+                        reason="requires Python 3.8")
+    def test_pickle_shared(self):
+        im = (pyvips.Image.black(100, 50, bands=3) + [1, 2, 3]).cast('ushort')
+        im = im.copy(interpretation='rgb16', xres=3)
+        im.set_type(pyvips.GValue.gstr_type, 'banana', 'yellow')
+
+        im2 = pickle.loads(pickle.dumps(im))
+        assert im2.width == 100
+        assert im2.height == 50
+        assert im2.format == 'ushort'
+        assert im2.interpretation == 'rgb16'
+        assert im2.xres == 3
+        assert im2.get('banana') == 'yellow'
+        assert (im2 == im).min() == 255
+
+    @pytest.mark.skipif(sys.version_info < (3, 8),
+                        reason="requires Python 3.8")
+    def test_pickle_shared_owner(self):
+        # the sender can go before the pickle is loaded
+        data = pickle.dumps((pyvips.Image.black(100, 50) + 7).cast('uchar'))
+        gc.collect()
+        im = pickle.loads(data)
+        assert im.avg() == 7
+
+        # the receiver owns the block, so each pickle loads once
+        with pytest.raises(FileNotFoundError):
+            pickle.loads(data)
+        assert im.avg() == 7
+
+        # and each pickle has a block of its own
+        im = (pyvips.Image.black(100, 50) + 7).cast('uchar')
+        assert im.__reduce__()[1][0] != im.__reduce__()[1][0]
+
+    @pytest.mark.skipif(sys.version_info < (3, 8),
+                        reason="requires Python 3.8")
+    def test_pickle_process(self):
+        im = (pyvips.Image.black(64, 64) + 10).cast('uchar')
+
+        context = multiprocessing.get_context('spawn')
+        with concurrent.futures.ProcessPoolExecutor(
+                1, mp_context=context) as executor:
+            avg, inverted = executor.submit(invert, im).result()
+
+        assert avg == 10
+        assert inverted.avg() == 245
+
+    @pytest.mark.skipif(sys.version_info < (3, 8),
+                        reason="requires Python 3.8")
+    def test_pickle_process_result(self):
+        context = multiprocessing.get_context('spawn')
+        with concurrent.futures.ProcessPoolExecutor(
+                2, mp_context=context) as executor:
+            images = list(executor.map(make, range(20)))
+
+        assert [image.avg() for image in images] == list(range(20))
@@ -0,0 +1,105 @@
+# vim: set fileencoding=utf-8 :
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+import pyvips
+from helpers import JPEG_FILE
+
+
+class TestPool:
+    @classmethod
+    def setup_class(cls):
+        cls.tempdir = tempfile.mkdtemp()
+
+    @classmethod
+    def teardown_class(cls):
+        shutil.rmtree(cls.tempdir, ignore_errors=True)
+
+    def test_pool_get(self):
+        pool = pyvips.ImagePool()
+
+        a = pool.get(JPEG_FILE)
+        b = pool.get(JPEG_FILE)
+        assert a is b
+        assert pool.hits == 1
+        assert pool.misses == 1
+
+        # options are part of the key
+        c = pool.get(JPEG_FILE, shrink=2)
+        d = pool.get(JPEG_FILE + '[shrink=2]')
+        assert c is not a
+        assert c.width == a.width // 2
+        assert d is not c
+        assert len(pool) == 3
+
+        pool.invalidate(JPEG_FILE)
+        assert len(pool) == 0
+        assert pool.get(JPEG_FILE) is not a
+
+        with pytest.raises(pyvips.Error):
+            pool.get(os.path.join(self.tempdir, 'missing.jpg'))
+
+    def test_pool_changed(self):
+        filename = os.path.join(self.tempdir, 'changed.jpg')
+        shutil.copyfile(JPEG_FILE, filename)
+
+        pool = pyvips.ImagePool()
+        a = pool.get(filename)
+
+        # replace the file with a smaller image
+        pyvips.Image.black(12, 34).write_to_file(filename)
+        stat = os.stat(filename)
+        os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        b = pool.get(filename)
+        assert b is not a
+        assert (b.width, b.height) == (12, 34)
+        assert pool.invalidations == 1
+        assert len(pool) == 1
+
+    def test_pool_limits(self):
+        pool = pyvips.ImagePool(max_images=2)
+        pool.get(JPEG_FILE)
+        pool.get(JPEG_FILE, shrink=2)
+        pool.get(JPEG_FILE, shrink=4)
+        assert len(pool) == 2
+        pool.get(JPEG_FILE)
+        assert pool.misses == 4
+
+        # random access jpeg is decoded to memory, vips files are not
+        filename = os.path.join(self.tempdir, 'limits.v')
+        pyvips.Image.new_from_file(JPEG_FILE).write_to_file(filename)
+        pool = pyvips.ImagePool(max_memory=1)
+        pool.get(JPEG_FILE)
+        assert len(pool) == 0
+        pool.get(filename)
+        assert len(pool) == 1
+        assert pool.memory == 0
+
+        pool = pyvips.ImagePool(max_files=1)
+        pool.get(JPEG_FILE)
+        pool.get(JPEG_FILE, shrink=2)
+        assert len(pool) == 1
+
+        pool.clear()
+        assert len(pool) == 0
+
+    def test_pool_sequential(self):
+        pool = pyvips.ImagePool()
+
+        # sequential images can only be rendered once, so can't be shared
+        with pytest.raises(pyvips.Error):
+            pool.get(JPEG_FILE, access='sequential')
+        with pytest.raises(pyvips.Error):
+            pool.get(JPEG_FILE, access=pyvips.enums.Access.SEQUENTIAL)
+        with pytest.raises(pyvips.Error):
+            pool.get(JPEG_FILE + '[access=sequential]')
+        assert len(pool) == 0
+
+        # random access images can be rendered many times
+        image = pool.get(JPEG_FILE)
+        assert pool.get(JPEG_FILE).avg() == image.avg()
@@ -0,0 +1,107 @@
+# vim: set fileencoding=utf-8 :
+
+import gc
+import os
+import threading
+import time
+
+import pytest
+import pyvips
+from helpers import JPEG_FILE, skip_if_no
+
+
+def pool_threads():
+    return [thread for thread in threading.enumerate()
+            if thread.name.startswith('pyvips-rangesource')]
+
+
+def file_fetcher(filename):
+    calls = []
+
+    def fetch(offset, length):
+        calls.append((offset, length))
+        with open(filename, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    return fetch, calls
+
+
+class TestRangeSource:
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_range_source(self):
+        size = os.path.getsize(JPEG_FILE)
+        fetch, calls = file_fetcher(JPEG_FILE)
+
+        source = pyvips.RangeSource(fetch, size, block_size=4096)
+        image = pyvips.Image.new_from_source(source, '', access='sequential')
+        image2 = pyvips.Image.new_from_file(JPEG_FILE, access='sequential')
+
+        assert (image - image2).abs().max() == 0
+        source.close()
+
+        # the whole file fits in the cache, so nothing is fetched twice
+        assert source.bytes_fetched == size
+        assert source.bytes_consumed >= size
+        assert source.fetches == len(calls)
+        # readahead means we need far fewer than one fetch per block
+        assert len(calls) < size // 4096
+
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_range_source_no_readahead(self):
+        size = os.path.getsize(JPEG_FILE)
+        fetch, calls = file_fetcher(JPEG_FILE)
+
+        source = pyvips.RangeSource(fetch, size, block_size=1000,
+                                    readahead=0)
+        image = pyvips.Image.new_from_source(source, '')
+        assert image.width == 1024
+
+        # the header should only need the first few blocks
+        assert source.bytes_fetched < size
+        assert all(offset % 1000 == 0 for offset, length in calls)
+
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_range_source_error(self):
+        def fetch(offset, length):
+            raise IOError('no network')
+
+        source = pyvips.RangeSource(fetch, 10000)
+        with pytest.raises(pyvips.Error):
+            pyvips.Image.new_from_source(source, '')
+
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_range_source_dropped(self):
+        size = os.path.getsize(JPEG_FILE)
+        fetch, calls = file_fetcher(JPEG_FILE)
+
+        # read sequentially so the prefetch pool starts some threads, then
+        # drop the source without closing it
+        source = pyvips.RangeSource(fetch, size, block_size=4096)
+        image = pyvips.Image.new_from_source(source, '', access='sequential')
+        assert image.avg() > 0
+        assert len(pool_threads()) > 0
+        del source, image
+
+        # the failed load leaves the source unclosed as well
+        def fail(offset, length):
+            raise IOError('no network')
+
+        source = pyvips.RangeSource(fail, 10000)
+        with pytest.raises(pyvips.Error):
+            pyvips.Image.new_from_source(source, '')
+        del source
+
+        gc.collect()
+        for i in range(100):
+            if len(pool_threads()) == 0:
+                break
+            time.sleep(0.05)
+        assert len(pool_threads()) == 0
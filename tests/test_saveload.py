@@ -1,8 +1,11 @@
 # vim: set fileencoding=utf-8 :
 
+import asyncio
 import os
 import tempfile
+import threading
 
+import pytest
 import pyvips
 from pathlib import Path
 from helpers import temp_filename, skip_if_no, IMAGES, JPEG_FILE
@@ -73,3 +76,144 @@ class TestSaveLoad:
         assert x.width == 10
         assert x.height == 20
         assert x.bands == 1
+
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_iter_encode(self):
+        im = pyvips.Image.new_from_file(JPEG_FILE)
+        buf = im.write_to_buffer('.png', compression=1)
+
+        chunks = list(im.iter_encode('.png', chunk_size=10000,
+                                     compression=1))
+        assert len(chunks) > 1
+        assert all(len(chunk) <= 10000 for chunk in chunks)
+        assert b''.join(chunks) == buf
+
+        async def collect():
+            return [chunk async for chunk in
+                    im.iter_encode('.png', chunk_size=10000, compression=1)]
+
+        assert b''.join(asyncio.run(collect())) == buf
+
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_iter_encode_close(self):
+        im = pyvips.Image.new_from_file(JPEG_FILE)
+
+        # a tiny queue, so the encoder has to wait for us
+        chunks = im.iter_encode('.png', chunk_size=100, queue_size=1)
+        assert len(next(chunks)) <= 100
+        chunks.close()
+        assert list(chunks) == []
+
+        with pytest.raises(pyvips.Error):
+            im.iter_encode('.banana')
+
+    @skip_if_no('webpsave')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_iter_encode_cancel(self):
+        # webp only writes once the whole image is compressed, so we'll
+        # time out waiting for the first chunk
+        im = pyvips.Image.gaussnoise(2000, 2000)
+
+        async def cancel():
+            chunks = im.iter_encode('.webp', lossless=True)
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(chunks.__anext__(), 0.01)
+            chunks.close()
+            return [chunk async for chunk in chunks]
+
+        # asyncio.run() waits for the executor thread, so it would hang if
+        # that thread was still blocked
+        result = []
+        thread = threading.Thread(
+            target=lambda: result.append(asyncio.run(cancel())),
+            daemon=True)
+        thread.start()
+        thread.join(10)
+        assert not thread.is_alive()
+        assert result == [[]]
+
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_write_many(self):
+        im = pyvips.Image.new_from_file(JPEG_FILE).resize(0.5).sharpen()
+        jpeg = im.write_to_buffer('.jpg', Q=50)
+        png = im.write_to_buffer('.png', compression=1)
+        tiff = im.write_to_buffer('.tif')
+
+        target = pyvips.Target.new_to_memory()
+        results = im.write_many([('.jpg', {'Q': 50}),
+                                 ('.png[compression=1]',),
+                                 (target, '.tif')],
+                                tile_height=16, max_tiles=4)
+        assert results == [jpeg, png, None]
+        assert target.get('blob') == tiff
+
+        # sequential images are read once, in order
+        im = pyvips.Image.new_from_file(JPEG_FILE, access='sequential')
+        jpeg, png = im.write_many(['.jpg', '.png'])
+        assert pyvips.Image.new_from_buffer(jpeg, '').width == im.width
+        assert pyvips.Image.new_from_buffer(png, '').avg() == \
+            pytest.approx(pyvips.Image.new_from_file(JPEG_FILE).avg())
+
+        im = pyvips.Image.new_from_file(JPEG_FILE)
+        with pytest.raises(pyvips.Error):
+            im.write_many(['.jpg', '.banana'])
+
+    @skip_if_no('jpegload')
+    def test_thumbnail_set(self):
+        widths = [200, 800, 512, 100, 640]
+
+        variants = pyvips.Image.thumbnail_set(JPEG_FILE, widths)
+        assert [variant.width for variant in variants] == widths
+
+        # each variant should be very close to an independent thumbnail
+        for variant in variants:
+            im = pyvips.Image.thumbnail(JPEG_FILE, variant.width,
+                                        height=10000000)
+            assert abs(variant.height - im.height) <= 1
+            height = min(variant.height, im.height)
+            diff = (variant.crop(0, 0, variant.width, height) -
+                    im.crop(0, 0, im.width, height)).abs()
+            assert diff.avg() < 1.5
+
+        with open(JPEG_FILE, 'rb') as f:
+            data = f.read()
+        variants = pyvips.Image.thumbnail_set(data, [300, 100])
+        assert [variant.width for variant in variants] == [300, 100]
+
+        with pytest.raises(pyvips.Error):
+            pyvips.Image.thumbnail_set(JPEG_FILE, [100], crop='centre')
+
+        # force needs a height, so it's rejected before anything is made
+        with pytest.raises(pyvips.Error):
+            pyvips.Image.thumbnail_set(JPEG_FILE, [100], size='force')
+        with pytest.raises(pyvips.Error):
+            pyvips.Image.thumbnail_set(JPEG_FILE, [100],
+                                       size=pyvips.enums.Size.FORCE)
+
+        # down and up still fit the width
+        variants = pyvips.Image.thumbnail_set(JPEG_FILE, [300, 2000],
+                                              size='down')
+        assert [variant.width for variant in variants] == [300, 1024]
+
+    @skip_if_no('jpegload')
+    @pytest.mark.skipif(not pyvips.at_least_libvips(8, 9),
+                        reason="requires libvips >= 8.9")
+    def test_thumbnail_set_targets(self):
+        source = pyvips.Source.new_from_file(JPEG_FILE)
+        targets = [pyvips.Target.new_to_memory(), None]
+
+        variants = pyvips.Image.thumbnail_set(source, [400, 200],
+                                              targets=targets,
+                                              format_string='.png')
+        assert variants[0] is None
+        assert variants[1].width == 200
+
+        im = pyvips.Image.new_from_buffer(targets[0].get('blob'), '')
+        assert im.width == 400
@@ -0,0 +1,171 @@
+# vim: set fileencoding=utf-8 :
+
+import threading
+
+import pytest
+import pyvips
+
+
+def slow_image():
+    # big enough that a render takes a while and can be killed part way
+    return pyvips.Image.black(2000, 20000, bands=3).gaussblur(3)
+
+
+class TestScheduler:
+    def test_scheduler_submit(self):
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def job(image):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            avg = image.avg()
+            with lock:
+                running[0] -= 1
+            return avg
+
+        with pyvips.Scheduler(threads=2) as scheduler:
+            futures = [scheduler.submit(job, pyvips.Image.black(100, 100) + i,
+                                        tenant=f'tenant{i % 3}')
+                       for i in range(10)]
+            assert [future.result() for future in futures] == list(range(10))
+
+        assert running[1] <= 2
+
+        with pytest.raises(pyvips.Error):
+            scheduler.submit(job, pyvips.Image.black(1, 1))
+
+    def test_scheduler_priority(self):
+        release = threading.Event()
+        order = []
+
+        def blocker(image):
+            release.wait()
+
+        def job(name):
+            return lambda image: order.append(name)
+
+        with pyvips.Scheduler(threads=1) as scheduler:
+            scheduler.submit(blocker)
+            scheduler.submit(job('low'), priority=0)
+            scheduler.submit(job('high'), priority=5)
+            assert scheduler.queued == 2
+            release.set()
+
+        assert order == ['high', 'low']
+
+    def test_scheduler_fairness(self):
+        release = threading.Event()
+        order = []
+
+        def blocker(image):
+            release.wait()
+
+        def job(name):
+            return lambda image: order.append(name)
+
+        with pyvips.Scheduler(threads=1) as scheduler:
+            scheduler.submit(blocker, tenant='other')
+            for i in range(4):
+                scheduler.submit(job('bulk'), tenant='bulk')
+            scheduler.submit(job('small'), tenant='small')
+            release.set()
+
+        # the small tenant doesn't wait for the whole bulk backlog
+        assert order.index('small') <= 1
+
+    def test_scheduler_memory(self):
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def job(image):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            image.avg()
+            with lock:
+                running[0] -= 1
+
+        # always over the limit, so jobs run one at a time
+        with pyvips.Scheduler(threads=4, max_memory=0) as scheduler:
+            for i in range(6):
+                scheduler.submit(job, pyvips.Image.black(200, 200) + i)
+
+        assert running[1] == 1
+
+    def test_scheduler_preempt(self):
+        started = threading.Event()
+        order = []
+
+        def bulk(image):
+            started.set()
+            avg = image.avg()
+            order.append('bulk')
+            return avg
+
+        def interactive(image):
+            order.append('interactive')
+            return image.avg()
+
+        with pyvips.Scheduler(threads=1) as scheduler:
+            bulk_future = scheduler.submit(bulk, slow_image(), tenant='batch')
+            started.wait()
+            future = scheduler.submit(interactive,
+                                      pyvips.Image.black(10, 10) + 1,
+                                      tenant='alice',
+                                      priority=pyvips.Scheduler.INTERACTIVE)
+
+            assert future.result() == 1
+            # the bulk job is run again, and completes
+            assert bulk_future.result() == 0
+
+        assert scheduler.preemptions == 1
+        assert order == ['interactive', 'bulk']
+
+    def test_scheduler_concurrency(self):
+        lock = threading.Lock()
+        release = threading.Event()
+        seen = []
+
+        def job(image):
+            with lock:
+                seen.append((scheduler.running, pyvips.concurrency_get()))
+            release.wait()
+
+        with pyvips.Scheduler(threads=8) as scheduler:
+            scheduler.submit(job, threads=2)
+            scheduler.submit(job, threads=2)
+            # concurrency is process-wide, so this must wait for the others
+            scheduler.submit(job, threads=4)
+            try:
+                assert scheduler.running == 2
+                assert scheduler.queued == 1
+            finally:
+                release.set()
+
+        assert sorted(concurrency for running, concurrency in seen) == \
+            [2, 2, 4]
+        assert seen[-1][0] == 1
+
+    def test_scheduler_preempt_concurrency(self):
+        started = threading.Event()
+
+        def bulk(image):
+            started.set()
+            return image.avg()
+
+        def interactive(image):
+            return (scheduler.running, pyvips.concurrency_get())
+
+        # plenty of threads, but the bulk job uses another thread count
+        with pyvips.Scheduler(threads=8) as scheduler:
+            bulk_future = scheduler.submit(bulk, slow_image(), threads=2)
+            started.wait()
+            future = scheduler.submit(interactive, threads=1,
+                                      priority=pyvips.Scheduler.INTERACTIVE)
+
+            assert future.result() == (1, 1)
+            assert bulk_future.result() == 0
+
+        assert scheduler.preemptions == 1
@@ -0,0 +1,125 @@
+# vim: set fileencoding=utf-8 :
+
+import random
+import threading
+
+import pytest
+import pyvips
+
+N_THREADS = 8
+
+OPERATIONS = ['invert', 'flip', 'rot', 'embed', 'extract_area', 'linear',
+              'gamma', 'avg', 'max', 'min', 'hist_find', 'zoom', 'subsample']
+
+
+def run_pipeline(operations):
+    image = pyvips.Image.black(64, 32, bands=3) + 10
+
+    for name in operations:
+        if name == 'flip':
+            image = image.flip('horizontal')
+        elif name == 'rot':
+            image = image.rot('d180')
+        elif name == 'embed':
+            image = image.embed(2, 2, image.width + 4, image.height + 4,
+                                extend='copy')
+        elif name == 'extract_area':
+            image = image.extract_area(2, 2, image.width - 4,
+                                       image.height - 4)
+        elif name == 'linear':
+            image = image.linear(1, 0)
+        elif name == 'gamma':
+            _ = image.gamma()
+        elif name in ('avg', 'max', 'min'):
+            assert getattr(image, name)() == 10
+        elif name == 'hist_find':
+            assert image.hist_find().max() == image.width * image.height
+        elif name == 'zoom':
+            image = image.zoom(2, 2)
+        elif name == 'subsample':
+            image = image.subsample(2, 2)
+        elif name == 'invert':
+            image = image.invert().invert()
+
+    assert image.avg() == 10
+
+
+def run_threads(target, n_threads=N_THREADS):
+    start = threading.Barrier(n_threads)
+    errors = []
+
+    def worker(index):
+        try:
+            start.wait()
+            target(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,))
+               for i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+
+
+class TestThreading:
+    def test_cache_fill(self, monkeypatch):
+        # start with empty caches, so every thread races to fill them
+        monkeypatch.setattr(pyvips.Introspect, '_introspect_cache', {})
+        monkeypatch.setattr(pyvips.VipsObject, '_pspec_cache', {})
+        monkeypatch.setattr(pyvips.Operation, '_docstring_cache', {})
+
+        introspected = [{} for _ in range(N_THREADS)]
+
+        def fill(index):
+            operations = list(OPERATIONS)
+            random.Random(index).shuffle(operations)
+
+            for _ in range(5):
+                run_pipeline(operations)
+
+            for name in operations:
+                introspected[index][name] = pyvips.Introspect.get(name)
+                assert pyvips.Operation.generate_docstring(name) != ''
+
+        run_threads(fill)
+
+        # every thread must have seen the same introspection objects
+        for name in OPERATIONS:
+            intro = pyvips.Introspect.get(name)
+            assert all(x[name] is intro for x in introspected)
+            assert pyvips.Operation._docstring_cache[name] == \
+                pyvips.Operation.generate_docstring(name)
+
+    def test_signal_connect(self):
+        # a private image, so we don't leave handlers on a cached one
+        image = pyvips.Image.new_from_memory(bytearray(256), 16, 16, 1,
+                                             'uchar')
+        image.set_progress(True)
+        n_connects = 50
+
+        def connect(index):
+            for _ in range(n_connects):
+                image.signal_connect('preeval', lambda image, progress: None)
+
+        run_threads(connect)
+
+        # each connect keeps a handle and a callback, side by side
+        handles = image._handles
+        assert len(handles) == 2 * N_THREADS * n_connects
+        for handle, callback in zip(handles[::2], handles[1::2]):
+            assert pyvips.ffi.from_handle(handle) is callback
+
+    @pytest.mark.parametrize('n_threads', [2, 16])
+    def test_independent_pipelines(self, n_threads):
+        def render(index):
+            for i in range(10):
+                image = pyvips.Image.black(100 + index, 100 + i) + index
+                image = image.resize(0.5).gaussblur(1)
+                assert abs(image.avg() - index) < 0.1
+
+        with pyvips.concurrency(2):
+            run_threads(render, n_threads)
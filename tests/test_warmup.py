@@ -0,0 +1,78 @@
+# vim: set fileencoding=utf-8 :
+
+import os
+import subprocess
+import sys
+
+import pytest
+import pyvips
+
+# warm up, then fork and run a pipeline in the child
+FORK_SCRIPT = '''
+import os
+import pyvips
+
+pyvips.warmup(operations=['black', 'avg'])
+assert len(os.listdir('/proc/self/task')) == 1
+
+# something for the child to drop
+pyvips.Image.black(10, 10)
+assert pyvips.cache_get_size() > 0
+
+pid = os.fork()
+if pid == 0:
+    assert pyvips.cache_get_size() == 0
+    avg = (pyvips.Image.black(100, 100) + 1).avg()
+    os._exit(0 if avg == 1 else 1)
+
+_, status = os.waitpid(pid, 0)
+assert status == 0
+'''
+
+
+# without warmup(), pyvips does nothing at fork
+NO_WARMUP_SCRIPT = '''
+import os
+import pyvips
+
+pyvips.Image.black(10, 10)
+assert pyvips.cache_get_size() > 0
+assert not pyvips.voperation._fork_handler_registered
+assert not pyvips.voperation._fork_lock_registered
+assert not pyvips.base._concurrency_fork_registered
+
+pid = os.fork()
+if pid == 0:
+    os._exit(0 if pyvips.cache_get_size() > 0 else 1)
+
+_, status = os.waitpid(pid, 0)
+assert status == 0
+'''
+
+
+class TestWarmup:
+    def test_warmup(self):
+        names = pyvips.warmup(operations=['resize'], loaders=['png'])
+        assert 'resize' in names
+        assert 'pngsave_buffer' in names
+        assert 'resize' in pyvips.Introspect._introspect_cache
+        assert 'resize' in pyvips.Operation._docstring_cache
+
+        # formats and operations which don't exist are errors
+        with pytest.raises(pyvips.Error):
+            pyvips.warmup(loaders=['banana'])
+        with pytest.raises(pyvips.Error):
+            pyvips.warmup(operations=['banana'])
+
+        names = pyvips.warmup()
+        assert 'thumbnail' in names
+        assert 'invert' in names
+
+    @pytest.mark.skipif(not sys.platform.startswith('linux'),
+                        reason="requires linux")
+    def test_warmup_fork(self):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        for script in [FORK_SCRIPT, NO_WARMUP_SCRIPT]:
+            result = subprocess.run([sys.executable, '-c', script],
+                                    env=env, timeout=60)
+            assert result.returncode == 0